@@ -0,0 +1,5 @@
+"""Benchmarks for the tutorial-building tools
+
+Each module is runnable via ``python -m``, and writes its results as JSON to
+standard output, so that results can be saved and compared across commits.
+"""
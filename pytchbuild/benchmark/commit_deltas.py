@@ -0,0 +1,123 @@
+"""Cost of finding the deltas of each commit in a tutorial's history
+
+Run as, e.g.::
+
+    python -m pytchbuild.benchmark.commit_deltas --n-base-files 5000
+
+Creates, in a temporary directory, a tutorial history whose ``{base}`` commit
+contains many files, followed by a number of commits each changing
+``code.py``.  Then times finding every commit's deltas, both as
+:py:attr:`ProjectCommit.computed_deltas` now does it, and via a libgit2
+tree-to-tree diff, which is how it used to be done.
+"""
+
+import json
+import statistics
+import sys
+import tempfile
+import time
+
+import click
+import pygit2
+
+from ..tutorialcompiler.fromgitrepo.tutorial_history import (
+    DeltaRecord,
+    ProjectCommit,
+)
+from .synthetic_repo import tree_from_files
+
+
+def create_history(repo_path, n_base_files, n_code_commits):
+    """Create history; return list of commit OIDs, tip first"""
+    repo = pygit2.init_repository(repo_path, bare=True)
+    signature = pygit2.Signature("Benchmark", "benchmark@example.com", 0)
+
+    files = {
+        f"boing/asset-src/dir-{i // 100}/file-{i}.txt": f"File {i}\n".encode()
+        for i in range(n_base_files)
+    }
+    files["boing/code.py"] = b"import pytch\n"
+
+    commit_oids = []
+
+    def commit(message):
+        tree_oid = tree_from_files(repo, files)
+        parents = commit_oids[-1:]
+        commit_oids.append(
+            repo.create_commit(None, signature, signature, message, tree_oid, parents)
+        )
+
+    commit("{base} Initial state\n")
+    for i in range(n_code_commits):
+        files["boing/code.py"] += f"print({i})\n".encode()
+        commit(f"{{#step-{i}}} Step {i}\n")
+
+    return repo, list(reversed(commit_oids))
+
+
+def libgit2_diff_deltas(project_commit):
+    return [
+        DeltaRecord.from_delta(delta)
+        for delta in project_commit.diff_against_parent_or_empty.deltas
+    ]
+
+
+def current_deltas(project_commit):
+    return project_commit.computed_deltas
+
+
+def time_all_deltas(repo, commit_oids, get_deltas):
+    # Fresh ProjectCommit instances each time, to avoid their caches.
+    project_commits = [ProjectCommit(repo, oid) for oid in commit_oids]
+    t0 = time.perf_counter()
+    for project_commit in project_commits:
+        get_deltas(project_commit)
+    return time.perf_counter() - t0
+
+
+def run(n_base_files, n_code_commits, n_repeats):
+    with tempfile.TemporaryDirectory() as repo_path:
+        repo, commit_oids = create_history(repo_path, n_base_files, n_code_commits)
+        results = {
+            "n_base_files": n_base_files,
+            "n_code_commits": n_code_commits,
+            "n_repeats": n_repeats,
+        }
+        for label, get_deltas in [
+                ("libgit2_diff", libgit2_diff_deltas),
+                ("current", current_deltas),
+        ]:
+            results[label] = statistics.median(
+                time_all_deltas(repo, commit_oids, get_deltas)
+                for _ in range(n_repeats)
+            )
+        return results
+
+
+@click.command()
+@click.option(
+    "--n-base-files",
+    type=click.IntRange(min=1),
+    default=5000,
+    help="how many files the {base} commit should contain",
+)
+@click.option(
+    "--n-code-commits",
+    type=click.IntRange(min=1),
+    default=100,
+    help="how many code-changing commits follow the {base} commit",
+)
+@click.option(
+    "-n", "--n-repeats",
+    type=click.IntRange(min=1),
+    default=5,
+    help="how many times to repeat each measurement",
+)
+def main(n_base_files, n_code_commits, n_repeats):
+    results = run(n_base_files, n_code_commits, n_repeats)
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
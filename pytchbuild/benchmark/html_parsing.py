@@ -0,0 +1,147 @@
+"""Time parsing and output of a tutorial's HTML with each parser backend
+
+Run as, e.g.::
+
+    python -m pytchbuild.benchmark.html_parsing -r ../pytch-tutorials
+
+By default, uses the tutorial of the collection with the longest tutorial
+text; give ``-b`` to choose a particular tutorial instead.  For each available
+parser backend, times:
+
+``parse``
+    Parsing the HTML which Markdown produces from the tutorial text, and
+    gathering learner-task DIVs, as :py:func:`soup_from_markdown_text` does.
+
+``serialise``
+    Outputting the resulting soup as UTF-8 bytes.
+
+``tutorial_div``
+    The whole of :py:func:`tutorial_div_from_project_history`.  All git work
+    (e.g., finding and rendering patches) is done once beforehand, so that
+    this time is dominated by HTML handling.
+"""
+
+import json
+import statistics
+import sys
+import time
+
+import click
+import markdown
+import pygit2
+
+from ..tutorialcompiler.gather_tutorials import TutorialCollection, yaml_load
+from ..tutorialcompiler.fromgitrepo import soup_parsing
+from ..tutorialcompiler.fromgitrepo.tutorial_history import ProjectHistory
+from ..tutorialcompiler.fromgitrepo.tutorial_html_fragment import (
+    tutorial_div_from_project_history,
+)
+from ..tutorialcompiler.fromgitrepo.tutorial_markdown import (
+    ShortcodeExtension,
+    gather_learner_task_divs,
+)
+
+
+def longest_tutorial_tip_revision(repo, index_source):
+    content = TutorialCollection.index_yaml_content(repo, index_source)
+    tip_revisions = [d["tip-commit"] for d in yaml_load(content)]
+    return max(
+        tip_revisions,
+        key=lambda tip_revision: len(ProjectHistory(repo, tip_revision).tutorial_text),
+    )
+
+
+def median_time(fun, n_repeats):
+    def time_fun():
+        t0 = time.perf_counter()
+        fun()
+        return time.perf_counter() - t0
+
+    return statistics.median(time_fun() for _ in range(n_repeats))
+
+
+def backend_timings(project_history, html, n_repeats):
+    soup = gather_learner_task_divs(soup_parsing.parsed_fragment(html))
+    return {
+        "parse": median_time(
+            lambda: gather_learner_task_divs(soup_parsing.parsed_fragment(html)),
+            n_repeats,
+        ),
+        "serialise": median_time(lambda: soup.encode("utf-8"), n_repeats),
+        "tutorial_div": median_time(
+            lambda: tutorial_div_from_project_history(project_history),
+            n_repeats,
+        ),
+    }
+
+
+def run(repo_path, index_source, maybe_tip_revision, n_repeats):
+    repo = pygit2.Repository(repo_path)
+    tip_revision = (
+        longest_tutorial_tip_revision(repo, index_source)
+        if maybe_tip_revision is None
+        else maybe_tip_revision
+    )
+    project_history = ProjectHistory(repo, tip_revision)
+    html = markdown.markdown(
+        project_history.tutorial_text,
+        extensions=[ShortcodeExtension(), "fenced_code"]
+    )
+
+    # Do all git work, which is cached within project_history:
+    tutorial_div_from_project_history(project_history)
+
+    results = {
+        "tip_revision": tip_revision,
+        "tutorial_text_length": len(project_history.tutorial_text),
+        "html_length": len(html),
+        "n_repeats": n_repeats,
+    }
+
+    original_backend = soup_parsing.current_parser_backend
+    try:
+        for backend in soup_parsing.available_parser_backends():
+            soup_parsing.configure_parser_backend(backend)
+            results[backend] = backend_timings(project_history, html, n_repeats)
+    finally:
+        soup_parsing.configure_parser_backend(original_backend)
+
+    return results
+
+
+@click.command()
+@click.option(
+    "-r", "--repository-path",
+    default=pygit2.discover_repository("."),
+    envvar="GIT_DIR",
+    metavar="PATH",
+    help="path to root of git repository",
+)
+@click.option(
+    "--index-source",
+    type=click.Choice([x.name for x in TutorialCollection.IndexSource],
+                      case_sensitive=False),
+    default="WORKING_DIRECTORY",
+    help='what source to use for the "index.yaml" file of tutorials',
+)
+@click.option(
+    "-b", "--tip-revision",
+    default=None,
+    metavar="REVISION",
+    help="revision at tip of tutorial (default: that with the longest text)",
+)
+@click.option(
+    "-n", "--n-repeats",
+    type=click.IntRange(min=1),
+    default=5,
+    help="how many times to repeat each measurement",
+)
+def main(repository_path, index_source, tip_revision, n_repeats):
+    index_source = getattr(TutorialCollection.IndexSource, index_source)
+    results = run(repository_path, index_source, tip_revision, n_repeats)
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Time converting many small Markdown documents to HTML
+
+Run as, e.g.::
+
+    python -m pytchbuild.benchmark.markdown_conversion --n-documents 1000
+
+The documents are like asset credits: a sentence or two with a link.  For all
+of them together, times:
+
+``fresh_converter``
+    Calling ``markdown.markdown()``, which constructs a new ``Markdown``
+    converter, with its extensions, for each document.
+
+``reused_converter``
+    Calling :py:func:`html_from_markdown_text`, which re-uses one converter
+    per thread.
+
+The reported time of each is the median over the repeats.
+"""
+
+import json
+import statistics
+import sys
+import time
+
+import click
+import markdown
+
+from ..tutorialcompiler.fromgitrepo.tutorial_markdown import (
+    ShortcodeExtension,
+    html_from_markdown_text,
+)
+
+
+def credit_markdown_text(idx):
+    return (
+        f"Image {idx} by [Artist {idx}](https://example.com/artists/{idx}),"
+        " licensed under\n"
+        "[CC-BY-SA 4.0](https://creativecommons.org/licenses/by-sa/4.0/).\n"
+    )
+
+
+def fresh_converter_html(markdown_text):
+    return markdown.markdown(
+        markdown_text,
+        extensions=[ShortcodeExtension(), "fenced_code"]
+    )
+
+
+def median_time(fun, documents, n_repeats):
+    def time_fun():
+        t0 = time.perf_counter()
+        for document in documents:
+            fun(document)
+        return time.perf_counter() - t0
+
+    return statistics.median(time_fun() for _ in range(n_repeats))
+
+
+def run(n_documents, n_repeats):
+    documents = [credit_markdown_text(idx) for idx in range(n_documents)]
+
+    fresh_htmls = [fresh_converter_html(document) for document in documents]
+    reused_htmls = [html_from_markdown_text(document) for document in documents]
+    if reused_htmls != fresh_htmls:
+        raise RuntimeError("re-used converter gave different HTML")
+
+    return {
+        "n_documents": n_documents,
+        "n_repeats": n_repeats,
+        "fresh_converter": median_time(fresh_converter_html, documents, n_repeats),
+        "reused_converter": median_time(
+            html_from_markdown_text, documents, n_repeats
+        ),
+    }
+
+
+@click.command()
+@click.option(
+    "--n-documents",
+    type=click.IntRange(min=1),
+    default=1000,
+    help="how many small Markdown documents to convert",
+)
+@click.option(
+    "-n", "--n-repeats",
+    type=click.IntRange(min=1),
+    default=5,
+    help="how many times to repeat each measurement",
+)
+def main(n_documents, n_repeats):
+    results = run(n_documents, n_repeats)
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
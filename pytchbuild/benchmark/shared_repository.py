@@ -0,0 +1,118 @@
+"""Effect of sharing one ``pygit2.Repository`` across a tutorial collection
+
+Run as, e.g.::
+
+    python -m pytchbuild.benchmark.shared_repository -r ../pytch-tutorials
+
+Builds a :py:class:`ProjectHistory` for every tutorial in the collection, first
+with a separate ``Repository`` for each tutorial, then with one shared
+``Repository``, and times both the construction ("open") and a fixed set of
+object lookups on each history ("lookup").  The persistent build cache is not
+used, so that all git work is done each time.
+"""
+
+import json
+import statistics
+import sys
+import time
+
+import click
+import pygit2
+
+from ..tutorialcompiler.gather_tutorials import TutorialCollection, yaml_load
+from ..tutorialcompiler.fromgitrepo.tutorial_history import ProjectHistory
+from ..tutorialcompiler.fromgitrepo.repo_functions import configure_object_cache
+
+
+def tutorial_tip_revisions(repo_path, index_source):
+    repo = pygit2.Repository(repo_path)
+    content = TutorialCollection.index_yaml_content(repo, index_source)
+    return [d["tip-commit"] for d in yaml_load(content)]
+
+
+def exercise_history(history):
+    """Perform the lookups typical of building a tutorial"""
+    for commit in history.project_commits:
+        commit.summary_label
+    for slug in history.ordered_commit_slugs:
+        history.code_text_from_slug(slug)
+    for asset in history.all_assets:
+        asset.size
+
+
+def time_histories(repo_path, tip_revisions, share_repository):
+    t0 = time.perf_counter()
+    repo_or_path = (
+        pygit2.Repository(repo_path) if share_repository else repo_path
+    )
+    histories = [
+        ProjectHistory(repo_or_path, tip_revision)
+        for tip_revision in tip_revisions
+    ]
+    t1 = time.perf_counter()
+    for history in histories:
+        exercise_history(history)
+    t2 = time.perf_counter()
+    return {"open": t1 - t0, "lookup": t2 - t1}
+
+
+def median_timings(timings_list):
+    return {
+        key: statistics.median(timings[key] for timings in timings_list)
+        for key in timings_list[0]
+    }
+
+
+def run(repo_path, index_source, n_repeats):
+    tip_revisions = tutorial_tip_revisions(repo_path, index_source)
+
+    results = {"n_tutorials": len(tip_revisions), "n_repeats": n_repeats}
+    for label, share_repository in [("separate", False), ("shared", True)]:
+        timings_list = [
+            time_histories(repo_path, tip_revisions, share_repository)
+            for _ in range(n_repeats)
+        ]
+        results[label] = median_timings(timings_list)
+
+    return results
+
+
+@click.command()
+@click.option(
+    "-r", "--repository-path",
+    default=pygit2.discover_repository("."),
+    envvar="GIT_DIR",
+    metavar="PATH",
+    help="path to root of git repository",
+)
+@click.option(
+    "--index-source",
+    type=click.Choice([x.name for x in TutorialCollection.IndexSource],
+                      case_sensitive=False),
+    default="WORKING_DIRECTORY",
+    help='what source to use for the "index.yaml" file of tutorials',
+)
+@click.option(
+    "-n", "--n-repeats",
+    type=click.IntRange(min=1),
+    default=5,
+    help="how many times to repeat each measurement",
+)
+@click.option(
+    "--git-object-cache-mb",
+    type=click.IntRange(min=1),
+    default=None,
+    metavar="MB",
+    help="size of the git object cache",
+)
+def main(repository_path, index_source, n_repeats, git_object_cache_mb):
+    index_source = getattr(TutorialCollection.IndexSource, index_source)
+    if git_object_cache_mb is not None:
+        configure_object_cache(git_object_cache_mb)
+    results = run(repository_path, index_source, n_repeats)
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Time the main stages of building a synthetic tutorial collection
+
+Run as, e.g.::
+
+    python -m pytchbuild.benchmark.suite --n-tutorials 8 --n-steps 100 -j 4
+
+Creates, in a temporary directory, a repository as described by the
+:py:mod:`synthetic_repo <pytchbuild.benchmark.synthetic_repo>` options, and
+times each of:
+
+``project_history``
+    Constructing a :py:class:`ProjectHistory` for every tutorial.
+
+``tutorial_div``
+    Rendering every tutorial's text with
+    :py:func:`tutorial_div_from_project_history`.
+
+``bundle_zipfile``
+    Writing every tutorial's :py:class:`TutorialBundle` to an in-memory
+    zipfile.
+
+``all_asset_media``
+    Gathering the whole collection's media library with
+    :py:meth:`TutorialCollection.all_asset_media`.
+
+``gather``
+    Building the collection's zipfile from scratch, as
+    ``pytchbuild-gather-tutorials`` does.
+
+Each stage starts from freshly-constructed objects, so that their cached
+properties do not carry over from one measurement to the next.  The reported
+time of each stage is the median over the repeats.
+"""
+
+import io
+import json
+import statistics
+import sys
+import tempfile
+import time
+import zipfile
+from contextlib import closing
+from dataclasses import asdict
+
+import click
+import pygit2
+
+from ..tutorialcompiler.gather_tutorials import TutorialCollection
+from ..tutorialcompiler.fromgitrepo.build_cache import maybe_build_cache
+from ..tutorialcompiler.fromgitrepo.tutorial_bundle import TutorialBundle
+from ..tutorialcompiler.fromgitrepo.tutorial_history import ProjectHistory
+from ..tutorialcompiler.fromgitrepo.tutorial_html_fragment import (
+    tutorial_div_from_project_history,
+)
+from .synthetic_repo import create_synthetic_repo, spec_from_options, spec_options
+
+
+RECIPES_TIP = TutorialCollection.IndexSource.RECIPES_TIP
+
+
+class StageTimer:
+    """Time the stages of building the tutorials in one repository"""
+
+    def __init__(self, repo_path, tip_revisions, build_cache, n_jobs):
+        self.repo_path = repo_path
+        self.tip_revisions = tip_revisions
+        self.build_cache = build_cache
+        self.n_jobs = n_jobs
+
+    def project_histories(self):
+        repo = pygit2.Repository(self.repo_path)
+        return [
+            ProjectHistory(repo, tip_revision, build_cache=self.build_cache)
+            for tip_revision in self.tip_revisions
+        ]
+
+    def collection(self):
+        return TutorialCollection.from_repo_path(
+            self.repo_path, RECIPES_TIP, self.build_cache
+        )
+
+    def time_project_history(self):
+        t0 = time.perf_counter()
+        self.project_histories()
+        return time.perf_counter() - t0
+
+    def time_tutorial_div(self):
+        project_histories = self.project_histories()
+        t0 = time.perf_counter()
+        for project_history in project_histories:
+            tutorial_div_from_project_history(project_history)
+        return time.perf_counter() - t0
+
+    def time_bundle_zipfile(self):
+        project_histories = self.project_histories()
+        t0 = time.perf_counter()
+        with closing(zipfile.ZipFile(io.BytesIO(), mode="w")) as zfile:
+            for project_history in project_histories:
+                bundle = TutorialBundle.from_project_history(project_history)
+                bundle.write_to_zipfile(zfile)
+        return time.perf_counter() - t0
+
+    def time_all_asset_media(self):
+        collection = self.collection()
+        t0 = time.perf_counter()
+        collection.all_asset_media(self.n_jobs)
+        return time.perf_counter() - t0
+
+    def time_gather(self):
+        t0 = time.perf_counter()
+        collection = self.collection()
+        collection.write_new_zipfile(None, io.BytesIO(), self.n_jobs)
+        return time.perf_counter() - t0
+
+    stage_names = [
+        "project_history",
+        "tutorial_div",
+        "bundle_zipfile",
+        "all_asset_media",
+        "gather",
+    ]
+
+    def median_time(self, stage_name, n_repeats):
+        time_stage = getattr(self, f"time_{stage_name}")
+        return statistics.median(time_stage() for _ in range(n_repeats))
+
+
+def run(spec, n_repeats, n_jobs, use_cache, stage_names):
+    with tempfile.TemporaryDirectory() as repo_path:
+        t0 = time.perf_counter()
+        index_data = create_synthetic_repo(repo_path, spec)
+        t_create = time.perf_counter() - t0
+
+        tip_revisions = [d["tip-commit"] for d in index_data]
+        results = {
+            "spec": asdict(spec),
+            "n_repeats": n_repeats,
+            "n_jobs": n_jobs,
+            "use_cache": use_cache,
+            "create_repo": t_create,
+        }
+        with maybe_build_cache(repo_path, use_cache) as build_cache:
+            timer = StageTimer(repo_path, tip_revisions, build_cache, n_jobs)
+            results["stages"] = {
+                stage_name: timer.median_time(stage_name, n_repeats)
+                for stage_name in stage_names
+            }
+        return results
+
+
+@click.command()
+@spec_options
+@click.option(
+    "-n", "--n-repeats",
+    type=click.IntRange(min=1),
+    default=3,
+    help="how many times to repeat each measurement",
+)
+@click.option(
+    "-j", "--jobs",
+    "n_jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="how many tutorials to build in parallel, for collection-wide stages",
+)
+@click.option(
+    "--cache/--no-cache",
+    "use_cache",
+    default=False,
+    help="whether to use a persistent cache (filled by the first repeat)",
+)
+@click.option(
+    "--stage",
+    "stage_names",
+    type=click.Choice(StageTimer.stage_names),
+    multiple=True,
+    default=StageTimer.stage_names,
+    help="stage to time; give more than once to time several",
+)
+def main(n_repeats, n_jobs, use_cache, stage_names, **options):
+    spec = spec_from_options(options)
+    results = run(spec, n_repeats, n_jobs, use_cache, list(stage_names))
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
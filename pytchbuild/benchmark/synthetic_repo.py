@@ -0,0 +1,537 @@
+"""Generator of synthetic tutorial repositories
+
+Run as, e.g.::
+
+    python -m pytchbuild.benchmark.synthetic_repo --n-tutorials 8 /tmp/tuts.git
+
+Creates a bare git repository holding a collection of made-up tutorials, each
+on its own branch, with an ``index.yaml`` for the collection at the tip of the
+``release-recipes`` branch.  Every tutorial has the usual shape: a ``{base}``
+commit; commits adding project assets, each with credits; commits developing
+``code.py``, some with identifier-slugs and some without; and a final commit
+adding the tutorial text, summary, and metadata.
+
+A "flat" tutorial refers to its tagged commits with ``{{< commit >}}``
+shortcodes.  A "per-method" tutorial instead builds a program of sprites and
+scripts, and refers to its tagged commits with ``{{< jr-commit >}}``
+shortcodes, cycling through the kinds of such commit.
+
+Everything, including commit timestamps and asset contents, is determined by
+the :py:class:`SyntheticRepoSpec`, so the same spec always gives the same
+commit OIDs.
+"""
+
+import io
+import json
+import random
+import sys
+import wave
+from dataclasses import asdict, dataclass, field
+from functools import reduce
+from typing import List, Tuple
+
+import click
+import pygit2
+import yaml
+from PIL import Image
+
+from ..tutorialcompiler.fromgitrepo.config import RELEASE_RECIPES_BRANCH_NAME
+
+
+IMAGE_FORMATS = ["png", "jpg"]
+SOUND_FORMATS = ["wav"]
+ASSET_FORMATS = IMAGE_FORMATS + SOUND_FORMATS
+
+PROGRAM_KINDS = ["flat", "per-method"]
+
+JR_COMMIT_KINDS = [
+    "add-sprite",
+    "add-script",
+    "edit-script",
+    "change-hat-block",
+    "add-medialib-appearance",
+]
+
+BASE_COMMIT_TIME = 1700000000
+
+
+@dataclass(frozen=True)
+class SyntheticRepoSpec:
+    """Description of a synthetic tutorial collection
+
+    Of the *n_tutorials* tutorials, the last *n_per_method_tutorials* are
+    "per-method" ones, using jr-commits; the rest are "flat".  Each tutorial
+    has *n_steps* tagged commits, each used once in the tutorial text, and
+    *n_untagged_commits* further commits changing the code.  The tagged
+    commits are divided as evenly as possible among *n_chapters* chapters.
+
+    Each tutorial has *n_assets* project assets, one per commit, cycling
+    through the *asset_formats*.  Images are *asset_size* pixels square, of
+    random content, so compressing poorly as real images tend to.  Sounds have
+    as many samples as such an image has pixels.
+    """
+
+    n_tutorials: int = 4
+    n_per_method_tutorials: int = 1
+    n_steps: int = 40
+    n_untagged_commits: int = 10
+    n_chapters: int = 8
+    n_assets: int = 12
+    asset_size: int = 64
+    asset_formats: Tuple[str, ...] = ("png", "jpg", "wav")
+
+    def __post_init__(self):
+        if self.n_per_method_tutorials > self.n_tutorials:
+            raise ValueError(
+                f"cannot have {self.n_per_method_tutorials} per-method"
+                f" tutorials among {self.n_tutorials} tutorials"
+            )
+        unknown_formats = set(self.asset_formats) - set(ASSET_FORMATS)
+        if unknown_formats:
+            raise ValueError(f"unknown asset formats {sorted(unknown_formats)}")
+
+    def program_kind(self, tutorial_idx):
+        n_flat = self.n_tutorials - self.n_per_method_tutorials
+        return "flat" if tutorial_idx < n_flat else "per-method"
+
+
+########################################################################
+
+def tree_from_files(repo, file_data_from_path):
+    """OID of a new tree holding the given files, creating subtrees as needed
+    """
+    root = {}
+    for path, data in file_data_from_path.items():
+        *dir_names, basename = path.split("/")
+        node = root
+        for dir_name in dir_names:
+            node = node.setdefault(dir_name, {})
+        node[basename] = data
+
+    def write_tree(node):
+        tree_builder = repo.TreeBuilder()
+        for name, child in sorted(node.items()):
+            if isinstance(child, dict):
+                tree_builder.insert(name, write_tree(child), pygit2.GIT_FILEMODE_TREE)
+            else:
+                blob_id = repo.create_blob(child)
+                tree_builder.insert(name, blob_id, pygit2.GIT_FILEMODE_BLOB)
+        return tree_builder.write()
+
+    return write_tree(root)
+
+
+class HistoryWriter:
+    """Write a linear sequence of commits, each giving a complete set of files
+
+    The commits are not on any branch until :py:meth:`set_branch` is called.
+    Commit timestamps increase by one second per commit, starting from
+    *commit_time*.
+    """
+
+    def __init__(self, repo, commit_time=BASE_COMMIT_TIME):
+        self.repo = repo
+        self.commit_time = commit_time
+        self.files = {}
+        self.maybe_tip_oid = None
+
+    def commit(self, message):
+        signature = pygit2.Signature(
+            "Benchmark", "benchmark@example.com", self.commit_time, 0
+        )
+        self.commit_time += 1
+        tree_oid = tree_from_files(self.repo, self.files)
+        parents = [] if self.maybe_tip_oid is None else [self.maybe_tip_oid]
+        self.maybe_tip_oid = self.repo.create_commit(
+            None, signature, signature, message, tree_oid, parents
+        )
+
+    def set_branch(self, branch_name):
+        self.repo.branches.local.create(
+            branch_name, self.repo[self.maybe_tip_oid], force=True
+        )
+
+
+########################################################################
+#
+# Asset content.
+
+def image_data(rng, size, image_format):
+    mode = "RGBA" if image_format == "png" else "RGB"
+    n_bytes = size * size * len(mode)
+    image = Image.frombytes(mode, (size, size), rng.randbytes(n_bytes))
+    out_file = io.BytesIO()
+    image.save(out_file, format=("JPEG" if image_format == "jpg" else "PNG"))
+    return out_file.getvalue()
+
+
+def sound_data(rng, size):
+    out_file = io.BytesIO()
+    with wave.open(out_file, "wb") as wave_file:
+        wave_file.setnchannels(1)
+        wave_file.setsampwidth(2)
+        wave_file.setframerate(22050)
+        wave_file.writeframes(rng.randbytes(2 * size * size))
+    return out_file.getvalue()
+
+
+def asset_data(rng, size, asset_format):
+    if asset_format in IMAGE_FORMATS:
+        return image_data(rng, size, asset_format)
+    else:
+        return sound_data(rng, size)
+
+
+def asset_local_path(asset_idx, asset_format):
+    subdir_name = "images" if asset_format in IMAGE_FORMATS else "sounds"
+    return f"{subdir_name}/asset-{asset_idx}.{asset_format}"
+
+
+########################################################################
+#
+# Code for a "flat" tutorial.
+
+def flat_code_text(n_steps_done, notes):
+    functions = "".join(
+        f"\n\ndef step_{i}(x):\n    x += {i}\n    return x * 2\n"
+        for i in range(n_steps_done)
+    )
+    return (
+        "import pytch\n"
+        + "".join(f"# {note}\n" for note in notes)
+        + f"\nSPEED = {n_steps_done}\n"
+        + functions
+    )
+
+
+########################################################################
+#
+# Code for a "per-method" tutorial.
+
+@dataclass
+class SyntheticScript:
+    name: str
+    decorator: str
+    body_lines: List[str]
+
+    @property
+    def code_text(self):
+        body = "".join(f"        {line}\n" for line in self.body_lines)
+        return (
+            f"\n    {self.decorator}\n"
+            f"    def {self.name}(self):\n"
+            f"{body}"
+        )
+
+
+@dataclass
+class SyntheticSprite:
+    name: str
+    costumes: List[str] = field(default_factory=list)
+    scripts: List[SyntheticScript] = field(default_factory=list)
+
+    @property
+    def code_text(self):
+        costumes_literal = ", ".join(f'"{c}"' for c in self.costumes)
+        return (
+            f"\n\nclass {self.name}(pytch.Sprite):\n"
+            f"    Costumes = [{costumes_literal}]\n"
+            + "".join(script.code_text for script in self.scripts)
+        )
+
+
+def per_method_code_text(sprites, notes):
+    return (
+        "import pytch\n"
+        + "".join(f"# {note}\n" for note in notes)
+        + "".join(sprite.code_text for sprite in sprites)
+    )
+
+
+def apply_jr_commit(sprites, step_idx):
+    """Make the *step_idx*'th change to *sprites*; return its shortcode args
+
+    The changes cycle through the kinds of jr-commit.  The result is the list
+    of the kind and any further arguments, for use in the tutorial text.
+    """
+    kind = JR_COMMIT_KINDS[step_idx % len(JR_COMMIT_KINDS)]
+    args = []
+    match kind:
+        case "add-sprite":
+            sprites.append(SyntheticSprite(f"Sprite{len(sprites)}"))
+        case "add-script":
+            sprites[-1].scripts.append(SyntheticScript(
+                f"script_{step_idx}",
+                "@pytch.when_green_flag_clicked",
+                [f"self.go_to_xy({step_idx}, 0)"],
+            ))
+        case "edit-script":
+            sprites[-1].scripts[-1].body_lines.append(f"self.change_x({step_idx})")
+        case "change-hat-block":
+            sprites[-1].scripts[-1].decorator = (
+                f'@pytch.when_I_receive("message-{step_idx}")'
+            )
+        case "add-medialib-appearance":
+            sprites[-1].costumes.append(f"appearance-{step_idx}.png")
+            args = [f"appearance-{step_idx}"]
+    return [kind, *args]
+
+
+########################################################################
+#
+# Tutorial text.
+
+def chapter_step_indexes(n_steps, n_chapters):
+    """List of, for each chapter, the range of step indexes within it"""
+    return [
+        range((c * n_steps) // n_chapters, ((c + 1) * n_steps) // n_chapters)
+        for c in range(n_chapters)
+    ]
+
+
+def step_shortcode(step_idx, maybe_jr_commit_args):
+    slug = f"step-{step_idx}"
+    if maybe_jr_commit_args is None:
+        return f"{{{{< commit {slug} >}}}}"
+    [kind, *args] = maybe_jr_commit_args
+    args_suffix = f" {json.dumps(args)}" if args else ""
+    return f"{{{{< jr-commit {slug} {kind}{args_suffix} >}}}}"
+
+
+def tutorial_text(title, spec, jr_commit_args_list):
+    front_matter = (
+        f"# {title}\n\n"
+        "This is a made-up tutorial, for measuring performance.\n\n"
+        "{{< asset-credits >}}\n\n"
+        "---\n\n"
+    )
+
+    chapters = []
+    for chapter_idx, step_idxs in enumerate(
+            chapter_step_indexes(spec.n_steps, spec.n_chapters)
+    ):
+        chapter = (
+            f"## Chapter {chapter_idx}\n\n"
+            f"In this chapter we work on *part {chapter_idx}* of the game.\n\n"
+        )
+        for step_idx in step_idxs:
+            shortcode = step_shortcode(step_idx, jr_commit_args_list[step_idx])
+            chapter += (
+                f"Now change the `code` for step {step_idx},"
+                " as shown here:\n\n"
+                f"{shortcode}\n\n"
+            )
+        chapters.append(chapter)
+
+    return front_matter + "".join(chapters)
+
+
+def summary_text(title):
+    return (
+        "![Screenshot](summary-screenshot.png)\n\n"
+        f"# {title}\n\n"
+        "A made-up tutorial, for measuring performance.\n"
+    )
+
+
+def metadata_text(program_kind, image_local_paths):
+    metadata = {"difficulty": "easy"}
+    if program_kind == "per-method":
+        metadata["programKind"] = program_kind
+    if len(image_local_paths) >= 2:
+        metadata["groupedProjectAssets"] = [
+            {"name": "Grouped images", "assets": image_local_paths[:2]}
+        ]
+    return json.dumps(metadata)
+
+
+########################################################################
+
+def untagged_commit_positions(n_steps, n_untagged_commits):
+    """For each untagged commit, the index of the step it follows"""
+    return [(j * n_steps) // n_untagged_commits for j in range(n_untagged_commits)]
+
+
+def write_tutorial(history_writer, spec, tutorial_idx, dir_name, title):
+    program_kind = spec.program_kind(tutorial_idx)
+    rng = random.Random(f"{tutorial_idx}")
+    files = history_writer.files
+    code_path = f"{dir_name}/code.py"
+
+    files[code_path] = b"import pytch\n"
+    history_writer.commit("{base} Add empty code file\n")
+
+    screenshot_path = f"{dir_name}/tutorial-assets/summary-screenshot.png"
+    files[screenshot_path] = image_data(rng, spec.asset_size, "png")
+    history_writer.commit("Add summary screenshot\n\nCreated for benchmarking.\n")
+
+    image_local_paths = []
+    for asset_idx in range(spec.n_assets):
+        asset_format = spec.asset_formats[asset_idx % len(spec.asset_formats)]
+        local_path = asset_local_path(asset_idx, asset_format)
+        if asset_format in IMAGE_FORMATS:
+            image_local_paths.append(local_path)
+        files[f"{dir_name}/project-assets/{local_path}"] = asset_data(
+            rng, spec.asset_size, asset_format
+        )
+        history_writer.commit(
+            f"Add asset {local_path}\n\nCreated for *benchmarking*.\n"
+        )
+
+    notes = []
+    sprites = []
+    jr_commit_args_list = []
+
+    def code_text():
+        if program_kind == "flat":
+            return flat_code_text(len(jr_commit_args_list), notes)
+        else:
+            return per_method_code_text(sprites, notes)
+
+    untagged_positions = untagged_commit_positions(
+        spec.n_steps, spec.n_untagged_commits
+    )
+    for step_idx in range(spec.n_steps):
+        jr_commit_args_list.append(
+            None if program_kind == "flat"
+            else apply_jr_commit(sprites, step_idx)
+        )
+        files[code_path] = code_text().encode("utf-8")
+        history_writer.commit(f"{{#step-{step_idx}}} Make step {step_idx}\n")
+
+        for _ in range(untagged_positions.count(step_idx)):
+            notes.append(f"Note {len(notes)}")
+            files[code_path] = code_text().encode("utf-8")
+            history_writer.commit(f"Add note {len(notes) - 1}\n")
+
+    tutorial_path = f"{dir_name}/tutorial.md"
+    files[tutorial_path] = tutorial_text(title, spec, jr_commit_args_list).encode()
+    files[f"{dir_name}/summary.md"] = summary_text(title).encode()
+    files[f"{dir_name}/metadata.json"] = (
+        metadata_text(program_kind, image_local_paths).encode()
+    )
+    history_writer.commit("Add tutorial text\n")
+
+
+def create_synthetic_repo(repo_path, spec):
+    """Create a bare repository as described by *spec*; return its index data
+
+    The result is the list of dicts written to ``index.yaml``, each giving a
+    tutorial's name and the branch (its ``tip-commit``) holding it.
+    """
+    repo = pygit2.init_repository(repo_path, bare=True)
+
+    index_data = []
+    commit_time = BASE_COMMIT_TIME
+    for tutorial_idx in range(spec.n_tutorials):
+        branch_name = f"synthetic-{tutorial_idx}"
+        name = f"Synthetic {tutorial_idx}"
+        history_writer = HistoryWriter(repo, commit_time)
+        write_tutorial(history_writer, spec, tutorial_idx, branch_name, name)
+        history_writer.set_branch(branch_name)
+        commit_time = history_writer.commit_time
+        index_data.append({"name": name, "tip-commit": branch_name})
+
+    recipes_writer = HistoryWriter(repo, commit_time)
+    recipes_writer.files["index.yaml"] = yaml.dump(index_data).encode("utf-8")
+    recipes_writer.commit("Add index of synthetic tutorials\n")
+    recipes_writer.set_branch(RELEASE_RECIPES_BRANCH_NAME)
+
+    return index_data
+
+
+########################################################################
+
+SPEC_OPTIONS = [
+    click.option(
+        "--n-tutorials",
+        type=click.IntRange(min=1),
+        default=SyntheticRepoSpec.n_tutorials,
+        help="how many tutorials the collection should contain",
+    ),
+    click.option(
+        "--n-per-method-tutorials",
+        type=click.IntRange(min=0),
+        default=SyntheticRepoSpec.n_per_method_tutorials,
+        help="how many of the tutorials should use jr-commits",
+    ),
+    click.option(
+        "--n-steps",
+        type=click.IntRange(min=1),
+        default=SyntheticRepoSpec.n_steps,
+        help="how many commits with identifier-slugs each tutorial should have",
+    ),
+    click.option(
+        "--n-untagged-commits",
+        type=click.IntRange(min=0),
+        default=SyntheticRepoSpec.n_untagged_commits,
+        help="how many code commits without slugs each tutorial should have",
+    ),
+    click.option(
+        "--n-chapters",
+        type=click.IntRange(min=1),
+        default=SyntheticRepoSpec.n_chapters,
+        help="how many chapters each tutorial should have",
+    ),
+    click.option(
+        "--n-assets",
+        type=click.IntRange(min=0),
+        default=SyntheticRepoSpec.n_assets,
+        help="how many project assets each tutorial should have",
+    ),
+    click.option(
+        "--asset-size",
+        type=click.IntRange(min=1),
+        default=SyntheticRepoSpec.asset_size,
+        metavar="PIXELS",
+        help="width (and height) of each image asset",
+    ),
+    click.option(
+        "--asset-format",
+        "asset_formats",
+        type=click.Choice(ASSET_FORMATS),
+        multiple=True,
+        default=SyntheticRepoSpec.asset_formats,
+        help="format of project assets; give more than once to cycle through",
+    ),
+]
+
+
+def spec_options(fun):
+    """Decorate a click command with options for the fields of a spec
+
+    The command can then make a :py:class:`SyntheticRepoSpec` from the values
+    of those options with :py:func:`spec_from_options`.
+    """
+    return reduce(lambda f, option: option(f), reversed(SPEC_OPTIONS), fun)
+
+
+def spec_from_options(options):
+    """Pop spec-field values from dict *options*; return spec made from them"""
+    spec_kwargs = {
+        name: options.pop(name)
+        for name in SyntheticRepoSpec.__dataclass_fields__
+    }
+    spec_kwargs["asset_formats"] = tuple(spec_kwargs["asset_formats"])
+    try:
+        return SyntheticRepoSpec(**spec_kwargs)
+    except ValueError as err:
+        raise click.UsageError(str(err))
+
+
+@click.command()
+@spec_options
+@click.argument(
+    "repository_path",
+    type=click.Path(exists=False),
+)
+def main(repository_path, **options):
+    spec = spec_from_options(options)
+    index_data = create_synthetic_repo(repository_path, spec)
+    results = {"spec": asdict(spec), "tutorials": index_data}
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
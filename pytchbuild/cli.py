@@ -2,6 +2,7 @@
 """
 
 import sys
+from functools import partial
 import click
 import colorlog
 
@@ -13,6 +14,16 @@ from .tutorialcompiler.fromgitrepo import (
 )
 from .tutorialcompiler.fromgitrepo.tutorial_history import ProjectHistory
 from .tutorialcompiler.fromgitrepo.errors import TutorialStructureError
+from .tutorialcompiler.fromgitrepo.build_cache import maybe_build_cache
+from .tutorialcompiler.fromgitrepo.code_snapshots import CodeSnapshotStyle
+from .tutorialcompiler.fromgitrepo.precompression import (
+    Precompression,
+    available_precompressions,
+)
+from .tutorialcompiler.fromgitrepo.soup_parsing import (
+    available_parser_backends,
+    configure_parser_backend,
+)
 
 
 log_handler = colorlog.StreamHandler()
@@ -57,30 +68,93 @@ logger.addHandler(log_handler)
     default="bundle-zipfile",
     help="what to write: the full bundle zipfile, or just the HTML fragment",
 )
-def main(output_file, repository_path, tip_revision, tutorial_text_source, output_format):
+@click.option(
+    "--cache/--no-cache",
+    "use_cache",
+    default=True,
+    help="whether to use the persistent cache in the repo's git directory",
+)
+@click.option(
+    "--html-parser",
+    type=click.Choice(available_parser_backends()),
+    default=available_parser_backends()[0],
+    help="which parser to use for HTML (lxml is quicker, if installed)",
+)
+@click.option(
+    "-j", "--jobs",
+    "n_jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="how many commits' code changes to process in parallel, in separate processes",
+)
+@click.option(
+    "--code-snapshot-style",
+    type=click.Choice([x.name for x in CodeSnapshotStyle], case_sensitive=False),
+    default=CodeSnapshotStyle.INLINE.name,
+    help=("whether to put each version of the code inline in the HTML,"
+          " or once only, in a table in the bundle"),
+)
+@click.option(
+    "--precompress",
+    "precompressions",
+    type=click.Choice([x.name for x in available_precompressions()],
+                      case_sensitive=False),
+    multiple=True,
+    help=("also write a variant of each text file compressed in this way;"
+          " may be given more than once"),
+)
+def main(
+        output_file,
+        repository_path,
+        tip_revision,
+        tutorial_text_source,
+        output_format,
+        use_cache,
+        html_parser,
+        n_jobs,
+        code_snapshot_style,
+        precompressions,
+):
     if repository_path is None:
         raise click.UsageError(
             "\nUnable to discover repository.  Please specify one\n"
             "either with the -r/--repository-path option or via\n"
             "the GIT_DIR environment variable.")
 
+    configure_parser_backend(html_parser)
+
     # Convert string to enumerator:
     tutorial_text_source = getattr(ProjectHistory.TutorialTextSource,
                                    tutorial_text_source)
+    code_snapshot_style = getattr(CodeSnapshotStyle, code_snapshot_style)
+    precompressions = [getattr(Precompression, p) for p in precompressions]
 
     try:
         if output_format == "bundle-zipfile":
-            compile_fun = compile_fromgitrepo
+            compile_fun = partial(
+                compile_fromgitrepo,
+                code_snapshot_style=code_snapshot_style,
+                precompressions=precompressions,
+            )
         elif output_format == "html-only":
+            if code_snapshot_style is not CodeSnapshotStyle.INLINE:
+                raise click.UsageError(
+                    "html-only output requires INLINE code-snapshot-style")
+            if precompressions:
+                raise click.UsageError(
+                    "html-only output cannot be precompressed")
             compile_fun = compile_html_only_fromgitrepo
         else:
             # (Shouldn't happen, because Click should enforce valid choice.)
             raise click.UsageError(f"unknown output_format \"{output_format}\"")
 
-        compile_fun(output_file,
-                    repository_path,
-                    tip_revision,
-                    tutorial_text_source)
+        with maybe_build_cache(repository_path, use_cache) as build_cache:
+            compile_fun(output_file,
+                        repository_path,
+                        tip_revision,
+                        tutorial_text_source,
+                        build_cache,
+                        n_jobs)
     except TutorialStructureError as err:
         colorlog.error(str(err))
         return 1
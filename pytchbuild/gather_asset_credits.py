@@ -2,6 +2,8 @@ import pygit2
 import click
 
 from .tutorialcompiler.gather_tutorials import TutorialCollection
+from .tutorialcompiler.fromgitrepo.build_cache import maybe_build_cache
+from .tutorialcompiler.fromgitrepo.repo_functions import configure_object_cache
 
 
 @click.command()
@@ -25,7 +27,33 @@ from .tutorialcompiler.gather_tutorials import TutorialCollection
     default="WORKING_DIRECTORY",
     help='what source to use for the "index.yaml" file of tutorials',
 )
-def main(output_file, repository_path, index_source):
+@click.option(
+    "--cache/--no-cache",
+    "use_cache",
+    default=True,
+    help="whether to use the persistent cache in the repo's git directory",
+)
+@click.option(
+    "--git-object-cache-mb",
+    type=click.IntRange(min=1),
+    default=None,
+    metavar="MB",
+    help="size of the git object cache shared by all tutorials",
+)
+@click.option(
+    "-j", "--jobs",
+    "n_jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="how many tutorials to build in parallel, in separate processes",
+)
+def main(output_file, repository_path, index_source, use_cache,
+         git_object_cache_mb, n_jobs):
     index_source = getattr(TutorialCollection.IndexSource, index_source)
-    tutorials = TutorialCollection.from_repo_path(repository_path, index_source)
-    tutorials.write_asset_credits(output_file)
+    if git_object_cache_mb is not None:
+        configure_object_cache(git_object_cache_mb)
+    with maybe_build_cache(repository_path, use_cache) as build_cache:
+        tutorials = TutorialCollection.from_repo_path(
+            repository_path, index_source, build_cache
+        )
+        tutorials.write_asset_credits(output_file, n_jobs)
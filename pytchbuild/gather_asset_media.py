@@ -3,6 +3,8 @@ import click
 import pathlib
 
 from .tutorialcompiler.gather_tutorials import TutorialCollection
+from .tutorialcompiler.fromgitrepo.build_cache import maybe_build_cache
+from .tutorialcompiler.fromgitrepo.repo_functions import configure_object_cache
 
 
 existing_writable_directory = click.Path(
@@ -35,7 +37,33 @@ existing_writable_directory = click.Path(
     default="WORKING_DIRECTORY",
     help='what source to use for the "index.yaml" file of tutorials',
 )
-def main(output_directory, repository_path, index_source):
+@click.option(
+    "--cache/--no-cache",
+    "use_cache",
+    default=True,
+    help="whether to use the persistent cache in the repo's git directory",
+)
+@click.option(
+    "--git-object-cache-mb",
+    type=click.IntRange(min=1),
+    default=None,
+    metavar="MB",
+    help="size of the git object cache shared by all tutorials",
+)
+@click.option(
+    "-j", "--jobs",
+    "n_jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="how many tutorials to build in parallel, in separate processes",
+)
+def main(output_directory, repository_path, index_source, use_cache,
+         git_object_cache_mb, n_jobs):
     index_source = getattr(TutorialCollection.IndexSource, index_source)
-    tutorials = TutorialCollection.from_repo_path(repository_path, index_source)
-    tutorials.write_asset_media(output_directory)
+    if git_object_cache_mb is not None:
+        configure_object_cache(git_object_cache_mb)
+    with maybe_build_cache(repository_path, use_cache) as build_cache:
+        tutorials = TutorialCollection.from_repo_path(
+            repository_path, index_source, build_cache
+        )
+        tutorials.write_asset_media(output_directory, n_jobs)
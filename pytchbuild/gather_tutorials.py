@@ -2,6 +2,17 @@ import pygit2
 import click
 
 from .tutorialcompiler.fromgitrepo import git_repository
+from .tutorialcompiler.fromgitrepo.build_cache import maybe_build_cache
+from .tutorialcompiler.fromgitrepo.code_snapshots import CodeSnapshotStyle
+from .tutorialcompiler.fromgitrepo.precompression import (
+    Precompression,
+    available_precompressions,
+)
+from .tutorialcompiler.fromgitrepo.repo_functions import configure_object_cache
+from .tutorialcompiler.fromgitrepo.soup_parsing import (
+    available_parser_backends,
+    configure_parser_backend,
+)
 from .tutorialcompiler.gather_tutorials import TutorialCollection, commit_to_releases
 
 
@@ -36,7 +47,61 @@ from .tutorialcompiler.gather_tutorials import TutorialCollection, commit_to_rel
     default=None,
     help='recreate the bundle as of a particular "releases" revision',
 )
-def main(output_file, repository_path, index_source, make_release, from_release):
+@click.option(
+    "--cache/--no-cache",
+    "use_cache",
+    default=True,
+    help="whether to use the persistent cache in the repo's git directory",
+)
+@click.option(
+    "--git-object-cache-mb",
+    type=click.IntRange(min=1),
+    default=None,
+    metavar="MB",
+    help="size of the git object cache shared by all tutorials",
+)
+@click.option(
+    "-j", "--jobs",
+    "n_jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="how many tutorials to build in parallel, in separate processes",
+)
+@click.option(
+    "--html-parser",
+    type=click.Choice(available_parser_backends()),
+    default=available_parser_backends()[0],
+    help="which parser to use for HTML (lxml is quicker, if installed)",
+)
+@click.option(
+    "--code-snapshot-style",
+    type=click.Choice([x.name for x in CodeSnapshotStyle], case_sensitive=False),
+    default=CodeSnapshotStyle.INLINE.name,
+    help=("whether to put each version of the code inline in the HTML,"
+          " or once only, in a table in the bundle"),
+)
+@click.option(
+    "--precompress",
+    "precompressions",
+    type=click.Choice([x.name for x in available_precompressions()],
+                      case_sensitive=False),
+    multiple=True,
+    help=("also write a variant of each text file compressed in this way;"
+          " may be given more than once"),
+)
+def main(
+        output_file,
+        repository_path,
+        index_source,
+        make_release,
+        from_release,
+        use_cache,
+        git_object_cache_mb,
+        n_jobs,
+        html_parser,
+        code_snapshot_style,
+        precompressions,
+):
     if from_release is not None:
         if make_release:
             raise click.BadArgumentUsage(
@@ -54,16 +119,34 @@ def main(output_file, repository_path, index_source, make_release, from_release)
         else getattr(TutorialCollection.IndexSource, index_source)
     )
 
-    tutorials = (
-        TutorialCollection.from_repo_path(repository_path, index_source)
-        if from_release is None
-        else TutorialCollection.from_releases_commit(repository_path, from_release)
-    )
+    code_snapshot_style = getattr(CodeSnapshotStyle, code_snapshot_style)
+    precompressions = [getattr(Precompression, p) for p in precompressions]
 
-    releases_commit_oid = None
+    if git_object_cache_mb is not None:
+        configure_object_cache(git_object_cache_mb)
+    configure_parser_backend(html_parser)
 
-    if make_release:
-        with git_repository(repository_path) as repo:
-            releases_commit_oid = commit_to_releases(repo, tutorials)
+    with maybe_build_cache(repository_path, use_cache) as build_cache:
+        tutorials = (
+            TutorialCollection.from_repo_path(
+                repository_path, index_source, build_cache
+            )
+            if from_release is None
+            else TutorialCollection.from_releases_commit(
+                repository_path, from_release, build_cache
+            )
+        )
+
+        releases_commit_oid = None
+
+        if make_release:
+            with git_repository(repository_path) as repo:
+                releases_commit_oid = commit_to_releases(repo, tutorials)
 
-    tutorials.write_new_zipfile(releases_commit_oid, output_file)
+        tutorials.write_new_zipfile(
+            releases_commit_oid,
+            output_file,
+            n_jobs,
+            code_snapshot_style,
+            precompressions,
+        )
@@ -10,15 +10,28 @@ import pygit2
 from .tutorial_history import ProjectHistory
 from .tutorial_bundle import TutorialBundle
 from .tutorial_html_fragment import tutorial_div_from_project_history
+from .code_snapshots import CodeSnapshotStyle
 
 
-def compile(zipfile_out, git_repo_path, tip_revision, tutorial_text_source):
+def compile(
+        zipfile_out,
+        git_repo_path,
+        tip_revision,
+        tutorial_text_source,
+        build_cache=None,
+        n_jobs=1,
+        code_snapshot_style=CodeSnapshotStyle.INLINE,
+        precompressions=(),
+):
     project_history = ProjectHistory(git_repo_path,
                                      tip_revision,
-                                     tutorial_text_source)
+                                     tutorial_text_source,
+                                     build_cache)
 
-    bundle = TutorialBundle.from_project_history(project_history)
-    bundle.write_new_zipfile(zipfile_out)
+    bundle = TutorialBundle.from_project_history(
+        project_history, n_jobs, code_snapshot_style
+    )
+    bundle.write_new_zipfile(zipfile_out, precompressions)
 
 
 def compile_html_only(
@@ -26,11 +39,14 @@ def compile_html_only(
         git_repo_path,
         tip_revision,
         tutorial_text_source,
+        build_cache=None,
+        n_jobs=1,
 ):
     project_history = ProjectHistory(git_repo_path,
                                      tip_revision,
-                                     tutorial_text_source)
-    tutorial_html = tutorial_div_from_project_history(project_history)
+                                     tutorial_text_source,
+                                     build_cache)
+    tutorial_html = tutorial_div_from_project_history(project_history, n_jobs)
 
     # We have this file as binary; explicitly encode.
     html_fragment_out.write(tutorial_html.encode("utf-8"))
@@ -0,0 +1,232 @@
+"""Persistent cache of results derived from immutable git objects
+
+Commits, trees and blobs never change once created, so anything computed
+purely from them can be kept from one run of the tools to the next.  The cache
+is an SQLite database stored inside the repository's git directory, under
+``pytchbuild-cache/``.  It holds one table per kind of result; each table is
+bounded in size, with the least-recently-used entries evicted first.
+"""
+
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import pygit2
+
+from .patch_html import RENDERER_VERSION as PATCH_RENDERER_VERSION
+from .chapter_memo import RENDERER_VERSION as CHAPTER_RENDERER_VERSION
+
+
+CACHE_DIRNAME = "pytchbuild-cache"
+CACHE_FILENAME = "cache.sqlite"
+DEFAULT_MAX_ENTRIES = 50000
+
+
+class PersistentLruTable:
+    """Size-bounded key/value table within a :py:class:`BuildCache`
+
+    Keys are strings; values are anything which can be round-tripped through
+    JSON.  Each entry is stored with the table's *version*, and entries with a
+    different version are treated as absent.  Bump the version when the form
+    of the stored values changes.
+
+    New entries and access times are buffered in memory and written by
+    :py:meth:`flush`, which also performs eviction.
+    """
+
+    def __init__(self, connection, name, version, max_entries):
+        self.connection = connection
+        self.name = name
+        self.version = version
+        self.max_entries = max_entries
+        self.new_value_from_key = {}
+        self.used_keys = set()
+        self.n_hits = 0
+        self.n_misses = 0
+
+        with self.connection:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} ("
+                " key TEXT PRIMARY KEY,"
+                " version INTEGER NOT NULL,"
+                " value TEXT NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+
+    def get(self, key):
+        """The value stored for *key*, or ``None`` if there is none"""
+        if key in self.new_value_from_key:
+            self.n_hits += 1
+            return self.new_value_from_key[key]
+
+        row = self.connection.execute(
+            f"SELECT value FROM {self.name} WHERE key = ? AND version = ?",
+            (key, self.version),
+        ).fetchone()
+
+        if row is None:
+            self.n_misses += 1
+            return None
+
+        self.n_hits += 1
+        self.used_keys.add(key)
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        self.new_value_from_key[key] = value
+
+    def flush(self):
+        now = time.time()
+        new_rows = [
+            (key, self.version, json.dumps(value), now)
+            for key, value in self.new_value_from_key.items()
+        ]
+        used_rows = [(now, key) for key in self.used_keys]
+
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO {self.name}"
+                " (key, version, value, last_used) VALUES (?, ?, ?, ?)",
+                new_rows,
+            )
+            self.connection.executemany(
+                f"UPDATE {self.name} SET last_used = ? WHERE key = ?",
+                used_rows,
+            )
+            self.evict_excess()
+
+        self.new_value_from_key = {}
+        self.used_keys = set()
+
+    def evict_excess(self):
+        (n_entries,) = self.connection.execute(
+            f"SELECT COUNT(*) FROM {self.name}"
+        ).fetchone()
+        n_excess = n_entries - self.max_entries
+        if n_excess > 0:
+            self.connection.execute(
+                f"DELETE FROM {self.name} WHERE key IN"
+                f" (SELECT key FROM {self.name}"
+                "  ORDER BY last_used LIMIT ?)",
+                (n_excess,),
+            )
+
+
+class InMemoryLruTable:
+    """Size-bounded key/value table held only in memory
+
+    Has the same interface as :py:class:`PersistentLruTable`, for use where
+    there is no :py:class:`BuildCache` but results are still worth keeping
+    for the lifetime of some object (e.g., across rebuilds in watch mode).
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.value_from_key = OrderedDict()
+        self.n_hits = 0
+        self.n_misses = 0
+
+    def get(self, key):
+        """The value stored for *key*, or ``None`` if there is none"""
+        value = self.value_from_key.get(key)
+        if value is None:
+            self.n_misses += 1
+            return None
+
+        self.n_hits += 1
+        self.value_from_key.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.value_from_key[key] = value
+        self.value_from_key.move_to_end(key)
+        if len(self.value_from_key) > self.max_entries:
+            self.value_from_key.popitem(last=False)
+
+    def flush(self):
+        pass
+
+
+class BuildCache:
+    """Collection of persistent tables, all in one SQLite database
+
+    .. py:attribute:: commit_deltas
+
+        Keyed by commit OID; the value is the list of deltas of that commit
+        against its first parent (or against the empty tree), in the compact
+        form produced by :py:meth:`DeltaRecord.as_json_obj`.
+
+    .. py:attribute:: rendered_patches
+
+        Keyed by ``"OLD:NEW"``, the OIDs of the code blobs before and after a
+        change; the value is the :py:class:`RenderedCodePatch` of that change,
+        in the form produced by its ``as_json_obj()``.  The table's version is
+        that of the patch renderer.
+
+    .. py:attribute:: rendered_chapters
+
+        Keyed by a digest of a chapter's Markdown source and the commits it
+        refers to; the value is the :py:class:`RenderedChapter` of that
+        source, in the form produced by its ``as_json_obj()``.  The table's
+        version is that of the chapter renderer.
+    """
+
+    def __init__(self, db_path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(db_path, timeout=60.0)
+        self.commit_deltas = PersistentLruTable(
+            self.connection, "commit_deltas", 1, max_entries
+        )
+        self.rendered_patches = PersistentLruTable(
+            self.connection, "rendered_patches", PATCH_RENDERER_VERSION, max_entries
+        )
+        self.rendered_chapters = PersistentLruTable(
+            self.connection, "rendered_chapters", CHAPTER_RENDERER_VERSION, max_entries
+        )
+
+    @classmethod
+    def for_repository(cls, repo, max_entries=DEFAULT_MAX_ENTRIES):
+        """The cache living in the git directory of the given *repo*
+
+        The *repo* can be a ``pygit2.Repository`` or a path to one.
+        """
+        if not isinstance(repo, pygit2.Repository):
+            repo = pygit2.Repository(repo)
+        cache_dir = Path(repo.path) / CACHE_DIRNAME
+        cache_dir.mkdir(exist_ok=True)
+        return cls(cache_dir / CACHE_FILENAME, max_entries)
+
+    @property
+    def tables(self):
+        return [self.commit_deltas, self.rendered_patches, self.rendered_chapters]
+
+    def flush(self):
+        for table in self.tables:
+            table.flush()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+
+@contextmanager
+def maybe_build_cache(repo, use_cache):
+    """Context manager giving a :py:class:`BuildCache` or ``None``
+
+    If *use_cache* is true, open the cache for the given *repo*, and flush and
+    close it on leaving the context.  Otherwise, give ``None``, which all
+    consumers of a cache accept as meaning "do not cache".
+    """
+    if not use_cache:
+        yield None
+        return
+
+    build_cache = BuildCache.for_repository(repo)
+    try:
+        yield build_cache
+    finally:
+        build_cache.close()
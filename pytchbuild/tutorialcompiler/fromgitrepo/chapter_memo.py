@@ -0,0 +1,100 @@
+"""Re-use of rendered chapters from one build of a tutorial to the next
+
+An author typically edits one chapter of ``tutorial.md`` at a time, so most
+chapters of a rebuilt tutorial are the same as last time.  The tutorial text
+is split into per-chapter Markdown sources (see
+:py:func:`markdown_chapter_sources`).  The rendering of such a source depends
+only on its text, the commits its shortcodes refer to, the
+:py:class:`CodeSnapshotStyle`, and the HTML parser backend, so a digest of
+those is used as the key under which the rendered ``chapter-content`` DIVs
+are kept.  A chapter using the ``asset-credits`` shortcode also depends on all the
+tutorial's assets, so is always rendered afresh.
+
+The rendered chapters are kept in the ``rendered_chapters`` table of the
+:py:class:`BuildCache` if there is one, or else in memory for the lifetime of
+the :py:class:`ProjectHistory`, which in watch mode lasts across rebuilds.
+"""
+
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from . import soup_parsing
+from .patch_html import RENDERER_VERSION as PATCH_RENDERER_VERSION
+
+
+# Bump whenever the markup of a chapter, or the information kept alongside it,
+# changes, so that chapters kept in the persistent cache by an earlier version
+# are not used.
+RENDERER_VERSION = 1
+
+DEFAULT_MAX_IN_MEMORY_ENTRIES = 1024
+
+RE_COMMIT_SHORTCODE_SLUG = re.compile(r"\{\{< (?:jr-)?commit (\S+)")
+RE_ASSET_CREDITS_SHORTCODE = re.compile(r"\{\{< asset-credits >\}\}")
+
+
+def source_is_memoisable(chapter_source):
+    return RE_ASSET_CREDITS_SHORTCODE.search(chapter_source) is None
+
+
+def chapter_source_key(project_history, chapter_source, code_snapshot_style):
+    """Digest of everything the rendering of *chapter_source* depends on"""
+    referenced_commits = [
+        [
+            slug,
+            (str(project_history.commit_from_slug[slug].oid)
+             if project_history.slug_is_known(slug)
+             else None),
+        ]
+        for slug in RE_COMMIT_SHORTCODE_SLUG.findall(chapter_source)
+    ]
+    key_obj = [
+        PATCH_RENDERER_VERSION,
+        code_snapshot_style.name,
+        soup_parsing.current_parser_backend,
+        chapter_source,
+        referenced_commits,
+    ]
+    return hashlib.sha1(json.dumps(key_obj).encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class RenderedChapter:
+    """The result of rendering one chapter's Markdown source
+
+    Normally the source gives just one ``chapter-content`` DIV, but a chapter
+    heading in an unexpected form (e.g., underlined) gives more.  Each DIV's
+    HTML is given with whether it is excluded from the progress trail.  Also
+    kept are: the index, among this source's chapters, of the chapter
+    containing any work-in-progress marker; the slugs used by this source's
+    commit and jr-commit shortcodes; and the warnings emitted while rendering,
+    so that they can be repeated when this rendering is re-used.
+    """
+
+    chapters: List[Tuple[str, bool]]
+    maybe_wip_chapter_offset: Optional[int]
+    patch_slugs: List[str]
+    jr_commit_slugs: List[str]
+    warnings: List[str]
+
+    @classmethod
+    def from_json_obj(cls, obj):
+        return cls(
+            [(html, excluded) for html, excluded in obj["chapters"]],
+            obj["maybe_wip_chapter_offset"],
+            obj["patch_slugs"],
+            obj["jr_commit_slugs"],
+            obj["warnings"],
+        )
+
+    def as_json_obj(self):
+        return {
+            "chapters": [[html, excluded] for html, excluded in self.chapters],
+            "maybe_wip_chapter_offset": self.maybe_wip_chapter_offset,
+            "patch_slugs": self.patch_slugs,
+            "jr_commit_slugs": self.jr_commit_slugs,
+            "warnings": self.warnings,
+        }
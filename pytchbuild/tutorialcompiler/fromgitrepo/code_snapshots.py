@@ -0,0 +1,44 @@
+"""Where the HTML of a tutorial gets the full text of its code from
+
+The front end needs the complete ``code.py`` as of various points in the
+tutorial: the initial and final code, and the code as of each commit shown as
+a patch.  By default (:py:attr:`CodeSnapshotStyle.INLINE`), each such
+*snapshot* is held in full in a data attribute of the relevant element, so
+the HTML grows with the product of the number of steps and the size of the
+code.
+
+With :py:attr:`CodeSnapshotStyle.TABLE`, each distinct snapshot is instead
+written once, to the file ``code-snapshots.json`` alongside ``tutorial.html``
+in the bundle.  That file holds a JSON object mapping the OID of a snapshot's
+git blob to its text, and the HTML refers to snapshots by OID.
+"""
+
+import enum
+
+
+SNAPSHOT_TABLE_BASENAME = "code-snapshots.json"
+
+
+class CodeSnapshotStyle(enum.Enum):
+    INLINE = enum.auto()
+    TABLE = enum.auto()
+
+    def front_matter_attrs(self, project_history):
+        """Attributes of the front-matter DIV giving the initial and final code"""
+        if self is CodeSnapshotStyle.INLINE:
+            return {
+                "data-initial-code-text": project_history.initial_code_text,
+                "data-complete-code-text": project_history.final_code_text,
+            }
+        return {
+            "data-initial-code-id": project_history.initial_code_blob_id,
+            "data-complete-code-id": project_history.final_code_blob_id,
+        }
+
+    def patch_attrs(self, project_commit):
+        """Attributes of a patch-container DIV giving the code as of its commit"""
+        if self is CodeSnapshotStyle.INLINE:
+            rendered_patch = project_commit.rendered_code_patch
+            return {"data-code-as-of-commit": rendered_patch.code_text}
+        _, new_blob_id = project_commit.code_blob_ids
+        return {"data-code-as-of-commit-id": new_blob_id}
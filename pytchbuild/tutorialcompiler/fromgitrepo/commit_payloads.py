@@ -0,0 +1,105 @@
+"""Compute the content of a tutorial's commit placeholders, possibly concurrently
+
+Each ``{{< commit >}}`` or ``{{< jr-commit >}}`` shortcode in the tutorial text
+becomes a placeholder DIV, which is filled in with a *payload* computed from the
+code before and after that commit.  For a plain commit, the payload is the
+:py:class:`RenderedCodePatch`; for a jr-commit, it is the JSON of the rich
+commit of the shortcode's kind and arguments.
+
+A payload depends only on the two code blobs (and, for a jr-commit, the kind
+and arguments), so can be computed from the blobs' OIDs in any process with
+access to the repository.  Such computations are most of the work of building a
+long tutorial's HTML, so :py:func:`compute_payloads` can run them in a pool of
+worker processes.  Each result is stored in its :py:class:`ProjectCommit`, from
+where the placeholders are then filled in, in document order, as usual.
+"""
+
+import json
+import dataclasses
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Tuple
+
+from .repo_functions import repository_at_path
+from .structured_diff import StructuredPytchDiff
+from .program_cache import StructuredProgramCache
+from .patch_html import RenderedCodePatch, patch_html
+
+
+# For the structured programs built in a worker process.
+MAX_MEMOISED_PROGRAMS = 64
+
+
+def rich_commit_json(old_program, new_program, kind, args):
+    structured_diff = StructuredPytchDiff.from_programs(old_program, new_program)
+    rich_commit = structured_diff.rich_commit(kind, *args)
+    return json.dumps(dataclasses.asdict(rich_commit))
+
+
+def blob_text(repo, blob_id):
+    return repo[blob_id].data.decode("utf-8")
+
+
+@functools.lru_cache(maxsize=None)
+def structured_program_cache(repo_path):
+    # A worker process is usually sent consecutive jobs, so the new program of
+    # one jr-commit is often the old program of the next.
+    repo = repository_at_path(repo_path)
+    return StructuredProgramCache(
+        repo, functools.partial(blob_text, repo), MAX_MEMOISED_PROGRAMS
+    )
+
+
+def rendered_code_patch_from_blob_ids(repo_path, old_blob_id, new_blob_id):
+    repo = repository_at_path(repo_path)
+    code_patch = repo[old_blob_id].diff(repo[new_blob_id])
+    return RenderedCodePatch(patch_html(code_patch), blob_text(repo, new_blob_id))
+
+
+def rich_commit_json_from_blob_ids(repo_path, old_blob_id, new_blob_id, kind, args):
+    old_program, new_program = structured_program_cache(repo_path).programs(
+        old_blob_id, new_blob_id
+    )
+    return rich_commit_json(old_program, new_program, kind, args)
+
+
+@dataclass
+class PayloadJob:
+    """Computation of one payload, and where to store its result
+
+    The *function* must be a module-level function, and the *args* must be
+    picklable, so that the job can be run in a worker process.  The
+    *store_result* callable is only ever called in the original process.
+    """
+
+    function: Callable[..., Any]
+    args: Tuple
+    store_result: Callable[[Any], None]
+
+
+def call_with_args(function_and_args):
+    function, args = function_and_args
+    return function(*args)
+
+
+def compute_payloads(jobs, n_jobs):
+    """Run all *jobs* in a pool of *n_jobs* worker processes, storing results
+
+    If any job raises an exception (e.g., a :py:class:`TutorialStructureError`
+    because a jr-commit does not match its code change), that exception is
+    re-raised here.
+    """
+    if not jobs:
+        return
+
+    # Send the jobs in a few chunks per worker, since each is fairly quick.
+    chunksize = max(1, len(jobs) // (4 * n_jobs))
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        results = executor.map(
+            call_with_args,
+            [(job.function, job.args) for job in jobs],
+            chunksize=chunksize,
+        )
+        for job, result in zip(jobs, results):
+            job.store_result(result)
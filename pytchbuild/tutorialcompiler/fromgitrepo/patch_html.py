@@ -0,0 +1,116 @@
+"""Render a code patch as HTML text, without building an *HTML soup*
+
+The markup is exactly that which :py:func:`tables_div_from_patch` in
+:py:mod:`tutorial_html_fragment` gives, once that soup is output as text.
+Building the text directly is much quicker than creating several soup elements
+per line of the patch, which matters for tutorials with large code files.  The
+text is put into the tutorial's soup as a single :py:class:`RawHtml` node.
+
+Rendered patches depend only on the code before and after the change, so are
+kept in the :py:class:`BuildCache`, as :py:class:`RenderedCodePatch` instances.
+"""
+
+import itertools
+from dataclasses import dataclass
+import bs4
+
+
+# Bump whenever the markup produced by patch_html() changes, so that renderings
+# kept in the persistent cache by an earlier version are not used.
+RENDERER_VERSION = 1
+
+
+class RawHtml(bs4.element.PreformattedString):
+    """Already-rendered HTML, to be output verbatim as part of a soup"""
+
+    PREFIX = ""
+    SUFFIX = ""
+
+    def output_ready(self, formatter=None):
+        # The base class passes the text through the formatter, only to
+        # ignore the result; for a large fragment, that is most of the cost of
+        # outputting it.
+        return self.PREFIX + self + self.SUFFIX
+
+
+def line_classification(hunk_line):
+    return ("diff-add" if hunk_line.old_lineno == -1
+            else "diff-del" if hunk_line.new_lineno == -1
+            else "diff-unch")
+
+
+def escaped_text(text):
+    """Escape *text* as BeautifulSoup's default ("minimal") formatter does"""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def quoted_attribute_value(value):
+    """Escape and quote *value* as BeautifulSoup does for an attribute value"""
+    value = escaped_text(value)
+    if '"' not in value:
+        return f'"{value}"'
+    if "'" not in value:
+        return f"'{value}'"
+    return '"' + value.replace('"', "&quot;") + '"'
+
+
+def linenum_cell_html(lineno):
+    if lineno == -1:
+        return '<td class="linenum"></td>'
+    return f'<td class="linenum"><pre>{lineno}</pre></td>'
+
+
+def row_html(line):
+    return (
+        "<tr>"
+        + linenum_cell_html(line.old_lineno)
+        + linenum_cell_html(line.new_lineno)
+        + "<td><pre>"
+        + escaped_text(line.content.rstrip("\n"))
+        + "</pre></td></tr>"
+    )
+
+
+def table_html_pieces(hunk):
+    """Yield the pieces of the HTML text of the table for *hunk*"""
+    yield "<table>"
+    for line_class, class_lines in itertools.groupby(hunk.lines, line_classification):
+        lines = list(class_lines)
+        if line_class == "diff-add":
+            added_text = "".join(line.content for line in lines)
+            yield (
+                '<tbody class="diff-add" data-added-text='
+                + quoted_attribute_value(added_text)
+                + ">"
+            )
+        else:
+            yield f'<tbody class="{line_class}">'
+        for line in lines:
+            yield row_html(line)
+        yield "</tbody>"
+    yield "</table>"
+
+
+def patch_html(patch):
+    """HTML text of a DIV of class "patch", holding a table per hunk"""
+    return "".join(itertools.chain(
+        ['<div class="patch">'],
+        itertools.chain.from_iterable(table_html_pieces(h) for h in patch.hunks),
+        ["</div>"],
+    ))
+
+
+@dataclass(frozen=True)
+class RenderedCodePatch:
+    """HTML of a change to the code, along with the code after that change"""
+
+    html: str
+    code_text: str
+
+    @classmethod
+    def from_json_obj(cls, obj):
+        html, code_text = obj
+        return cls(html, code_text)
+
+    def as_json_obj(self):
+        return [self.html, self.code_text]
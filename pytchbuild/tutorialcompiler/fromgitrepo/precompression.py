@@ -0,0 +1,89 @@
+"""Precompressed variants of the text files in a bundle zipfile
+
+A static web server can serve a file ``foo.html`` by sending an existing
+``foo.html.gz`` (or ``foo.html.br``) to a client which accepts that encoding,
+rather than compressing ``foo.html`` for every request or not at all.  The
+functions here write such variants into a bundle zipfile alongside the
+originals.  Gzip is always available; Brotli needs the optional ``brotli``
+package.
+
+The variants are already compressed, so are stored in the zipfile without
+further compression.  They do not depend on when they were made, so a bundle
+built twice from the same content is the same.
+"""
+
+import enum
+import gzip
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# How many files may have variants being computed, or waiting to be written.
+MAX_PENDING_FILES = 8
+
+
+class Precompression(enum.Enum):
+    GZIP = ".gz"
+    BROTLI = ".br"
+
+    @property
+    def suffix(self):
+        return self.value
+
+    @property
+    def is_available(self):
+        return self is not Precompression.BROTLI or brotli is not None
+
+    def compressed(self, data):
+        if self is Precompression.GZIP:
+            return gzip.compress(data, compresslevel=9, mtime=0)
+        return brotli.compress(data)
+
+
+def available_precompressions():
+    return [p for p in Precompression if p.is_available]
+
+
+def write_file_and_variants(out_zipfile, path, data, variant_futures):
+    out_zipfile.writestr(str(path), data)
+    for precompression, compressed in variant_futures:
+        out_zipfile.writestr(
+            str(path) + precompression.suffix,
+            compressed.result(),
+            compress_type=zipfile.ZIP_STORED,
+        )
+
+
+def write_text_files(out_zipfile, paths_and_data, precompressions=()):
+    """Write each (path, data) pair, and its variants, to *out_zipfile*
+
+    Each file is followed by its variants, in the order of *precompressions*.
+    The compressors do not hold the GIL while working, so the variants are
+    computed in a pool of threads.  Each file is written, with its variants,
+    once they are ready, so at most MAX_PENDING_FILES files' variants are
+    held at once.
+    """
+    if not precompressions:
+        for path, data in paths_and_data:
+            out_zipfile.writestr(str(path), data)
+        return
+
+    with ThreadPoolExecutor() as executor:
+        pending_files = deque()
+        for path, data in paths_and_data:
+            variant_futures = [
+                (precompression, executor.submit(precompression.compressed, data))
+                for precompression in precompressions
+            ]
+            pending_files.append((path, data, variant_futures))
+            if len(pending_files) > MAX_PENDING_FILES:
+                write_file_and_variants(out_zipfile, *pending_files.popleft())
+
+        while pending_files:
+            write_file_and_variants(out_zipfile, *pending_files.popleft())
@@ -0,0 +1,55 @@
+"""Structured programs of code blobs, kept for re-use
+
+In a per-method tutorial, the new code of one jr-commit is the old code of the
+next, and consecutive versions of the code differ in only one class or method.
+A :py:class:`StructuredProgramCache` therefore keeps recently-built programs,
+so that each version of the code is parsed only once, and builds the program
+of a commit's new code from that of its old code, re-parsing only the classes
+which the commit's diff touches.
+"""
+
+from .build_cache import InMemoryLruTable
+from .structured_program import StructuredPytchProgram
+
+
+class StructuredProgramCache:
+    """Size-bounded map from code blob OID to that code's structured program
+
+    The text of a blob is found by calling *text_from_blob_id*.  The programs
+    are not modified once built, so can be shared.
+    """
+
+    DEFAULT_MAX_ENTRIES = 64
+
+    def __init__(self, repo, text_from_blob_id, max_entries=DEFAULT_MAX_ENTRIES):
+        self.repo = repo
+        self.text_from_blob_id = text_from_blob_id
+        self.table = InMemoryLruTable(max_entries)
+
+    def program(self, blob_id):
+        """The :py:class:`StructuredPytchProgram` of the given blob's text"""
+        key = str(blob_id)
+        program = self.table.get(key)
+        if program is None:
+            program = StructuredPytchProgram(self.text_from_blob_id(key))
+            self.table.put(key, program)
+        return program
+
+    def programs(self, old_blob_id, new_blob_id):
+        """The programs of the given blobs' texts, as a pair
+
+        If the new program has to be built, it is built incrementally from the
+        old one, guided by the hunks of the diff between the two blobs.
+        """
+        old_program = self.program(old_blob_id)
+        key = str(new_blob_id)
+        new_program = self.table.get(key)
+        if new_program is None:
+            code_patch = self.repo[str(old_blob_id)].diff(
+                self.repo[key], context_lines=0
+            )
+            new_program = StructuredPytchProgram.from_previous(
+                old_program, self.text_from_blob_id(key), code_patch.hunks
+            )
+            self.table.put(key, new_program)
+        return old_program, new_program
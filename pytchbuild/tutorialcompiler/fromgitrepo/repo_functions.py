@@ -1,7 +1,49 @@
+import functools
 import pygit2
 import time
 
 
+# Largest individual object of each type which the cache will hold once
+# configure_object_cache() has been called.  The libgit2 defaults are
+# 4kB for commits and trees, and zero (i.e., never cache) for blobs.
+# Tutorial trees, code files, and Markdown files are often bigger.
+CACHED_OBJECT_SIZE_LIMITS = {
+    pygit2.enums.ObjectType.COMMIT: 64 * 1024,
+    pygit2.enums.ObjectType.TREE: 1024 * 1024,
+    pygit2.enums.ObjectType.BLOB: 256 * 1024,
+}
+
+# The size (in MB) most recently given to configure_object_cache(), or None if
+# the cache has its libgit2 default settings.  Recorded so that worker
+# processes can be configured to match.
+configured_object_cache_mb = None
+
+
+def configure_object_cache(max_size_mb):
+    """Set the size of libgit2's in-memory object cache
+
+    The cache is shared by all objects of a given ``pygit2.Repository``, so is
+    most effective when one such object is used for all tutorials of a
+    collection.  As well as setting the overall size, allow larger trees and
+    blobs (but not very large blobs such as most images) to be cached.
+    """
+    global configured_object_cache_mb
+    pygit2.settings.cache_max_size(max_size_mb * 1024 * 1024)
+    for object_type, size_limit in CACHED_OBJECT_SIZE_LIMITS.items():
+        pygit2.settings.cache_object_limit(object_type, size_limit)
+    configured_object_cache_mb = max_size_mb
+
+
+@functools.lru_cache(maxsize=None)
+def repository_at_path(path):
+    """The ``pygit2.Repository`` at *path*, opened at most once per process
+
+    Used when re-creating objects in worker processes, where many such objects
+    can then share one ``Repository`` and its object cache.
+    """
+    return pygit2.Repository(path)
+
+
 def create_signature(repo):
     return pygit2.Signature(
         repo.config["user.name"],
@@ -0,0 +1,59 @@
+"""Parsing of HTML fragments into *HTML soups*
+
+BeautifulSoup can use various parsers.  The pure-Python ``"html.parser"`` is
+always available.  The ``"lxml"`` parser is quicker, but is an optional
+dependency.  By default, ``"lxml"`` is used if it is installed.  The choice
+applies to the whole process, and can be changed with
+:py:func:`configure_parser_backend`.
+
+The parsers differ in how they treat a fragment of HTML: lxml wraps it in
+``<html>`` and ``<body>`` elements, whereas html.parser does not.  Undoing
+lxml's wrapping is slow for large fragments, so :py:func:`parsed_fragment`
+instead gives whichever node directly contains the fragment's top-level nodes.
+"""
+
+import bs4
+
+
+PARSER_BACKENDS = ["lxml", "html.parser"]
+
+
+def parser_backend_is_available(name):
+    try:
+        bs4.BeautifulSoup("", name)
+    except bs4.FeatureNotFound:
+        return False
+    return True
+
+
+def available_parser_backends():
+    """Names of the parser backends which can be used, fastest first"""
+    return [name for name in PARSER_BACKENDS if parser_backend_is_available(name)]
+
+
+current_parser_backend = available_parser_backends()[0]
+
+
+def configure_parser_backend(name):
+    """Use the parser backend *name* for all subsequent parsing"""
+    global current_parser_backend
+    if not parser_backend_is_available(name):
+        raise ValueError(f'HTML parser backend "{name}" is not available')
+    current_parser_backend = name
+
+
+def new_empty_soup():
+    return bs4.BeautifulSoup("", current_parser_backend)
+
+
+def parsed_fragment(html):
+    """Node whose children are the top-level nodes of the HTML fragment *html*
+
+    The fragment should be of content for an HTML body.  With html.parser, the
+    result is the soup itself; with lxml, it is the ``<body>`` element of the
+    soup (unless the fragment is empty).  It can be searched, or have its
+    children iterated over or copied, but should not itself be output.
+    """
+    soup = bs4.BeautifulSoup(html, current_parser_backend)
+    maybe_body = soup.body if current_parser_backend == "lxml" else None
+    return soup if maybe_body is None else maybe_body
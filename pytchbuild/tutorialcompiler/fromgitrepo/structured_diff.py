@@ -70,6 +70,18 @@ class StructuredPytchDiff:
     old_code: str
     new_code: str
 
+    @classmethod
+    def from_programs(cls, old_program, new_program):
+        """Diff between two already-built :py:class:`StructuredPytchProgram`s
+
+        The programs are not modified, so can be shared, e.g., between the
+        diffs of consecutive commits.
+        """
+        diff = cls(old_program.code_text, new_program.code_text)
+        diff.__dict__["old_program"] = old_program
+        diff.__dict__["new_program"] = new_program
+        return diff
+
     @cached_property
     def old_program(self):
         return StructuredPytchProgram(self.old_code)
@@ -153,9 +165,9 @@ class StructuredPytchDiff:
 
     def assert_code_unchanged(self, old_script, new_script):
         assert new_script.path == old_script.path
-        old_code_lines = old_script.script.body_lines
-        new_code_lines = new_script.script.body_lines
-        if new_code_lines != old_code_lines:
+        if new_script.script.body_text != old_script.script.body_text:
+            old_code_lines = old_script.script.body_lines
+            new_code_lines = new_script.script.body_lines
             raise TutorialStructureError(
                 f"expecting code for script at {old_script.path}"
                 f" to be unchanged, but found {old_code_lines} for old"
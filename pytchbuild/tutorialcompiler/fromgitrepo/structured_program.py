@@ -1,6 +1,9 @@
 import ast
+import dataclasses
+from collections import defaultdict
 from dataclasses import dataclass
-from typing import Any, Literal
+from typing import Literal
+from .cached_property import cached_property
 from .errors import TutorialStructureError
 from .utils import make_of_kind
 from .interop import (
@@ -161,47 +164,83 @@ class EventHandlerSummary:
 
 ########################################################################
 
-@dataclass
+def body_suite_text_from_lines(body_lines):
+    """Method body, deindented as if it were at top level."""
+
+    lines = [line.rstrip() for line in body_lines]
+    deindented_lines = [deindented_line(line) for line in lines]
+
+    # When a commit adds an "empty" script, it in fact acts a script
+    # with body just "pass".  This keeps the code syntactically valid.
+    # Map back to truly empty when presenting to the learner:
+    if deindented_lines == ["pass"]:
+        return ""
+    else:
+        return "\n".join(deindented_lines)
+
+
+@dataclass(frozen=True, slots=True)
 class EventHandler:
-    """Python event handler as it appears in AST."""
+    """Python event handler, as found from its method's AST.
+
+    Only the results of interpreting the AST are kept: the event
+    described by the method's decorator; the method body, both as
+    written (`body_text`) and deindented (`body_suite_text`); and the
+    line numbers of the method.  Holding no AST nodes or copies of the
+    program's lines keeps cached programs small.
+    """
     actor_name: str
     method_name: str
+    event: EventDescriptor
+    body_text: str
+    body_suite_text: str
     body_lineno_lb: int
-    decorators: [Any]
     funcdef_lineno_lb: int
     funcdef_lineno_ub: int
-    body_lines: [str]
 
-    def __post_init__(self):
-        n_decorators = len(self.decorators)
+    @classmethod
+    def from_methoddef(cls, actor_name, mdef, code_lines):
+        """Handler for the method definition `mdef` of an actor.
+
+        The `code_lines` are those of the whole program, preceded by a
+        padding entry, so that they can be indexed by AST line numbers.
+        """
+        n_decorators = len(mdef.decorator_list)
         if n_decorators != 1:
             raise TutorialStructureError(
-                f"expecting method {self.actor_name}.{self.method_name}"
+                f"expecting method {actor_name}.{mdef.name}"
                 f" to have one decorator but found {n_decorators}"
             )
 
-    @property
-    def body_suite_text(self):
-        """Method body, deindented as if it were at top level."""
-
-        lines = [line.rstrip() for line in self.body_lines]
-        deindented_lines = [deindented_line(line) for line in lines]
-
-        # When a commit adds an "empty" script, it in fact acts a script
-        # with body just "pass".  This keeps the code syntactically valid.
-        # Map back to truly empty when presenting to the learner:
-        if deindented_lines == ["pass"]:
-            return ""
-        else:
-            return "\n".join(deindented_lines)
+        body_lineno_lb = mdef.body[0].lineno
+        lineno_ub = mdef.end_lineno + 1
+        body_lines = code_lines[body_lineno_lb:lineno_ub]
+        return cls(
+            actor_name,
+            mdef.name,
+            EventDescriptor_from_decorator_node(mdef.decorator_list[0]),
+            "\n".join(body_lines),
+            body_suite_text_from_lines(body_lines),
+            body_lineno_lb,
+            mdef.lineno,
+            lineno_ub,
+        )
 
-    @property
-    def _decorator(self):
-        return self.decorators[0]
+    def shifted(self, n_lines):
+        """Copy of this handler, moved `n_lines` further down the program."""
+        if n_lines == 0:
+            return self
+        return dataclasses.replace(
+            self,
+            body_lineno_lb=self.body_lineno_lb + n_lines,
+            funcdef_lineno_lb=self.funcdef_lineno_lb + n_lines,
+            funcdef_lineno_ub=self.funcdef_lineno_ub + n_lines,
+        )
 
     @property
-    def event(self):
-        return EventDescriptor_from_decorator_node(self._decorator)
+    def body_lines(self):
+        """Lines of the method body, as written."""
+        return self.body_text.split("\n")
 
     @property
     def summary(self):
@@ -252,6 +291,17 @@ class ActorCode:
     def new_plain_stage(cls):
         return cls("Stage", "stage", [PLAIN_STAGE_BACKDROP], [])
 
+    def shifted(self, n_lines):
+        """Copy of this actor, with its handlers moved `n_lines` down."""
+        if n_lines == 0:
+            return self
+        return ActorCode(
+            self.name,
+            self.kind,
+            self.appearances,
+            [handler.shifted(n_lines) for handler in self.handlers],
+        )
+
     @property
     def identifier(self):
         return ActorIdentifier_make(self.kind, self.name)
@@ -289,27 +339,162 @@ class ActorScript:
 
 ########################################################################
 
+@dataclass(frozen=True)
+class ClassBlock:
+    """Lines of a top-level class definition, and the resulting actor.
+
+    The line numbers are 1-based and inclusive, and cover any
+    decorators of the class.
+    """
+    lineno_lb: int
+    lineno_ub: int
+    actor_code: ActorCode
+
+    def shifted(self, n_lines):
+        return ClassBlock(
+            self.lineno_lb + n_lines,
+            self.lineno_ub + n_lines,
+            self.actor_code.shifted(n_lines),
+        )
+
+
+def hunk_touches_lines(hunk, lineno_lb, lineno_ub):
+    """Whether `hunk` might change the class on the given lines.
+
+    As well as a change to the class's own lines, a change to the line
+    just after it, or an insertion just after it, might extend the
+    class.
+    """
+    if hunk.old_lines == 0:
+        # Pure insertion, after line old_start.
+        return lineno_lb <= hunk.old_start <= lineno_ub
+    hunk_old_ub = hunk.old_start + hunk.old_lines - 1
+    return hunk.old_start <= lineno_ub + 1 and hunk_old_ub >= lineno_lb
+
+
+def hunk_precedes_line(hunk, lineno):
+    if hunk.old_lines == 0:
+        return hunk.old_start < lineno
+    return hunk.old_start + hunk.old_lines - 1 < lineno
+
+
+def parsed_region(code_lines, lineno_lb, lineno_ub):
+    """AST of the given lines, with the line numbers of the whole program."""
+    region_text = "\n".join(code_lines[lineno_lb:lineno_ub + 1])
+    region_ast = ast.parse(region_text)
+    ast.increment_lineno(region_ast, lineno_lb - 1)
+    return region_ast
+
+
+def incremental_segments(previous, code_lines, hunks):
+    """Pieces from which to build the program with the given `code_lines`.
+
+    The `code_lines` are those of the new program, with a padding
+    entry, and `hunks` are those of the diff from the `previous`
+    program's code to the new code, with no lines of context.
+
+    A class of `previous` which no hunk touches is carried over as a
+    `ClassBlock`, moved by however many lines the hunks before it add
+    or remove.  The rest of the code, between such classes, is parsed
+    as a region of its own, giving an `ast.Module`.  If a region does
+    not parse, the changes might have (e.g.) opened a string which
+    continues into a carried-over class, so give `None`, meaning that
+    the whole program must be parsed.
+    """
+    kept_blocks = []
+    for block in previous.class_blocks:
+        if any(
+            hunk_touches_lines(hunk, block.lineno_lb, block.lineno_ub)
+            for hunk in hunks
+        ):
+            continue
+        n_lines_shift = sum(
+            hunk.new_lines - hunk.old_lines
+            for hunk in hunks
+            if hunk_precedes_line(hunk, block.lineno_lb)
+        )
+        kept_blocks.append(block.shifted(n_lines_shift))
+
+    segments = []
+    try:
+        region_lineno_lb = 1
+        for block in kept_blocks:
+            segments.append(
+                parsed_region(code_lines, region_lineno_lb, block.lineno_lb - 1)
+            )
+            segments.append(block)
+            region_lineno_lb = block.lineno_ub + 1
+        segments.append(
+            parsed_region(code_lines, region_lineno_lb, len(code_lines) - 1)
+        )
+    except SyntaxError:
+        return None
+
+    return segments
+
+
 class StructuredPytchProgram:
-    """Representation of a Pytch program as actors with scripts."""
+    """Representation of a Pytch program as actors with scripts.
+
+    A program is not changed once built.  The collections of its
+    appearances and scripts, and the index of its handlers by path, are
+    therefore computed only once, when first needed, and given as
+    tuples.
+    """
+
+    def __init__(self, code_text, previous=None, hunks=None):
+        """Build the program of the given `code_text`.
 
-    def __init__(self, code_text):
+        If a `previous` program is given, with the `hunks` (as of a
+        `pygit2.DiffHunk`, with no context lines) of the diff from its
+        code to `code_text`, then re-parse only the parts of the code
+        near the hunks, re-using the other classes of `previous`.
+        Where that is not possible, parse the whole program.
+        """
+        self.code_text = code_text
         # Line numbers reported in AST nodes are 1-based.  Prepend a
         # padding entry to give a list where we can use those 1-based
         # numbers as indexes:
-        self.code_lines = ["PADDING"] + code_text.split("\n")
+        code_lines = ["PADDING"] + code_text.split("\n")
         self.top_level_classes = {}
-        code_ast = ast.parse(code_text)
-        for stmt in code_ast.body:
-            if isinstance(stmt, ast.ClassDef):
-                self.ingest_classdef(stmt)
+        self.class_blocks = []
+
+        maybe_segments = (
+            None
+            if previous is None
+            else incremental_segments(previous, code_lines, hunks)
+        )
+        segments = (
+            [ast.parse(code_text)]
+            if maybe_segments is None
+            else maybe_segments
+        )
+
+        for segment in segments:
+            if isinstance(segment, ClassBlock):
+                self.ingest_class_block(segment)
+            else:
+                for stmt in segment.body:
+                    if isinstance(stmt, ast.ClassDef):
+                        self.ingest_classdef(stmt, code_lines)
 
-    def ingest_classdef(self, cdef):
+    @classmethod
+    def from_previous(cls, previous, code_text, hunks):
+        """Program of `code_text`, re-using what it can of `previous`."""
+        return cls(code_text, previous, list(hunks))
+
+    def ingest_class_block(self, block):
+        """Add an already-built ActorCode instance."""
+        self.top_level_classes[block.actor_code.name] = block.actor_code
+        self.class_blocks.append(block)
+
+    def ingest_classdef(self, cdef, code_lines):
         """Add an ActorCode instance for a class definition."""
         actor_code = ActorCode.new_empty(cdef)
         self.top_level_classes[cdef.name] = actor_code
         for stmt in cdef.body:
             if isinstance(stmt, ast.FunctionDef):
-                self.ingest_methoddef(actor_code, stmt)
+                self.ingest_methoddef(actor_code, stmt, code_lines)
             elif isinstance(stmt, ast.Assign):
                 self.ingest_assignment(actor_code, stmt)
             else:
@@ -317,20 +502,16 @@ class StructuredPytchProgram:
                 raise TutorialStructureError(
                     f"unexpected {cls_name} statement in classdef"
                 )
+        lineno_lb = min(
+            [cdef.lineno] + [node.lineno for node in cdef.decorator_list]
+        )
+        self.class_blocks.append(
+            ClassBlock(lineno_lb, cdef.end_lineno, actor_code)
+        )
 
-    def ingest_methoddef(self, actor_code, mdef):
+    def ingest_methoddef(self, actor_code, mdef, code_lines):
         """Add a handler to actor_code for a method definition."""
-        body_lineno_lb = mdef.body[0].lineno
-        lineno_ub = mdef.end_lineno + 1
-        handler = EventHandler(
-            actor_code.name,
-            mdef.name,
-            body_lineno_lb,
-            mdef.decorator_list,
-            mdef.lineno,
-            lineno_ub,
-            self.code_lines[body_lineno_lb:lineno_ub]
-        )
+        handler = EventHandler.from_methoddef(actor_code.name, mdef, code_lines)
         actor_code.handlers.append(handler)
 
     def ingest_assignment(self, actor_code, stmt):
@@ -377,40 +558,45 @@ class StructuredPytchProgram:
         """Fresh list of all actors, as `ActorCode` instances."""
         return list(self.top_level_classes.values())
 
-    @property
+    @cached_property
     def all_appearances(self):
         """All costumes/backdrops in context of each one's actor."""
-        return [
+        return tuple(
             ActorAppearance(actor_code.identifier, appearance_name)
             for actor_code in self.top_level_classes.values()
             for appearance_name in actor_code.appearances
-        ]
+        )
 
-    @property
+    @cached_property
     def all_scripts(self):
         """All scripts in context of each one's actor."""
-        return [
+        return tuple(
             ActorScript(actor_code.identifier, handler)
             for actor_code in self.top_level_classes.values()
             for handler in actor_code.handlers
-        ]
+        )
 
-    @property
+    @cached_property
     def all_script_paths(self):
         """Paths of all scripts."""
-        return [script.path for script in self.all_scripts]
+        return tuple(script.path for script in self.all_scripts)
+
+    @cached_property
+    def handlers_from_path(self):
+        """Map from path to the list of handlers at that path.
+
+        There should be exactly one handler at each path, but (e.g.)
+        two Stage classes, or two methods of the same name, would give
+        more.
+        """
+        handlers_from_path = defaultdict(list)
+        for script in self.all_scripts:
+            handlers_from_path[script.path].append(script.script)
+        return dict(handlers_from_path)
 
     def handler_from_path(self, path):
         """The unique handler at the given `path`."""
-        scripts = [
-            handler
-            for actor_code in self.top_level_classes.values()
-            for handler in actor_code.handlers
-            if (
-                actor_code.identifier == path.actor
-                and handler.method_name == path.methodName
-            )
-        ]
+        scripts = self.handlers_from_path.get(path, [])
 
         n_found = len(scripts)
         if n_found != 1:
@@ -1,5 +1,5 @@
 from dataclasses import dataclass, asdict
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from contextlib import closing
 from pathlib import Path
 import zipfile
@@ -12,6 +12,9 @@ from .tutorial_html_fragment import (
     summary_div_from_project_history,
 )
 from .structured_program import StructuredPytchProgram
+from .code_snapshots import CodeSnapshotStyle, SNAPSHOT_TABLE_BASENAME
+from .precompression import write_text_files
+from .soup_parsing import parsed_fragment
 
 
 @dataclass
@@ -22,62 +25,135 @@ class TutorialBundle:
     assets: List[Asset]
     final_code_text: str
     metadata: Dict[str, Any]
+    maybe_code_snapshots: Optional[Dict[str, str]] = None
 
     @classmethod
-    def from_project_history(cls, project_history):
+    def from_project_history(
+            cls,
+            project_history,
+            n_jobs=1,
+            code_snapshot_style=CodeSnapshotStyle.INLINE,
+    ):
+        maybe_code_snapshots = (
+            project_history.code_snapshots
+            if code_snapshot_style is CodeSnapshotStyle.TABLE
+            else None
+        )
         return cls(
             Path(project_history.top_level_directory_name),
-            tutorial_div_from_project_history(project_history),
+            tutorial_div_from_project_history(
+                project_history, n_jobs, code_snapshot_style
+            ),
             summary_div_from_project_history(project_history),
             project_history.all_assets,
             project_history.final_code_text,
             json.loads(project_history.metadata_text),
+            maybe_code_snapshots,
         )
 
-    def maybe_write_structured_json(self, out_zipfile):
+    def maybe_structured_json_bytes(self):
         program_kind = self.metadata.get("programKind", "flat")
         if program_kind != "per-method":
-            return
+            return None
 
         program = (
             StructuredPytchProgram(self.final_code_text)
             .as_NoIdsStructuredProject()
         )
         program_json = json.dumps(asdict(program))
+        return program_json.encode("utf-8")
+
+    def maybe_code_snapshots_bytes(self):
+        if self.maybe_code_snapshots is None:
+            return None
+        return json.dumps(self.maybe_code_snapshots).encode("utf-8")
+
+    def rendered(self):
+        return RenderedTutorialBundle(
+            self.top_level_directory_name,
+            self.tutorial_html.encode("utf-8"),
+            self.summary_html.encode("utf-8"),
+            self.assets,
+            self.maybe_structured_json_bytes(),
+            self.maybe_code_snapshots_bytes(),
+        )
 
-        bundle_root_path = Path(self.top_level_directory_name)
-        path = bundle_root_path / "skeleton-structured-program.json"
+    def write_to_zipfile(self, out_zipfile, precompressions=()):
+        self.rendered().write_to_zipfile(out_zipfile, precompressions)
 
-        out_zipfile.writestr(
-            str(path),
-            program_json.encode("utf-8")
-        )
+    def write_new_zipfile(self, out_file, precompressions=()):
+        bare_zfile = zipfile.ZipFile(out_file,
+                                     mode="w",
+                                     compression=zipfile.ZIP_DEFLATED)
+
+        with closing(bare_zfile) as zfile:
+            self.write_to_zipfile(zfile, precompressions)
 
-    def write_to_zipfile(self, out_zipfile):
-        bundle_root_path = Path(self.top_level_directory_name)
 
-        tutorial_html_path = bundle_root_path / "tutorial.html"
-        tutorial_html_bytes = self.tutorial_html.encode("utf-8")
-        out_zipfile.writestr(str(tutorial_html_path), tutorial_html_bytes)
+@dataclass
+class RenderedTutorialBundle:
+    """A :py:class:`TutorialBundle` with all its text already rendered
 
-        summary_html_path = bundle_root_path / "summary.html"
-        summary_html_bytes = self.summary_html.encode("utf-8")
-        out_zipfile.writestr(str(summary_html_path), summary_html_bytes)
+    Unlike a ``TutorialBundle``, which holds BeautifulSoup trees, instances
+    of this class can be pickled, and so built in a worker process.
+    """
+
+    top_level_directory_name: Path
+    tutorial_html_bytes: bytes
+    summary_html_bytes: bytes
+    assets: List[Asset]
+    maybe_structured_json_bytes: Optional[bytes]
+    maybe_code_snapshots_bytes: Optional[bytes] = None
+
+    @classmethod
+    def from_project_history(
+            cls,
+            project_history,
+            code_snapshot_style=CodeSnapshotStyle.INLINE,
+    ):
+        bundle = TutorialBundle.from_project_history(
+            project_history, code_snapshot_style=code_snapshot_style
+        )
+        return bundle.rendered()
+
+    @property
+    def summary_html(self):
+        """The summary ``<div>``, freshly parsed from its rendered form
+        """
+        fragment = parsed_fragment(self.summary_html_bytes.decode("utf-8"))
+        return fragment.find("div")
+
+    def text_files(self):
+        """List of (path, data) pairs for the bundle's files other than assets
+        """
+        bundle_root_path = Path(self.top_level_directory_name)
 
         project_asset_paths = [a.path for a in self.assets if a.is_project_asset]
-        assets_manifest_path = bundle_root_path / "project-assets.json"
         assets_manifest_bytes = json.dumps(project_asset_paths).encode("utf-8")
-        out_zipfile.writestr(str(assets_manifest_path), assets_manifest_bytes)
 
-        self.maybe_write_structured_json(out_zipfile)
+        text_files = [
+            (bundle_root_path / "tutorial.html", self.tutorial_html_bytes),
+            (bundle_root_path / "summary.html", self.summary_html_bytes),
+            (bundle_root_path / "project-assets.json", assets_manifest_bytes),
+        ]
 
-        for asset in self.assets:
-            out_zipfile.writestr(asset.path, asset.data)
+        if self.maybe_structured_json_bytes is not None:
+            path = bundle_root_path / "skeleton-structured-program.json"
+            text_files.append((path, self.maybe_structured_json_bytes))
 
-    def write_new_zipfile(self, out_file):
-        bare_zfile = zipfile.ZipFile(out_file,
-                                     mode="w",
-                                     compression=zipfile.ZIP_DEFLATED)
+        if self.maybe_code_snapshots_bytes is not None:
+            path = bundle_root_path / SNAPSHOT_TABLE_BASENAME
+            text_files.append((path, self.maybe_code_snapshots_bytes))
 
-        with closing(bare_zfile) as zfile:
-            self.write_to_zipfile(zfile)
+        return text_files
+
+    def write_to_zipfile(self, out_zipfile, precompressions=()):
+        """Write the bundle's files to *out_zipfile*
+
+        Each text file (but not asset) is accompanied by a variant compressed
+        with each of the given *precompressions*.
+        """
+        write_text_files(out_zipfile, self.text_files(), precompressions)
+
+        for asset in self.assets:
+            out_zipfile.writestr(asset.path, asset.data)
@@ -30,15 +30,31 @@ the tutorial itself, such as screenshots or diagrams.
 import re
 import pathlib
 import pygit2
-from collections import Counter
+from collections import Counter, OrderedDict
 import itertools
+from functools import partial
 import enum
 import colorlog
 import json
 from pathlib import Path
 from dataclasses import dataclass
+from typing import FrozenSet, Optional, Tuple
 from .cached_property import cached_property
 from .errors import InternalError, TutorialStructureError
+from .repo_functions import repository_at_path
+from .patch_html import RenderedCodePatch, patch_html
+from .build_cache import InMemoryLruTable
+from .structured_program import StructuredPytchProgram
+from .program_cache import StructuredProgramCache
+from .chapter_memo import (
+    DEFAULT_MAX_IN_MEMORY_ENTRIES as DEFAULT_MAX_IN_MEMORY_CHAPTERS,
+)
+from .commit_payloads import (
+    PayloadJob,
+    rendered_code_patch_from_blob_ids,
+    rich_commit_json,
+    rich_commit_json_from_blob_ids,
+)
 from ..medialib import (
     MediaLibraryItem as MLItem,
     MediaLibraryEntry as MLEntry,
@@ -61,17 +77,47 @@ METADATA_FILE_BASENAME = "metadata.json"
 
 ################################################################################
 
-@dataclass
 class Asset:
     """An asset (graphics or sound) used in the tutorial's project
+
+    Constructed either directly from a path and the asset's data, or, via
+    :py:meth:`from_delta` or :py:meth:`from_blob`, from a path and the OID of a
+    blob in a repository.  In the latter case, the data is only read from the
+    repository when the ``data`` property is accessed, and is not retained.
+    This keeps memory use down when working with many assets, most of which
+    we only need the paths of.
     """
 
-    path: str
-    data: bytes
+    def __init__(self, path, data=None, repo=None, blob_id=None):
+        if (data is None) == (repo is None or blob_id is None):
+            raise InternalError("need exactly one of data or repo/blob_id")
+        self.path = path
+        self.maybe_data = data
+        self.repo = repo
+        self.blob_id = blob_id
+
+    def __getstate__(self):
+        # Neither a Repository nor an Oid can be pickled, so store the
+        # repository's path, to be re-opened (once per process) on
+        # unpickling, and the blob's OID as a string.
+        state = dict(self.__dict__)
+        if self.repo is not None:
+            state["repo"] = self.repo.path
+            state["blob_id"] = str(self.blob_id)
+        return state
+
+    def __setstate__(self, state):
+        if state["repo"] is not None:
+            state["repo"] = repository_at_path(state["repo"])
+        self.__dict__.update(state)
 
     def __str__(self):
         return ('<Asset "{}": {} bytes>'
-                .format(self.path, len(self.data)))
+                .format(self.path, self.size))
+
+    @classmethod
+    def from_blob(cls, path, repo, blob_id):
+        return cls(path, repo=repo, blob_id=blob_id)
 
     @classmethod
     def from_delta(cls, repo, delta):
@@ -83,7 +129,22 @@ class Asset:
         ]:
             raise InternalError("delta is not of type ADDED or MODIFIED")
 
-        return cls(delta.new_file.path, repo[delta.new_file.id].data)
+        return cls.from_blob(delta.new_file.path, repo, delta.new_file.id)
+
+    @property
+    def data(self):
+        """The content of the asset, read from the repo if necessary
+        """
+        if self.maybe_data is not None:
+            return self.maybe_data
+        return self.repo[self.blob_id].data
+
+    @cached_property
+    def size(self):
+        if self.maybe_data is not None:
+            return len(self.maybe_data)
+        _, size = self.repo.odb.read_header(self.blob_id)
+        return size
 
     @cached_property
     def is_project_asset(self):
@@ -109,6 +170,322 @@ class Asset:
         return "/".join(Path(self.path).parts[2:])
 
 
+################################################################################
+
+@dataclass(frozen=True)
+class DeltaFile:
+    """One side (old or new) of a :py:class:`DeltaRecord`
+    """
+
+    path: str
+    id: str
+
+
+@dataclass(frozen=True)
+class DeltaRecord:
+    """Compact summary of a ``pygit2.DiffDelta``
+
+    Has the same shape as the parts of a ``pygit2.DiffDelta`` which we use,
+    namely ``status``, and the ``path`` and ``id`` of each of ``old_file`` and
+    ``new_file``, but can be stored in a :py:class:`BuildCache`.  The ``id``
+    values are hex strings, which work as keys into a ``pygit2.Repository``.
+    """
+
+    status: int
+    old_file: DeltaFile
+    new_file: DeltaFile
+
+    @classmethod
+    def from_delta(cls, delta):
+        return cls(
+            int(delta.status),
+            DeltaFile(delta.old_file.path, str(delta.old_file.id)),
+            DeltaFile(delta.new_file.path, str(delta.new_file.id)),
+        )
+
+    @classmethod
+    def from_json_obj(cls, obj):
+        status, old_path, old_id, new_path, new_id = obj
+        return cls(status, DeltaFile(old_path, old_id), DeltaFile(new_path, new_id))
+
+    def as_json_obj(self):
+        return [
+            self.status,
+            self.old_file.path,
+            self.old_file.id,
+            self.new_file.path,
+            self.new_file.id,
+        ]
+
+
+ABSENT_FILE_ID = "0" * 40
+
+
+def deltas_between_trees(old_tree, new_tree):
+    """List of :py:class:`DeltaRecord` instances taking *old_tree* to *new_tree*
+
+    Either tree can be ``None``, meaning the empty tree.  The result is the
+    same as converting the deltas of ``new_tree.diff_to_tree(old_tree,
+    swap=True)``, but we only look inside subtrees whose OIDs differ between
+    the two trees.  The libgit2 diff instead visits every file, which is slow
+    when most of a large tree is unchanged (e.g., a big ``asset-src``
+    directory added in the ``{base}`` commit).
+    """
+    deltas = []
+    accumulate_deltas_between_trees(deltas, "", old_tree, new_tree)
+
+    # Sort as libgit2 does.  The sort is stable, so a deletion and an addition
+    # at the same path (when a file changes type) stay in that order.
+    deltas.sort(key=lambda delta: delta.new_file.path)
+    return deltas
+
+
+def tree_entry_from_name(tree):
+    return {} if tree is None else {entry.name: entry for entry in tree}
+
+
+def file_mode_type(mode):
+    return mode & 0o170000
+
+
+def accumulate_deltas_between_trees(deltas, path_prefix, old_tree, new_tree):
+    old_entry_from_name = tree_entry_from_name(old_tree)
+    new_entry_from_name = tree_entry_from_name(new_tree)
+
+    for name in old_entry_from_name.keys() | new_entry_from_name.keys():
+        old_entry = old_entry_from_name.get(name)
+        new_entry = new_entry_from_name.get(name)
+
+        if (
+                old_entry is not None
+                and new_entry is not None
+                and old_entry.id == new_entry.id
+                and old_entry.filemode == new_entry.filemode
+        ):
+            continue
+
+        path = path_prefix + name
+
+        if old_entry is not None and old_entry.filemode == pygit2.GIT_FILEMODE_TREE:
+            old_subtree, old_entry = old_entry, None
+        else:
+            old_subtree = None
+
+        if new_entry is not None and new_entry.filemode == pygit2.GIT_FILEMODE_TREE:
+            new_subtree, new_entry = new_entry, None
+        else:
+            new_subtree = None
+
+        if old_subtree is not None or new_subtree is not None:
+            accumulate_deltas_between_trees(
+                deltas, path + "/", old_subtree, new_subtree
+            )
+
+        if (
+                old_entry is not None
+                and new_entry is not None
+                and (file_mode_type(old_entry.filemode)
+                     == file_mode_type(new_entry.filemode))
+        ):
+            deltas.append(DeltaRecord(
+                int(pygit2.GIT_DELTA_MODIFIED),
+                DeltaFile(path, str(old_entry.id)),
+                DeltaFile(path, str(new_entry.id)),
+            ))
+            continue
+
+        if old_entry is not None:
+            deltas.append(DeltaRecord(
+                int(pygit2.GIT_DELTA_DELETED),
+                DeltaFile(path, str(old_entry.id)),
+                DeltaFile(path, ABSENT_FILE_ID),
+            ))
+
+        if new_entry is not None:
+            deltas.append(DeltaRecord(
+                int(pygit2.GIT_DELTA_ADDED),
+                DeltaFile(path, ABSENT_FILE_ID),
+                DeltaFile(path, str(new_entry.id)),
+            ))
+
+
+################################################################################
+
+ASSET_DIRNAMES = [
+    PROJECT_ASSET_DIRNAME,
+    TUTORIAL_ASSET_DIRNAME,
+    ASSET_SOURCE_DIRNAME,
+]
+
+
+class DeltasKind(enum.Enum):
+    NO_DELTAS = enum.auto()
+    ADDS_ASSETS = enum.auto()
+    MODIFIES_ASSETS = enum.auto()
+    OTHER = enum.auto()
+
+
+@dataclass(frozen=True)
+class DeltasClassification:
+    """Summary of a commit's deltas, found in one pass over them
+
+    All the rules for deciding what kind of commit a :py:class:`ProjectCommit`
+    is, as far as its deltas go, live here.  The ``kind`` is
+    ``ADDS_ASSETS`` (or ``MODIFIES_ASSETS``) if every delta adds (or
+    modifies) a file within the same one of the asset directories
+    ``project-assets``, ``tutorial-assets``, or ``asset-src``; in that case
+    ``asset_dirname`` is that directory's name and ``asset_deltas`` holds all
+    the deltas.
+
+    The sets ``added_asset_dirnames`` and ``modified_asset_dirnames`` record
+    which asset directories have any files added or modified, even if the
+    commit also has other deltas.  This lets us detect commits which
+    improperly mix asset changes with other changes.
+
+    If there is exactly one delta, and it is a modification, it is
+    ``sole_modified_delta``, and ``sole_modified_basename`` is the basename of
+    the file it modifies.
+    """
+
+    kind: DeltasKind
+    n_deltas: int
+    asset_dirname: Optional[str]
+    asset_deltas: Tuple[DeltaRecord, ...]
+    added_asset_dirnames: FrozenSet[str]
+    modified_asset_dirnames: FrozenSet[str]
+    sole_modified_delta: Optional[DeltaRecord]
+    sole_modified_basename: Optional[str]
+
+    @classmethod
+    def from_deltas(cls, deltas):
+        added_asset_dirnames = set()
+        modified_asset_dirnames = set()
+        n_other_deltas = 0
+        last_modified_parts = None
+
+        for delta in deltas:
+            parts = pathlib.PurePosixPath(delta.new_file.path).parts
+            maybe_asset_dirname = (
+                parts[1]
+                if len(parts) > 1 and parts[1] in ASSET_DIRNAMES
+                else None
+            )
+
+            if delta.status == pygit2.GIT_DELTA_MODIFIED:
+                last_modified_parts = parts
+
+            if maybe_asset_dirname is None:
+                n_other_deltas += 1
+            elif delta.status == pygit2.GIT_DELTA_ADDED:
+                added_asset_dirnames.add(maybe_asset_dirname)
+            elif delta.status == pygit2.GIT_DELTA_MODIFIED:
+                modified_asset_dirnames.add(maybe_asset_dirname)
+            else:
+                n_other_deltas += 1
+
+        n_deltas = len(deltas)
+        n_asset_dirnames = len(added_asset_dirnames) + len(modified_asset_dirnames)
+        all_deltas_in_one_asset_dir = (n_other_deltas == 0 and n_asset_dirnames == 1)
+
+        if n_deltas == 0:
+            kind = DeltasKind.NO_DELTAS
+        elif all_deltas_in_one_asset_dir and added_asset_dirnames:
+            kind = DeltasKind.ADDS_ASSETS
+        elif all_deltas_in_one_asset_dir and modified_asset_dirnames:
+            kind = DeltasKind.MODIFIES_ASSETS
+        else:
+            kind = DeltasKind.OTHER
+
+        if all_deltas_in_one_asset_dir:
+            [asset_dirname] = added_asset_dirnames | modified_asset_dirnames
+            asset_deltas = tuple(deltas)
+        else:
+            asset_dirname = None
+            asset_deltas = ()
+
+        if n_deltas == 1 and last_modified_parts is not None:
+            sole_modified_delta = deltas[0]
+            sole_modified_basename = last_modified_parts[-1]
+        else:
+            sole_modified_delta = None
+            sole_modified_basename = None
+
+        return cls(
+            kind,
+            n_deltas,
+            asset_dirname,
+            asset_deltas,
+            frozenset(added_asset_dirnames),
+            frozenset(modified_asset_dirnames),
+            sole_modified_delta,
+            sole_modified_basename,
+        )
+
+
+################################################################################
+
+def message_is_of_base_commit(message):
+    """Whether *message* marks its commit as the ``{base}`` of a history"""
+    return message.startswith("{base}")
+
+
+################################################################################
+
+class BlobTextCache:
+    """Size-bounded map from blob OID to that blob's content as text
+
+    Many lookups of code text are for the same blob, e.g., the new code of one
+    commit is the old code of the next, so keep the decoded text (and, if
+    asked for, its lines) of recently-used blobs.  The least-recently-used
+    entries are discarded first.  The counts of hits and misses are kept in
+    ``n_hits`` and ``n_misses``, for diagnostics.
+
+    All :py:class:`ProjectHistory` instances using the same
+    ``pygit2.Repository`` can share one instance.
+    """
+
+    DEFAULT_MAX_ENTRIES = 1024
+
+    def __init__(self, repo, max_entries=DEFAULT_MAX_ENTRIES):
+        self.repo = repo
+        self.max_entries = max_entries
+        self.entry_from_oid = OrderedDict()
+        self.n_hits = 0
+        self.n_misses = 0
+
+    def entry(self, blob_id):
+        # An entry is a two-element list [text, lines-or-None].
+        key = str(blob_id)
+        entry = self.entry_from_oid.get(key)
+
+        if entry is not None:
+            self.n_hits += 1
+            self.entry_from_oid.move_to_end(key)
+            return entry
+
+        self.n_misses += 1
+        entry = [self.repo[key].data.decode("utf-8"), None]
+        self.entry_from_oid[key] = entry
+        if len(self.entry_from_oid) > self.max_entries:
+            self.entry_from_oid.popitem(last=False)
+        return entry
+
+    def text(self, blob_id):
+        """The content of the given blob, decoded as UTF-8"""
+        return self.entry(blob_id)[0]
+
+    def lines(self, blob_id):
+        """The content of the given blob as a tuple of lines
+
+        The lines are as given by ``text.split("\\n")``, so do not have
+        trailing newline characters.
+        """
+        entry = self.entry(blob_id)
+        if entry[1] is None:
+            entry[1] = tuple(entry[0].split("\n"))
+        return entry[1]
+
+
 ################################################################################
 
 @dataclass
@@ -144,12 +521,29 @@ class ProjectCommit:
 
     Addition of project asset or assets
        Adds one or more files within the ``project-assets`` directory.
+
+    If a :py:class:`BuildCache` is given, the commit's deltas against its
+    parent are looked up in (or added to) that cache, avoiding the need to
+    diff the trees on later runs.  If a :py:class:`BlobTextCache` is given,
+    text file contents are found via that cache.  Likewise, if a
+    :py:class:`StructuredProgramCache` is given, the structured programs of
+    the code before and after this commit are found via that cache.
     """
 
-    def __init__(self, repo, oid):
+    def __init__(
+            self,
+            repo,
+            oid,
+            build_cache=None,
+            blob_text_cache=None,
+            program_cache=None,
+    ):
         self.repo = repo
         self.commit = repo[oid]
         self.oid = self.commit.id
+        self.build_cache = build_cache
+        self.blob_text_cache = blob_text_cache
+        self.program_cache = program_cache
 
     def __str__(self):
         return f"<ProjectCommit: {self.short_oid} {self.summary_label}>"
@@ -182,15 +576,23 @@ class ProjectCommit:
     def tree(self):
         return self.commit.tree
 
-    def text_file_contents(self, path):
+    def blob_text(self, blob_id):
+        if self.blob_text_cache is None:
+            return self.repo[blob_id].data.decode("utf-8")
+        return self.blob_text_cache.text(blob_id)
+
+    def file_blob_id(self, path):
         try:
-            text_blob = self.tree / path
+            blob = self.tree / path
         except KeyError:
             raise TutorialStructureError(
                 f"file \"{path}\" not found in tree of {self.oid}"
             )
         else:
-            return text_blob.data.decode("utf-8")
+            return blob.id
+
+    def text_file_contents(self, path):
+        return self.blob_text(self.file_blob_id(path))
 
     @cached_property
     def message_subject(self):
@@ -222,16 +624,35 @@ class ProjectCommit:
 
     @cached_property
     def is_base(self):
-        return bool(re.match(r'\{base\}', self.message_subject))
+        return message_is_of_base_commit(self.message_subject)
 
     def modifies_single_file(self, target_basename):
-        try:
-            delta = self.sole_modify_against_parent
-        except TutorialStructureError:
-            return False
+        classification = self.deltas_classification
+        return classification.sole_modified_basename == target_basename
+
+    @cached_property
+    def deltas(self):
+        """List of :py:class:`DeltaRecord` instances against parent (or empty tree)
+        """
+        if self.build_cache is None:
+            return self.computed_deltas
+
+        cache_table = self.build_cache.commit_deltas
+        cache_key = str(self.oid)
 
-        path_of_modified_file = pathlib.Path(delta.old_file.path)
-        return path_of_modified_file.name == target_basename
+        cached_deltas = cache_table.get(cache_key)
+        if cached_deltas is not None:
+            return [DeltaRecord.from_json_obj(obj) for obj in cached_deltas]
+
+        deltas = self.computed_deltas
+        cache_table.put(cache_key, [delta.as_json_obj() for delta in deltas])
+        return deltas
+
+    @property
+    def computed_deltas(self):
+        parent_ids = self.commit.parent_ids
+        parent_tree = self.repo[parent_ids[0]].tree if parent_ids else None
+        return deltas_between_trees(parent_tree, self.tree)
 
     @cached_property
     def diff_against_parent_or_empty(self):
@@ -256,19 +677,11 @@ class ProjectCommit:
     def modifies_python_code(self):
         return self.modifies_single_file(CODE_FILE_BASENAME)
 
-    @staticmethod
-    def path_is_a_project_asset(path_str):
-        return pathlib.Path(path_str).parts[1] == PROJECT_ASSET_DIRNAME
-
-    @staticmethod
-    def path_is_a_tutorial_asset(path_str):
-        return pathlib.Path(path_str).parts[1] == TUTORIAL_ASSET_DIRNAME
-
-    @staticmethod
-    def path_is_an_asset_source(path_str):
-        return pathlib.Path(path_str).parts[1] == ASSET_SOURCE_DIRNAME
+    @cached_property
+    def deltas_classification(self):
+        return DeltasClassification.from_deltas(self.deltas)
 
-    def adds_assets(self, is_asset_fun, asset_kind_name):
+    def adds_assets(self, asset_dirname, asset_kind_name):
         # Special-case the BASE commit, which can add a whole lot of files in
         # various places in the tree.  Treat it as not adding assets.
         #
@@ -278,68 +691,56 @@ class ProjectCommit:
         if self.is_base:
             return False
 
-        any_deltas_adding_assets = False
-        any_other_deltas = False
-
-        for delta in self.diff_against_parent_or_empty.deltas:
-            if (delta.status == pygit2.GIT_DELTA_ADDED
-                    and is_asset_fun(delta.new_file.path)):
-                any_deltas_adding_assets = True
-            else:
-                any_other_deltas = True
+        classification = self.deltas_classification
+        if asset_dirname not in classification.added_asset_dirnames:
+            return False
 
-        if any_deltas_adding_assets and any_other_deltas:
+        if classification.kind != DeltasKind.ADDS_ASSETS:
             raise TutorialStructureError(
                 f"commit {self.oid} adds {asset_kind_name} assets"
                 " but also has other deltas"
             )
 
-        return any_deltas_adding_assets
+        return True
 
-    def modifies_assets(self, is_asset_fun, asset_kind_name):
-        any_deltas_modifying_assets = False
-        any_other_deltas = False
-
-        for delta in self.diff_against_parent_or_empty.deltas:
-            if (delta.status == pygit2.GIT_DELTA_MODIFIED
-                    and is_asset_fun(delta.new_file.path)):
-                any_deltas_modifying_assets = True
-            else:
-                any_other_deltas = True
+    def modifies_assets(self, asset_dirname, asset_kind_name):
+        classification = self.deltas_classification
+        if asset_dirname not in classification.modified_asset_dirnames:
+            return False
 
-        if any_deltas_modifying_assets and any_other_deltas:
+        if classification.kind != DeltasKind.MODIFIES_ASSETS:
             raise TutorialStructureError(
                 f"commit {self.oid} modifies {asset_kind_name} assets"
                 " but also has other deltas"
             )
 
-        return any_deltas_modifying_assets
+        return True
 
     @cached_property
     def adds_project_assets(self):
-        return self.adds_assets(self.path_is_a_project_asset, "project")
+        return self.adds_assets(PROJECT_ASSET_DIRNAME, "project")
 
     @cached_property
     def modifies_project_assets(self):
-        return self.modifies_assets(self.path_is_a_project_asset, "project")
+        return self.modifies_assets(PROJECT_ASSET_DIRNAME, "project")
 
     @cached_property
     def adds_tutorial_assets(self):
-        return self.adds_assets(self.path_is_a_tutorial_asset, "tutorial")
+        return self.adds_assets(TUTORIAL_ASSET_DIRNAME, "tutorial")
 
     @cached_property
     def adds_asset_source(self):
-        return self.adds_assets(self.path_is_an_asset_source, "asset-source")
+        return self.adds_assets(ASSET_SOURCE_DIRNAME, "asset-source")
 
     @cached_property
     def sole_modify_against_parent(self):
-        diff = self.diff_against_parent_or_empty
-        if len(diff) != 1:
+        classification = self.deltas_classification
+        if classification.n_deltas != 1:
             raise TutorialStructureError(
                 f"commit {self.oid} does not have exactly one delta"
             )
-        delta = list(diff.deltas)[0]
-        if delta.status != pygit2.GIT_DELTA_MODIFIED:
+        delta = classification.sole_modified_delta
+        if delta is None:
             raise TutorialStructureError(
                 f"commit {self.oid}'s delta is not of type MODIFIED"
             )
@@ -349,7 +750,7 @@ class ProjectCommit:
     def added_assets(self):
         if self.adds_project_assets or self.adds_tutorial_assets:
             return [Asset.from_delta(self.repo, delta)
-                    for delta in self.diff_against_parent_or_empty.deltas]
+                    for delta in self.deltas_classification.asset_deltas]
         else:
             return []
 
@@ -357,7 +758,7 @@ class ProjectCommit:
     def modified_assets(self):
         if self.modifies_project_assets:
             return [Asset.from_delta(self.repo, delta)
-                    for delta in self.diff_against_parent_or_empty.deltas]
+                    for delta in self.deltas_classification.asset_deltas]
         else:
             return []
 
@@ -410,11 +811,116 @@ class ProjectCommit:
 
     @cached_property
     def old_and_new_code(self):
-        old_blob, new_blob = self.old_and_new_blobs
-        old_code = old_blob.data.decode("utf-8")
-        new_code = new_blob.data.decode("utf-8")
+        self.assert_modifies_python_code()
+        delta = self.sole_modify_against_parent
+        old_code = self.blob_text(delta.old_file.id)
+        new_code = self.blob_text(delta.new_file.id)
         return old_code, new_code
 
+    @property
+    def old_and_new_programs(self):
+        """The :py:class:`StructuredPytchProgram`s before and after this commit
+        """
+        if self.program_cache is None:
+            old_code, new_code = self.old_and_new_code
+            return (
+                StructuredPytchProgram(old_code),
+                StructuredPytchProgram(new_code),
+            )
+        return self.program_cache.programs(*self.code_blob_ids)
+
+    @cached_property
+    def code_blob_ids(self):
+        """Hex OIDs of the code blobs before and after this commit"""
+        self.assert_modifies_python_code()
+        delta = self.sole_modify_against_parent
+        return str(delta.old_file.id), str(delta.new_file.id)
+
+    @cached_property
+    def rendered_code_patch(self):
+        """:py:class:`RenderedCodePatch` of this commit's change to the code
+        """
+        rendered_patch = self.maybe_build_cached_rendered_code_patch
+        if rendered_patch is None:
+            rendered_patch = self.computed_rendered_code_patch
+            self.store_rendered_code_patch(rendered_patch)
+        return rendered_patch
+
+    @property
+    def rendered_code_patch_cache_key(self):
+        old_blob_id, new_blob_id = self.code_blob_ids
+        return f"{old_blob_id}:{new_blob_id}"
+
+    @property
+    def maybe_build_cached_rendered_code_patch(self):
+        if self.build_cache is None:
+            return None
+        cache_table = self.build_cache.rendered_patches
+        cached_patch = cache_table.get(self.rendered_code_patch_cache_key)
+        if cached_patch is None:
+            return None
+        return RenderedCodePatch.from_json_obj(cached_patch)
+
+    def store_rendered_code_patch(self, rendered_patch):
+        """Record *rendered_patch*, e.g., as computed by a worker process"""
+        self.__dict__["rendered_code_patch"] = rendered_patch
+        if self.build_cache is not None:
+            self.build_cache.rendered_patches.put(
+                self.rendered_code_patch_cache_key,
+                rendered_patch.as_json_obj(),
+            )
+
+    def maybe_rendered_code_patch_job(self):
+        """:py:class:`PayloadJob` rendering this commit's code patch
+
+        Gives ``None`` if the rendered patch is already known, e.g., from the
+        build cache, in which case it is now held in ``rendered_code_patch``.
+        """
+        if "rendered_code_patch" in self.__dict__:
+            return None
+        rendered_patch = self.maybe_build_cached_rendered_code_patch
+        if rendered_patch is not None:
+            self.__dict__["rendered_code_patch"] = rendered_patch
+            return None
+        return PayloadJob(
+            rendered_code_patch_from_blob_ids,
+            (self.repo.path, *self.code_blob_ids),
+            self.store_rendered_code_patch,
+        )
+
+    @property
+    def computed_rendered_code_patch(self):
+        _, new_code = self.old_and_new_code
+        return RenderedCodePatch(patch_html(self.code_patch_against_parent), new_code)
+
+    @cached_property
+    def rich_commit_json_from_key(self):
+        return {}
+
+    def rich_commit_json(self, kind, args):
+        """JSON of this commit's rich commit of the given *kind* and *args*"""
+        key = json.dumps([kind, args])
+        cache = self.rich_commit_json_from_key
+        if key not in cache:
+            old_program, new_program = self.old_and_new_programs
+            cache[key] = rich_commit_json(old_program, new_program, kind, args)
+        return cache[key]
+
+    def maybe_rich_commit_json_job(self, kind, args):
+        """:py:class:`PayloadJob` computing ``rich_commit_json(kind, args)``
+
+        Gives ``None`` if that JSON is already known.
+        """
+        key = json.dumps([kind, args])
+        cache = self.rich_commit_json_from_key
+        if key in cache:
+            return None
+        return PayloadJob(
+            rich_commit_json_from_blob_ids,
+            (self.repo.path, *self.code_blob_ids, kind, args),
+            partial(cache.__setitem__, key),
+        )
+
 
 ################################################################################
 
@@ -485,6 +991,18 @@ class MediaEntriesProcessor:
 
 class ProjectHistory:
     """Development history of a Pytch project within a tutorial context
+
+    The *repo_directory* can be a path, or an existing ``pygit2.Repository``.
+    Passing the same ``Repository`` to many :py:class:`ProjectHistory`
+    instances lets them share its object cache, which is useful when several
+    tutorials share some history.  Such instances can likewise share a
+    :py:class:`BlobTextCache`, given as *blob_text_cache*; if none is given, the
+    history creates its own.
+
+    Rendered chapters of the tutorial are kept in ``rendered_chapter_table``,
+    which is the :py:class:`BuildCache`'s table if there is one, or else an
+    in-memory table surviving :py:meth:`refresh`.  The history's commits share
+    a :py:class:`StructuredProgramCache`, held in ``program_cache``.
     """
 
     class TutorialTextSource(enum.Enum):
@@ -496,9 +1014,29 @@ class ProjectHistory:
             repo_directory,
             tip_revision,
             tutorial_text_source=TutorialTextSource.TIP_REVISION,
+            build_cache=None,
+            blob_text_cache=None,
     ):
-        self.repo = pygit2.Repository(repo_directory)
+        self.repo = (
+            repo_directory
+            if isinstance(repo_directory, pygit2.Repository)
+            else pygit2.Repository(repo_directory)
+        )
         self.tutorial_text_source = tutorial_text_source
+        self.build_cache = build_cache
+        self.blob_text_cache = (
+            BlobTextCache(self.repo)
+            if blob_text_cache is None
+            else blob_text_cache
+        )
+        self.rendered_chapter_table = (
+            InMemoryLruTable(DEFAULT_MAX_IN_MEMORY_CHAPTERS)
+            if build_cache is None
+            else build_cache.rendered_chapters
+        )
+        self.program_cache = StructuredProgramCache(
+            self.repo, self.blob_text_cache.text
+        )
         tip_oid = self.repo.revparse_single(tip_revision).id
         self.project_commits = self.commit_linear_ancestors(tip_oid)
 
@@ -519,18 +1057,71 @@ class ProjectHistory:
                 f"duplicate commit-identifier slug/s {repeated_slugs}"
             )
 
-    def commit_linear_ancestors(self, tip_oid):
-        project_commits = [ProjectCommit(self.repo, tip_oid)]
-        while not project_commits[-1].is_base:
-            # TODO: Handle merges (more than one parent).
-            parent_ids = project_commits[-1].commit.parent_ids
-            if not parent_ids:
-                raise TutorialStructureError(
-                    f"did not find {{base}} commit in ancestors of {tip_oid}"
-                )
-            oid = parent_ids[0]
-            project_commits.append(ProjectCommit(self.repo, oid))
-        return project_commits
+    def commit_linear_ancestors(self, tip_oid, known_project_commits=()):
+        """List of commits from *tip_oid* back to the ``{base}`` commit
+
+        Only first parents are followed, so a merge commit is treated as one
+        change relative to its first parent; commits on the merged-in branch
+        are not part of the history.
+
+        The *known_project_commits*, if given, should be a list as in the
+        ``project_commits`` attribute.  On reaching any of those commits, stop
+        walking the history, and re-use that commit and its known ancestors.
+        """
+        idx_from_known_oid = {
+            pc.oid: idx for idx, pc in enumerate(known_project_commits)
+        }
+
+        walker = self.repo.walk(tip_oid)
+        walker.simplify_first_parent()
+
+        new_oids = []
+        known_ancestors = []
+        for commit in walker:
+            if (known_idx := idx_from_known_oid.get(commit.id)) is not None:
+                known_ancestors = known_project_commits[known_idx:]
+                break
+            new_oids.append(commit.id)
+            if message_is_of_base_commit(commit.message):
+                break
+        else:
+            raise TutorialStructureError(
+                f"did not find {{base}} commit in ancestors of {tip_oid}"
+            )
+
+        new_project_commits = [self.project_commit(oid) for oid in new_oids]
+        return new_project_commits + known_ancestors
+
+    def refresh(self, new_tip_revision):
+        """Update this history to have the given new tip
+
+        Only the commits not already part of this history are examined.
+        Typically, the new tip descends from the old one, or is an amended
+        version of it.  Existing :py:class:`ProjectCommit` instances, and
+        whatever they have already computed, are re-used.  All properties
+        derived from the commits (or from the working directory) are
+        discarded, to be re-computed when next needed.
+        """
+        new_tip_oid = self.repo.revparse_single(new_tip_revision).id
+        self.project_commits = self.commit_linear_ancestors(
+            new_tip_oid, self.project_commits
+        )
+        self.discard_derived_properties()
+        self.validate_structure()
+
+    def discard_derived_properties(self):
+        for name, attr in vars(ProjectHistory).items():
+            if isinstance(attr, cached_property):
+                self.__dict__.pop(name, None)
+
+    def project_commit(self, oid):
+        return ProjectCommit(
+            self.repo,
+            oid,
+            self.build_cache,
+            self.blob_text_cache,
+            self.program_cache,
+        )
 
     @cached_property
     def tip_oid_string(self):
@@ -563,7 +1154,7 @@ class ProjectHistory:
         entry_dicts = metadata.get("groupedProjectAssets", [])
         media_processor = MediaEntriesProcessor(entry_dicts)
 
-        data_from_content_id = {}
+        asset_from_content_id = {}
         singleton_entries = []
         for asset in self.all_assets:
             if (local_path := asset.project_asset_local_path) is None:
@@ -574,7 +1165,7 @@ class ProjectHistory:
             if not media_processor.accept_item(local_path, item):
                 entry = MLEntry(next(id_iter), item.name, [item], [tag])
                 singleton_entries.append(entry)
-            data_from_content_id[item.relativeUrl] = asset.data
+            asset_from_content_id[item.relativeUrl] = asset
 
         media_processor.assert_awaiting_nothing()
 
@@ -583,7 +1174,7 @@ class ProjectHistory:
             + singleton_entries
         )
 
-        return MediaLibraryData(entries, data_from_content_id)
+        return MediaLibraryData(entries, asset_from_content_id)
 
     @cached_property
     def all_project_assets(self):
@@ -716,6 +1307,38 @@ class ProjectHistory:
         tip_commit = self.project_commits[0]
         return tip_commit.text_file_contents(self.python_code_path)
 
+    @cached_property
+    def initial_code_blob_id(self):
+        """Hex OID of the blob holding :py:attr:`initial_code_text`"""
+        base_commit = self.project_commits[-1]
+        return str(base_commit.file_blob_id(self.python_code_path))
+
+    @cached_property
+    def final_code_blob_id(self):
+        """Hex OID of the blob holding :py:attr:`final_code_text`"""
+        tip_commit = self.project_commits[0]
+        return str(tip_commit.file_blob_id(self.python_code_path))
+
+    @cached_property
+    def code_snapshots(self):
+        """Map from hex blob OID to text, for each version of the code
+
+        The versions are: the initial code; the code as of each commit which
+        changes it; and the final code.  Entries are in that order, with
+        each distinct version appearing once.
+        """
+        blob_ids = [self.initial_code_blob_id]
+        blob_ids.extend(
+            pc.code_blob_ids[1]
+            for pc in reversed(self.project_commits)
+            if pc.modifies_python_code
+        )
+        blob_ids.append(self.final_code_blob_id)
+        return {
+            blob_id: self.blob_text_cache.text(blob_id)
+            for blob_id in blob_ids
+        }
+
     @cached_property
     def commit_from_slug(self):
         return {
@@ -751,5 +1374,11 @@ class ProjectHistory:
         commit = self.commit_from_slug[slug]
         return commit.code_patch_against_parent
 
+    def rendered_code_patch(self, slug):
+        return self.commit_from_slug[slug].rendered_code_patch
+
     def old_and_new_code(self, slug):
         return self.commit_from_slug[slug].old_and_new_code
+
+    def rich_commit_json(self, slug, kind, args):
+        return self.commit_from_slug[slug].rich_commit_json(kind, args)
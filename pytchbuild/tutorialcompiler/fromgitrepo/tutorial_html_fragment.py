@@ -11,25 +11,31 @@ import json
 import copy
 import bs4
 import difflib
+import logging
 import colorlog
-import dataclasses
+from contextlib import contextmanager
 
 from .tutorial_markdown import (
     soup_from_markdown_text,
-    ordered_commit_slugs_in_soup,
+    memoised_soup_from_markdown_text,
+    markdown_chapter_sources,
+    ordered_commit_slugs,
+    ShortcodeIndex,
 )
-from .structured_diff import StructuredPytchDiff
+from .soup_parsing import new_empty_soup
+from .chapter_memo import (
+    RenderedChapter,
+    chapter_source_key,
+    source_is_memoisable,
+)
+from .commit_payloads import compute_payloads
+from .code_snapshots import CodeSnapshotStyle
+from .patch_html import RawHtml, line_classification
 from .errors import InternalError, TutorialStructureError
 
 logger = colorlog.getLogger(__name__)
 
 
-def line_classification(hunk_line):
-    return ("diff-add" if hunk_line.old_lineno == -1
-            else "diff-del" if hunk_line.new_lineno == -1
-            else "diff-unch")
-
-
 def table_data_from_line_number(soup, lineno):
     cell = soup.new_tag("td", attrs={"class": "linenum"})
     if lineno != -1:
@@ -81,6 +87,8 @@ def table_from_hunk(soup, hunk):
 
 
 def tables_div_from_patch(soup, patch):
+    # Building a tutorial uses the quicker (and cached) patch_html(), which
+    # gives the same markup as text; this soup-based version is the reference.
     div = soup.new_tag("div", attrs={"class": "patch"})
     for hunk in patch.hunks:
         div.append(table_from_hunk(soup, hunk))
@@ -114,12 +122,12 @@ def div_from_front_matter(
         soup,
         front_matter,
         maybe_seek_to_chapter,
-        initial_code_text,
-        final_code_text
+        code_attrs,
 ):
+    # The code_attrs give the initial and final code, in a form depending on
+    # the CodeSnapshotStyle.
     div = div_from_elements(soup, "front-matter", front_matter)
-    div["data-initial-code-text"] = initial_code_text
-    div["data-complete-code-text"] = final_code_text
+    div.attrs.update(code_attrs)
 
     if maybe_seek_to_chapter is not None:
         div["data-seek-to-chapter"] = str(maybe_seek_to_chapter)
@@ -164,22 +172,31 @@ def node_is_asset_credits_marker(elt):
     return node_is_div_of_any_class(elt, ["asset-credits"])
 
 
-def augment_jr_commit_elt(soup, elt, project_history):
-    commit_slug = elt.attrs["data-slug"]
+def jr_commit_kind_and_args(elt):
     commit_kind = elt.attrs["data-jr-commit-kind"]
     commit_args = json.loads(elt.attrs["data-jr-commit-args"])
+    return commit_kind, commit_args
+
 
-    old_code, new_code = project_history.old_and_new_code(commit_slug)
-    structured_diff = StructuredPytchDiff(old_code, new_code)
-    rich_commit = structured_diff.rich_commit(commit_kind, *commit_args)
-    rich_commit_json = json.dumps(dataclasses.asdict(rich_commit))
+def augment_jr_commit_elt(soup, elt, project_history):
+    commit_slug = elt.attrs["data-slug"]
+    commit_kind, commit_args = jr_commit_kind_and_args(elt)
+
+    rich_commit_json = project_history.rich_commit_json(
+        commit_slug, commit_kind, commit_args
+    )
 
     del elt.attrs["data-jr-commit-kind"]
     del elt.attrs["data-jr-commit-args"]
     elt.attrs["data-jr-commit"] = rich_commit_json
 
 
-def augment_patch_elt(soup, elt, project_history):
+def augment_patch_elt(
+        soup,
+        elt,
+        project_history,
+        code_snapshot_style=CodeSnapshotStyle.INLINE,
+):
     target_slug = elt.attrs["data-slug"]
     if not project_history.slug_is_known(target_slug):
         logger.warning(f'slug "{target_slug}" not found; noting in output')
@@ -195,10 +212,54 @@ def augment_patch_elt(soup, elt, project_history):
         augment_jr_commit_elt(soup, elt, project_history)
     else:
         # TODO: Move this arm to its own function?
-        code_text = project_history.code_text_from_slug(target_slug)
-        elt.attrs["data-code-as-of-commit"] = code_text
-        patch = project_history.code_patch_against_parent(target_slug)
-        elt.append(tables_div_from_patch(soup, patch))
+        commit = project_history.commit_from_slug[target_slug]
+        elt.attrs.update(code_snapshot_style.patch_attrs(commit))
+        elt.append(RawHtml(commit.rendered_code_patch.html))
+
+
+def commit_payload_jobs(project_history, patch_elts):
+    """Jobs computing the not-yet-known payloads of the given placeholders
+
+    Placeholders with unknown slugs are skipped; augment_patch_elt() warns of
+    them.
+    """
+    jobs = []
+    for elt in patch_elts:
+        slug = elt.attrs["data-slug"]
+        if not project_history.slug_is_known(slug):
+            continue
+        commit = project_history.commit_from_slug[slug]
+        if "jr-commit" in elt.attrs["class"]:
+            maybe_job = commit.maybe_rich_commit_json_job(
+                *jr_commit_kind_and_args(elt)
+            )
+        else:
+            maybe_job = commit.maybe_rendered_code_patch_job()
+        if maybe_job is not None:
+            jobs.append(maybe_job)
+    return jobs
+
+
+def precompute_commit_payloads(project_history, patch_elts, n_jobs):
+    """Compute the payloads of *patch_elts* in a pool of *n_jobs* processes
+
+    Each result is stored in its :py:class:`ProjectCommit`, so that a later
+    augment_patch_elt() does not compute it again.  If *n_jobs* is one, do
+    nothing, leaving augment_patch_elt() to compute each payload as needed.
+    """
+    if n_jobs > 1:
+        jobs = commit_payload_jobs(project_history, patch_elts)
+        compute_payloads(jobs, n_jobs)
+
+
+def augment_patch_elts(
+        soup,
+        patch_elts,
+        project_history,
+        code_snapshot_style=CodeSnapshotStyle.INLINE,
+):
+    for patch_elt in patch_elts:
+        augment_patch_elt(soup, patch_elt, project_history, code_snapshot_style)
 
 
 def augment_asset_credits_elt(soup, elt, project_history):
@@ -219,20 +280,21 @@ def augment_asset_credits_elt(soup, elt, project_history):
 
         credit_body_elt = soup.new_tag("div", attrs={"class": "credits"})
 
-        credits_soup = soup_from_markdown_text(credit.credit_markdown)
+        credits_soup = memoised_soup_from_markdown_text(credit.credit_markdown)
         for credit_elt in credits_soup.children:
             credit_body_elt.append(credit_elt)
 
         elt.append(credit_body_elt)
 
 
-def warn_if_slug_usage_mismatch(project_history, soup):
+def warn_if_slug_usage_mismatch(project_history, in_tutorial):
     """Check all tagged commits are used, in order, in the tutorial
 
-    Emit a warning to the logger if not.
+    The *in_tutorial* list gives the slugs used by the tutorial's commit (or
+    jr-commit) shortcodes, in order.  Emit a warning to the logger if they do
+    not match the tagged commits of the history.
     """
     in_history = project_history.ordered_commit_slugs
-    in_tutorial = ordered_commit_slugs_in_soup(soup)
     diff = list(difflib.unified_diff(
         in_history,
         in_tutorial,
@@ -246,91 +308,273 @@ def warn_if_slug_usage_mismatch(project_history, soup):
             logger.warning("    " + diff_item)
 
 
-def tutorial_div_from_project_history(project_history):
-    soup = soup_from_markdown_text(project_history.tutorial_text)
-    warn_if_slug_usage_mismatch(project_history, soup)
-
-    chapters = []
-    current_chapter = []
-    front_matter = []
-
-    past_front_matter = False
-    chapter_idx = 0
-    maybe_wip_chapter_idx = None
-
-    for elt in filter(node_is_relevant, soup.children):
-        if not isinstance(elt, bs4.element.Tag):
-            raise InternalError(f"child {elt} not a tag")
-
-        if elt.name == "hr":
-            if past_front_matter:
-                logger.warning(
-                    "multiple horizontal rules (thematic breaks) found"
-                )
-            past_front_matter = True
-        elif not past_front_matter:
-            if node_is_asset_credits_marker(elt):
-                augment_asset_credits_elt(soup, elt, project_history)
-            if node_is_patch(elt):
-                slug = elt.attrs["data-slug"]
-                logger.warning(
-                    f"commit \"{slug}\" found in front matter; ignoring"
-                )
-            front_matter.append(elt)
-        elif node_is_work_in_progress_marker(elt):
-            if not past_front_matter:
-                raise TutorialStructureError(
-                    "unexpected WiP marker in front matter"
-                )
-            # Although we increment chapter_idx as soon as we see the <h2>, and
-            # so the first real chapter gets index 1, this is correct because
-            # the front-matter is treated as "chapter 0".
-            maybe_wip_chapter_idx = chapter_idx
+class WarningCollector(logging.Handler):
+    def __init__(self, messages):
+        super().__init__(logging.WARNING)
+        self.messages = messages
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+@contextmanager
+def captured_warnings(messages):
+    """Append to *messages* the warnings this module logs within the context"""
+    collector = WarningCollector(messages)
+    logger.addHandler(collector)
+    try:
+        yield
+    finally:
+        logger.removeHandler(collector)
+
+
+class TutorialContent:
+    """Front matter and chapters of a tutorial, gathered in document order
+
+    Content is added either as the top-level elements of the soup of a
+    Markdown source, or as an already-rendered chapter source.  Each entry of
+    ``chapters`` is a pair: the "chapter-content" DIV (or the
+    :py:class:`RawHtml` of one); and whether that chapter is excluded from the
+    progress trail.  The first chapter holds any content between the front
+    matter and the first chapter heading, and is not output.
+    """
+
+    def __init__(self, project_history, code_snapshot_style):
+        self.project_history = project_history
+        self.code_snapshot_style = code_snapshot_style
+        self.soup = new_empty_soup()
+        self.front_matter = []
+        self.chapters = []
+        self.maybe_current_chapter = []
+        self.past_front_matter = False
+        self.chapter_idx = 0
+        self.maybe_wip_chapter_idx = None
+        self.patch_slugs = []
+        self.jr_commit_slugs = []
+
+    def close_chapter(self):
+        if self.maybe_current_chapter is None:
+            return
+        div = div_from_chapter(self.soup, self.maybe_current_chapter)
+        excluded = "data-exclude-from-progress-trail" in div.attrs
+        self.chapters.append((div, excluded))
+        self.maybe_current_chapter = None
+
+    def add_soup(self, soup):
+        """Add the top-level elements of *soup*
+
+        Return the list of those commit and jr-commit DIVs which need
+        augmenting, i.e., those not in the front matter.
+        """
+        shortcode_index = ShortcodeIndex(soup)
+        self.patch_slugs.extend(shortcode_index.patch_slugs)
+        self.jr_commit_slugs.extend(shortcode_index.jr_commit_slugs)
+
+        patch_elts = []
+        for elt in filter(node_is_relevant, soup.children):
+            if not isinstance(elt, bs4.element.Tag):
+                raise InternalError(f"child {elt} not a tag")
+
+            if elt.name == "hr":
+                if self.past_front_matter:
+                    logger.warning(
+                        "multiple horizontal rules (thematic breaks) found"
+                    )
+                self.past_front_matter = True
+            elif not self.past_front_matter:
+                if node_is_asset_credits_marker(elt):
+                    augment_asset_credits_elt(self.soup, elt, self.project_history)
+                if node_is_patch(elt):
+                    slug = elt.attrs["data-slug"]
+                    logger.warning(
+                        f"commit \"{slug}\" found in front matter; ignoring"
+                    )
+                self.front_matter.append(elt)
+            elif node_is_work_in_progress_marker(elt):
+                if not self.past_front_matter:
+                    raise TutorialStructureError(
+                        "unexpected WiP marker in front matter"
+                    )
+                # Although we increment chapter_idx as soon as we see the <h2>,
+                # and so the first real chapter gets index 1, this is correct
+                # because the front-matter is treated as "chapter 0".
+                self.maybe_wip_chapter_idx = self.chapter_idx
+            else:
+                patch_elts.extend(shortcode_index.commit_divs_within(elt))
+
+                if node_is_asset_credits_marker(elt):
+                    augment_asset_credits_elt(self.soup, elt, self.project_history)
+                elif elt.name == "h2":
+                    self.close_chapter()
+                    self.maybe_current_chapter = []
+                    self.chapter_idx += 1
+
+                if self.maybe_current_chapter is None:
+                    raise InternalError(f"element {elt.name} not within a chapter")
+                self.maybe_current_chapter.append(elt)
+
+        return patch_elts
+
+    def add_rendered_chapter(self, rendered_chapter):
+        self.close_chapter()
+        if rendered_chapter.maybe_wip_chapter_offset is not None:
+            self.maybe_wip_chapter_idx = (
+                self.chapter_idx + rendered_chapter.maybe_wip_chapter_offset
+            )
+        for html, excluded in rendered_chapter.chapters:
+            self.chapters.append((RawHtml(html), excluded))
+        self.chapter_idx += len(rendered_chapter.chapters)
+        self.patch_slugs.extend(rendered_chapter.patch_slugs)
+        self.jr_commit_slugs.extend(rendered_chapter.jr_commit_slugs)
+        for message in rendered_chapter.warnings:
+            logger.warning(message)
+
+
+class PendingChapter:
+    """Chapter source being rendered afresh, to be memoised once augmented"""
+
+    def __init__(self, key):
+        self.key = key
+        self.warnings = []
+
+    def add_soup(self, content, soup):
+        """Add *soup* to *content*, noting which of its chapters came from it"""
+        content.close_chapter()
+        first_chapter_pos = len(content.chapters)
+        start_chapter_idx = content.chapter_idx
+        start_wip_chapter_idx = content.maybe_wip_chapter_idx
+        n_patch_slugs = len(content.patch_slugs)
+        n_jr_commit_slugs = len(content.jr_commit_slugs)
+
+        with captured_warnings(self.warnings):
+            patch_elts = content.add_soup(soup)
+            content.close_chapter()
+
+        self.chapters_slice = slice(first_chapter_pos, len(content.chapters))
+        self.maybe_wip_chapter_offset = (
+            None
+            if content.maybe_wip_chapter_idx == start_wip_chapter_idx
+            else content.maybe_wip_chapter_idx - start_chapter_idx
+        )
+        self.patch_slugs = content.patch_slugs[n_patch_slugs:]
+        self.jr_commit_slugs = content.jr_commit_slugs[n_jr_commit_slugs:]
+        return patch_elts
+
+    def augment_patch_elts(self, content, patch_elts):
+        with captured_warnings(self.warnings):
+            augment_patch_elts(
+                content.soup,
+                patch_elts,
+                content.project_history,
+                content.code_snapshot_style,
+            )
+
+    def memoise(self, content, table):
+        """Store the rendering of this source in *table*
+
+        Its chapters are replaced in *content* by their HTML, so that they are
+        not output as text a second time.
+        """
+        chapters = [
+            (str(div), excluded)
+            for div, excluded in content.chapters[self.chapters_slice]
+        ]
+        content.chapters[self.chapters_slice] = [
+            (RawHtml(html), excluded) for html, excluded in chapters
+        ]
+        rendered_chapter = RenderedChapter(
+            chapters,
+            self.maybe_wip_chapter_offset,
+            self.patch_slugs,
+            self.jr_commit_slugs,
+            self.warnings,
+        )
+        table.put(self.key, rendered_chapter.as_json_obj())
+
+
+def tutorial_div_from_project_history(
+        project_history,
+        n_jobs=1,
+        code_snapshot_style=CodeSnapshotStyle.INLINE,
+):
+    content = TutorialContent(project_history, code_snapshot_style)
+    chapter_table = project_history.rendered_chapter_table
+
+    # Gather the content, re-using chapters rendered by an earlier build where
+    # possible.  For each source rendered afresh, note the commit DIVs needing
+    # augmentation, and, if it is a chapter worth memoising, its PendingChapter.
+    fresh_sources = []
+    for source_idx, source in enumerate(
+            markdown_chapter_sources(project_history.tutorial_text)
+    ):
+        memoisable = (
+            source_idx > 0
+            and content.past_front_matter
+            and source_is_memoisable(source)
+        )
+        maybe_key = (
+            chapter_source_key(project_history, source, code_snapshot_style)
+            if memoisable
+            else None
+        )
+        maybe_rendered = None if maybe_key is None else chapter_table.get(maybe_key)
+        if maybe_rendered is not None:
+            content.add_rendered_chapter(RenderedChapter.from_json_obj(maybe_rendered))
+            continue
+
+        soup = soup_from_markdown_text(source)
+        if maybe_key is None:
+            fresh_sources.append((content.add_soup(soup), None))
         else:
-            if node_is_patch(elt):
-                augment_patch_elt(soup, elt, project_history)
-            for inner_node in elt.find_all("div"):
-                if node_is_patch(inner_node):
-                    augment_patch_elt(soup, inner_node, project_history)
+            pending_chapter = PendingChapter(maybe_key)
+            patch_elts = pending_chapter.add_soup(content, soup)
+            fresh_sources.append((patch_elts, pending_chapter))
 
-            if node_is_asset_credits_marker(elt):
-                augment_asset_credits_elt(soup, elt, project_history)
-            elif elt.name == "h2":
-                chapters.append(current_chapter)
-                current_chapter = []
-                chapter_idx += 1
+    content.close_chapter()
 
-            current_chapter.append(elt)
+    warn_if_slug_usage_mismatch(
+        project_history,
+        ordered_commit_slugs(content.patch_slugs, content.jr_commit_slugs),
+    )
 
-    chapters.append(current_chapter)
+    precompute_commit_payloads(
+        project_history,
+        [elt for patch_elts, _ in fresh_sources for elt in patch_elts],
+        n_jobs,
+    )
+
+    for patch_elts, maybe_pending_chapter in fresh_sources:
+        if maybe_pending_chapter is None:
+            augment_patch_elts(
+                content.soup, patch_elts, project_history, code_snapshot_style
+            )
+        else:
+            maybe_pending_chapter.augment_patch_elts(content, patch_elts)
+            maybe_pending_chapter.memoise(content, chapter_table)
 
     # Round-trip to get compact representation:
     metadata_json = json.dumps(json.loads(project_history.metadata_text))
 
-    tutorial_div = soup.new_tag("div", attrs={
+    tutorial_div = content.soup.new_tag("div", attrs={
         "class": "tutorial-bundle",
         "data-tip-sha1": project_history.tip_oid_string,
         "data-metadata-json": metadata_json,
     })
 
     tutorial_div.append(div_from_front_matter(
-        soup,
-        front_matter,
-        maybe_wip_chapter_idx,
-        project_history.initial_code_text,
-        project_history.final_code_text
+        content.soup,
+        content.front_matter,
+        content.maybe_wip_chapter_idx,
+        code_snapshot_style.front_matter_attrs(project_history),
     ))
 
     # Skip the first 'chapter'; it should be empty because the main content
     # should start with a <H2>.  TODO: Check this.
-    for chapter in chapters[1:]:
-        tutorial_div.append(div_from_chapter(soup, chapter))
+    for chapter_div, _ in content.chapters[1:]:
+        tutorial_div.append(chapter_div)
 
-    exclude_chapter = [
-        chapter.attrs.get("data-exclude-from-progress-trail", "false")
-        == "true"
-        for chapter in tutorial_div
-    ]
+    # The front matter is never excluded.
+    exclude_chapter = [False] + [excluded for _, excluded in content.chapters[1:]]
 
     for exclude_0, exclude_1 in zip(exclude_chapter, exclude_chapter[1:]):
         if exclude_0 and not exclude_1:
@@ -343,7 +587,7 @@ def tutorial_div_from_project_history(project_history):
 
 
 def summary_div_from_project_history(project_history):
-    soup = soup_from_markdown_text(project_history.summary_text)
+    soup = memoised_soup_from_markdown_text(project_history.summary_text)
 
     # Give all paragraphs holding images (which there should probably only be
     # one of, being the screenshot) an identifiable class.  The front-end is
@@ -2,10 +2,13 @@ import re
 import xml.etree.ElementTree as etree
 import markdown
 import markdown.extensions.fenced_code
-from bs4 import BeautifulSoup
 import copy
+import functools
+import threading
+from collections import defaultdict
 
 from .errors import TutorialStructureError
+from .soup_parsing import new_empty_soup, parsed_fragment
 
 
 class ShortcodeProcessor(markdown.blockprocessors.BlockProcessor):
@@ -87,7 +90,7 @@ def gather_learner_task_divs(flat_soup):
     Zero or more help sections, each of which is turned into a
     learner-task-help DIV.
     """
-    soup = BeautifulSoup("", features="html.parser")
+    soup = new_empty_soup()
     empty_chunk_error = TutorialStructureError(
         "empty learner chunk (intro/help)"
     )
@@ -115,28 +118,180 @@ def gather_learner_task_divs(flat_soup):
     return soup
 
 
-def soup_from_markdown_text(markdown_text):
-    html = markdown.markdown(
-        markdown_text,
-        extensions=[ShortcodeExtension(), "fenced_code"]
+RE_FENCE_OPENING = re.compile(r"(`{3,}|~{3,})")
+RE_HTML_BLOCK_OPENING = re.compile(r" {0,3}<[A-Za-z/]")
+RE_REFERENCE_DEFINITION = re.compile(r"^ {0,3}\[[^\]]+\]:", re.MULTILINE)
+RE_LEARNER_TASK_MARKER = re.compile(r"^\s*\{\{< (/?learner-task) >\}\}\s*$", re.MULTILINE)
+
+
+def learner_tasks_are_balanced(markdown_text):
+    markers = RE_LEARNER_TASK_MARKER.findall(markdown_text)
+    return markers.count("learner-task") == markers.count("/learner-task")
+
+
+def html_comment_is_open_after(line, was_open):
+    """Whether an HTML comment is still open after *line*"""
+    opening_idx = line.rfind("<!--")
+    closing_idx = line.rfind("-->")
+    if opening_idx == -1 and closing_idx == -1:
+        return was_open
+    return opening_idx > closing_idx
+
+
+def markdown_chapter_sources(markdown_text):
+    """Split *markdown_text* immediately before each ``## `` chapter heading
+
+    Lines within fenced code blocks or HTML comments are not treated as
+    headings.  The first
+    source is everything before the first chapter (i.e., the front matter and
+    the thematic break ending it); concatenating all sources gives back
+    *markdown_text*.
+
+    Rendering each source separately gives the same elements as rendering the
+    whole text, except where Markdown constructs span chapters.  If there are
+    any reference-style link definitions or raw HTML blocks (whose extent
+    Markdown decides by their tags), or a learner task starts in one chapter
+    and ends in another, give the whole text as the only source.
+    """
+    sources = []
+    source_lines = []
+    maybe_fence = None
+    in_html_comment = False
+    has_html_block = False
+
+    for line in markdown_text.splitlines(keepends=True):
+        if in_html_comment:
+            in_html_comment = html_comment_is_open_after(line, True)
+        elif maybe_fence is None:
+            if line.startswith("## ") and source_lines:
+                sources.append("".join(source_lines))
+                source_lines = []
+            fence_match = RE_FENCE_OPENING.match(line)
+            if fence_match is not None:
+                maybe_fence = fence_match.group(1)
+            else:
+                if RE_HTML_BLOCK_OPENING.match(line) is not None:
+                    has_html_block = True
+                in_html_comment = html_comment_is_open_after(line, False)
+        elif line.rstrip() == maybe_fence:
+            maybe_fence = None
+        source_lines.append(line)
+
+    sources.append("".join(source_lines))
+
+    independent = (
+        not has_html_block
+        and RE_REFERENCE_DEFINITION.search(markdown_text) is None
+        and all(learner_tasks_are_balanced(source) for source in sources)
     )
-    flat_soup = BeautifulSoup(html, "html.parser")
+    return sources if independent else [markdown_text]
+
+
+MAX_MEMOISED_MARKDOWN_TEXTS = 1024
+
+
+def new_markdown_converter():
+    return markdown.Markdown(extensions=[ShortcodeExtension(), "fenced_code"])
+
+
+thread_local_state = threading.local()
+
+
+def html_from_markdown_text(markdown_text):
+    """HTML rendering of *markdown_text*, with our shortcodes
+
+    Constructing a ``Markdown`` converter, with its extensions, takes longer
+    than converting a short text, so each thread keeps one converter, which
+    is reset before each use.  A converter which raised an exception might be
+    left in an inconsistent state, so it is discarded.
+    """
+    converter = getattr(thread_local_state, "markdown_converter", None)
+    if converter is None:
+        converter = new_markdown_converter()
+        thread_local_state.markdown_converter = converter
+
+    try:
+        return converter.reset().convert(markdown_text)
+    except Exception:
+        thread_local_state.markdown_converter = None
+        raise
+
+
+memoised_html_from_markdown_text = functools.lru_cache(
+    maxsize=MAX_MEMOISED_MARKDOWN_TEXTS
+)(html_from_markdown_text)
+
+
+def soup_from_html(html):
+    flat_soup = parsed_fragment(html)
     soup = gather_learner_task_divs(flat_soup)
     return soup
 
 
-def slugs_for_class(soup, cls):
-    """List of "data-slug" attrs for elements of given `cls`."""
-    return [
-        elt.attrs["data-slug"]
-        for elt in soup.find_all("div", attrs={"class": cls})
-    ]
+def soup_from_markdown_text(markdown_text):
+    return soup_from_html(html_from_markdown_text(markdown_text))
 
 
-def ordered_commit_slugs_in_soup(soup):
-    patch_slugs = slugs_for_class(soup, "patch-container")
-    jr_slugs = slugs_for_class(soup, "jr-commit")
+def memoised_soup_from_markdown_text(markdown_text):
+    """Like :py:func:`soup_from_markdown_text`, but for oft-repeated text
+
+    The Markdown rendering of recently-seen texts is kept, so converting a
+    short text such as an asset credit, which often appears in many commits
+    and tutorials, costs only parsing the already-rendered HTML.  Each call
+    gives a new soup, which the caller is free to modify.
+    """
+    return soup_from_html(memoised_html_from_markdown_text(markdown_text))
+
+
+def top_level_ancestor(node, soup):
+    """The child of `soup` which is, or contains, `node`."""
+    while node.parent is not soup:
+        node = node.parent
+    return node
+
+
+class ShortcodeIndex:
+    """The DIVs made by commit and jr-commit shortcodes, found in one pass.
 
+    Each list of DIVs is in document order.  Each DIV is also recorded
+    against the top-level node of the soup containing it, which might
+    be the DIV itself.  Nodes added to the soup after the index is
+    made are not included.
+    """
+
+    def __init__(self, soup):
+        self.patch_divs = []
+        self.jr_commit_divs = []
+        self.commit_divs_from_top_level_id = defaultdict(list)
+
+        for div in soup.find_all("div"):
+            if node_is_from_shortcode(div, "patch-container"):
+                self.patch_divs.append(div)
+            elif node_is_from_shortcode(div, "jr-commit"):
+                self.jr_commit_divs.append(div)
+            else:
+                continue
+            top_level_node = top_level_ancestor(div, soup)
+            self.commit_divs_from_top_level_id[id(top_level_node)].append(div)
+
+    def commit_divs_within(self, top_level_node):
+        """Patch and jr-commit DIVs which are, or are within, `top_level_node`."""
+        return self.commit_divs_from_top_level_id.get(id(top_level_node), [])
+
+    @property
+    def patch_slugs(self):
+        return [div.attrs["data-slug"] for div in self.patch_divs]
+
+    @property
+    def jr_commit_slugs(self):
+        return [div.attrs["data-slug"] for div in self.jr_commit_divs]
+
+    @property
+    def ordered_commit_slugs(self):
+        return ordered_commit_slugs(self.patch_slugs, self.jr_commit_slugs)
+
+
+def ordered_commit_slugs(patch_slugs, jr_slugs):
     have_patch_slugs = len(patch_slugs) > 0
     have_jr_slugs = len(jr_slugs) > 0
 
@@ -144,3 +299,7 @@ def ordered_commit_slugs_in_soup(soup):
         raise TutorialStructureError("mixture of patch and jr-commit slugs")
 
     return patch_slugs if have_patch_slugs else jr_slugs
+
+
+def ordered_commit_slugs_in_soup(soup):
+    return ShortcodeIndex(soup).ordered_commit_slugs
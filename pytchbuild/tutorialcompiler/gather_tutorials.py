@@ -1,31 +1,41 @@
 from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, Optional
 import yaml
 import bs4
 from pathlib import Path
 import enum
 import zipfile
-import copy
 import pygit2
 import itertools
+import operator
 import re
 import subprocess
 import shutil
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import closing
+from functools import partial
 
 from .medialib import MediaLibraryData
 
 from .fromgitrepo import git_repository
-from .fromgitrepo.tutorial_history import ProjectHistory
-from .fromgitrepo.tutorial_bundle import TutorialBundle
+from .fromgitrepo.tutorial_history import BlobTextCache, ProjectHistory
+from .fromgitrepo.tutorial_bundle import RenderedTutorialBundle
+from .fromgitrepo.code_snapshots import CodeSnapshotStyle
+from .fromgitrepo.precompression import write_text_files
+from .fromgitrepo.build_cache import BuildCache
+from .fromgitrepo import soup_parsing
+from .fromgitrepo.soup_parsing import new_empty_soup
 from .fromgitrepo.errors import InternalError, TutorialStructureError
 from .fromgitrepo.config import (
     RELEASES_BRANCH_NAME,
     RELEASE_RECIPES_BRANCH_NAME,
 )
+from .fromgitrepo import repo_functions
 from .fromgitrepo.repo_functions import (
+    configure_object_cache,
     create_signature,
     file_contents_at_revision,
+    repository_at_path,
 )
 
 
@@ -56,6 +66,77 @@ class TutorialInfo:
         }
 
 
+@dataclass(frozen=True)
+class ProjectHistorySpec:
+    """Enough information to re-create a :py:class:`ProjectHistory`
+
+    Used to send a tutorial's history to a worker process.  The history is
+    re-created there from its git repository and tip commit, using the same
+    persistent cache (if any) as the original.
+    """
+
+    repo_path: str
+    tip_oid_string: str
+    maybe_cache_db_path: Optional[str]
+
+    @classmethod
+    def from_project_history(cls, project_history):
+        build_cache = project_history.build_cache
+        return cls(
+            project_history.repo.path,
+            project_history.tip_oid_string,
+            None if build_cache is None else str(build_cache.db_path),
+        )
+
+
+def configure_worker_process(parser_backend, maybe_object_cache_mb):
+    """Configure a worker process as the parent process was configured
+
+    This is a module-level function so that it can be used as the initializer
+    of a pool of worker processes, with :py:func:`worker_process_initargs` as
+    its arguments.  Otherwise, a worker started by "spawn" rather than "fork"
+    would use the default HTML parser backend and git object cache size.
+    """
+    soup_parsing.configure_parser_backend(parser_backend)
+    if maybe_object_cache_mb is not None:
+        configure_object_cache(maybe_object_cache_mb)
+
+
+def worker_process_initargs():
+    """Arguments for :py:func:`configure_worker_process` in a worker process"""
+    return (
+        soup_parsing.current_parser_backend,
+        repo_functions.configured_object_cache_mb,
+    )
+
+
+def call_on_project_history(fun, spec, *args):
+    """Re-create the project history described by *spec* and apply *fun*
+
+    The result is ``fun(project_history, *args)``.  This is a module-level
+    function so that it can be pickled and run in a worker process.
+    """
+    build_cache = (
+        None
+        if spec.maybe_cache_db_path is None
+        else BuildCache(spec.maybe_cache_db_path)
+    )
+    try:
+        project_history = ProjectHistory(
+            repository_at_path(spec.repo_path),
+            spec.tip_oid_string,
+            build_cache=build_cache,
+        )
+        return fun(project_history, *args)
+    finally:
+        if build_cache is not None:
+            build_cache.close()
+
+
+def medialib_contribution_with_local_ids(project_history, tag):
+    return project_history.medialib_contribution(tag, itertools.count())
+
+
 @dataclass
 class TutorialCollection:
     tutorials: Dict[str, TutorialInfo]
@@ -77,20 +158,31 @@ class TutorialCollection:
             raise InternalError("unknown source")
 
     @classmethod
-    def from_repo_path(cls, repo_path, index_source):
-        with git_repository(repo_path) as repo:
-            content = cls.index_yaml_content(repo, index_source)
-            tutorial_dicts = yaml_load(content)
-
-        tutorials = {d["name"]: TutorialInfo(d["name"],
-                                             d["tip-commit"],
-                                             ProjectHistory(repo_path,
-                                                            d["tip-commit"]))
-                     for d in tutorial_dicts}
+    def from_repo_path(cls, repo_path, index_source, build_cache=None):
+        # All tutorials share the one Repository, and hence its object
+        # cache, which helps because tutorials share some history.
+        repo = pygit2.Repository(repo_path)
+        blob_text_cache = BlobTextCache(repo)
+        content = cls.index_yaml_content(repo, index_source)
+        tutorial_dicts = yaml_load(content)
+
+        tutorials = {
+            d["name"]: TutorialInfo(
+                d["name"],
+                d["tip-commit"],
+                ProjectHistory(
+                    repo,
+                    d["tip-commit"],
+                    build_cache=build_cache,
+                    blob_text_cache=blob_text_cache,
+                ),
+            )
+            for d in tutorial_dicts
+        }
         return cls(tutorials)
 
     @classmethod
-    def from_releases_commit(cls, repo_path, revision):
+    def from_releases_commit(cls, repo_path, revision, build_cache=None):
         missing_files = []
         with git_repository(repo_path) as repo:
             try:
@@ -120,47 +212,112 @@ class TutorialCollection:
                 name = descriptor["name"]
                 raise RuntimeError(f'no tip-commit found for "{name}" (tip "{tip}")')
 
+        repo = pygit2.Repository(repo_path)
+        blob_text_cache = BlobTextCache(repo)
         tutorials = {
             d["name"]: TutorialInfo(
                 d["name"],
                 d["tip-commit"],
-                ProjectHistory(repo_path, revision_from_branch_name[d["tip-commit"]]),
+                ProjectHistory(
+                    repo,
+                    revision_from_branch_name[d["tip-commit"]],
+                    build_cache=build_cache,
+                    blob_text_cache=blob_text_cache,
+                ),
             )
             for d in index_wrt_branches
         }
 
         return cls(tutorials)
 
-    def write_to_zipfile(self, maybe_collection_oid, zfile):
-        bundles = [TutorialBundle.from_project_history(info.project_history)
-                   for info in self.tutorials.values()]
+    def map_project_histories(self, fun, *args_lists, n_jobs=1):
+        """List of ``fun(project_history, *args)`` for each tutorial
+
+        The extra *args_lists*, if any, are iterated over in step with the
+        tutorials.  If *n_jobs* is more than one, the calls are made in a pool
+        of that many worker processes, in which case *fun* and the results must
+        be picklable.  Either way, the results are in the order of the
+        tutorials.
+        """
+        project_histories = [
+            info.project_history for info in self.tutorials.values()
+        ]
+
+        if n_jobs == 1:
+            return list(map(fun, project_histories, *args_lists))
+
+        specs = [
+            ProjectHistorySpec.from_project_history(project_history)
+            for project_history in project_histories
+        ]
+        with ProcessPoolExecutor(
+                max_workers=n_jobs,
+                initializer=configure_worker_process,
+                initargs=worker_process_initargs(),
+        ) as executor:
+            return list(executor.map(
+                partial(call_on_project_history, fun),
+                specs,
+                *args_lists,
+            ))
+
+    def write_to_zipfile(
+            self,
+            maybe_collection_oid,
+            zfile,
+            n_jobs=1,
+            code_snapshot_style=CodeSnapshotStyle.INLINE,
+            precompressions=(),
+    ):
+        bundles = self.map_project_histories(
+            RenderedTutorialBundle.from_project_history,
+            [code_snapshot_style] * len(self.tutorials),
+            n_jobs=n_jobs,
+        )
 
         for bundle in bundles:
-            bundle.write_to_zipfile(zfile)
+            bundle.write_to_zipfile(zfile, precompressions)
 
-        index_soup = bs4.BeautifulSoup('<div class="tutorial-index"></div>',
-                                       "html.parser")
-        index_div = index_soup.find("div")
+        index_soup = new_empty_soup()
+        index_div = index_soup.new_tag("div", attrs={"class": "tutorial-index"})
+        index_soup.append(index_div)
 
         if maybe_collection_oid is not None:
             index_div.attrs["data-collection-sha1"] = str(maybe_collection_oid)
 
         for bundle in bundles:
-            summary_div = copy.deepcopy(bundle.summary_html)
+            summary_div = bundle.summary_html
             summary_div["data-tutorial-name"] = bundle.top_level_directory_name
             index_div.append(summary_div)
 
-        zfile.writestr("tutorial-index.html", index_soup.encode("utf-8"))
+        write_text_files(
+            zfile,
+            [("tutorial-index.html", index_soup.encode("utf-8"))],
+            precompressions,
+        )
 
-    def write_new_zipfile(self, maybe_collection_oid, out_file):
+    def write_new_zipfile(
+            self,
+            maybe_collection_oid,
+            out_file,
+            n_jobs=1,
+            code_snapshot_style=CodeSnapshotStyle.INLINE,
+            precompressions=(),
+    ):
         bare_zfile = zipfile.ZipFile(out_file,
                                      mode="w",
                                      compression=zipfile.ZIP_DEFLATED)
 
         with closing(bare_zfile) as zfile:
-            self.write_to_zipfile(maybe_collection_oid, zfile)
+            self.write_to_zipfile(
+                maybe_collection_oid,
+                zfile,
+                n_jobs,
+                code_snapshot_style,
+                precompressions,
+            )
 
-    def write_asset_credits(self, out_file):
+    def write_asset_credits(self, out_file, n_jobs=1):
         pandoc = shutil.which("pandoc")
         if pandoc is None:
             raise RuntimeError("could not find pandoc executable")
@@ -181,7 +338,13 @@ class TutorialCollection:
 
         pandoc_input.write("# Assets contributed by tutorials\n\n")
 
-        for n, t in self.tutorials.items():
+        all_tutorials_credits = self.map_project_histories(
+            operator.attrgetter("all_asset_credits"),
+            n_jobs=n_jobs,
+        )
+
+        for t, tutorial_credits in zip(self.tutorials.values(),
+                                       all_tutorials_credits):
             # This computation of 'safe_name' is incomplete.  It
             # handles "Q*Bert".
             #
@@ -190,7 +353,7 @@ class TutorialCollection:
             safe_name = re.sub(r'\*', r'\*', t.name)
 
             pandoc_input.write(f"## Tutorial _{safe_name}_\n\n")
-            for credit in t.project_history.all_asset_credits:
+            for credit in tutorial_credits:
                 n_files = len(credit.asset_basenames)
                 files_noun = "File" if n_files == 1 else "Files"
                 basenames_list = ", ".join(
@@ -202,18 +365,26 @@ class TutorialCollection:
         pandoc_input.close()
         pandoc_process.wait()
 
-    def all_asset_media(self):
-        id_iter = itertools.count(64000)
+    def all_asset_media(self, n_jobs=1):
+        # Each tutorial numbers its entries from zero, so that tutorials can
+        # be processed independently; renumber them into one sequence here.
+        tags = [f'Tutorial "{n}"' for n in self.tutorials]
+        tutorials_data = self.map_project_histories(
+            medialib_contribution_with_local_ids,
+            tags,
+            n_jobs=n_jobs,
+        )
+
+        next_id = 64000
         library_data = MediaLibraryData.new_empty()
-        for n, t in self.tutorials.items():
-            tag = f'Tutorial "{n}"'
-            tutorial_data = t.project_history.medialib_contribution(tag, id_iter)
-            library_data.accumulate(tutorial_data)
+        for tutorial_data in tutorials_data:
+            library_data.accumulate(tutorial_data.with_ids_offset(next_id))
+            next_id += len(tutorial_data.entries)
 
         return library_data.with_entries_unified()
 
-    def write_asset_media(self, out_dir):
-        self.all_asset_media().write_files(out_dir)
+    def write_asset_media(self, out_dir, n_jobs=1):
+        self.all_asset_media(n_jobs).write_files(out_dir)
 
     @property
     def gathered_tip_oids(self):
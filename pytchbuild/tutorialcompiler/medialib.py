@@ -1,5 +1,5 @@
 from dataclasses import dataclass, asdict, replace
-from typing import List, Dict
+from typing import Any, List, Dict
 from collections import defaultdict
 from operator import attrgetter, concat
 from functools import reduce
@@ -21,14 +21,15 @@ class MediaLibraryItem:
     @classmethod
     def from_project_asset(cls, asset):
         path = Path(asset.path)
-        hash = hashlib.sha256(asset.data).hexdigest()
+        data = asset.data  # Might be read from repo; only do so once.
+        hash = hashlib.sha256(data).hexdigest()
         url = f"{hash}{path.suffix}"
-        size = list(Image.open(io.BytesIO(asset.data)).size)
+        size = list(Image.open(io.BytesIO(data)).size)
         return cls(path.name, url, size)
 
-    def write_file(self, out_dir, data_from_url):
-        data = data_from_url[self.relativeUrl]
-        (out_dir / self.relativeUrl).write_bytes(data)
+    def write_file(self, out_dir, asset_from_url):
+        asset = asset_from_url[self.relativeUrl]
+        (out_dir / self.relativeUrl).write_bytes(asset.data)
 
 
 @dataclass
@@ -57,9 +58,9 @@ class MediaLibraryEntry:
             "tags": self.tags,
         }
 
-    def write_files(self, out_dir, data_from_url):
+    def write_files(self, out_dir, asset_from_url):
         for item in self.items:
-            item.write_file(out_dir, data_from_url)
+            item.write_file(out_dir, asset_from_url)
 
     @classmethod
     def unify_equivalent(cls, groups):
@@ -98,8 +99,11 @@ class MediaLibraryEntry:
 
 @dataclass
 class MediaLibraryData:
+    # The values of "asset_from_content_id" are Asset instances (or
+    # anything with a "data" property), so that the content is only
+    # read at the point of writing it out.
     entries: List[MediaLibraryEntry]
-    data_from_content_id: Dict[str, bytes]
+    asset_from_content_id: Dict[str, Any]
 
     @classmethod
     def new_empty(cls):
@@ -107,7 +111,11 @@ class MediaLibraryData:
 
     def accumulate(self, other):
         self.entries.extend(other.entries)
-        self.data_from_content_id.update(other.data_from_content_id)
+        self.asset_from_content_id.update(other.asset_from_content_id)
+
+    def with_ids_offset(self, offset):
+        offset_entries = [replace(e, id=e.id + offset) for e in self.entries]
+        return replace(self, entries=offset_entries)
 
     def with_entries_unified(self):
         unified_entries = MediaLibraryEntry.gather_equivalent(self.entries)
@@ -115,7 +123,7 @@ class MediaLibraryData:
 
     def write_files(self, out_dir):
         for entry in self.entries:
-            entry.write_files(out_dir, self.data_from_content_id)
+            entry.write_files(out_dir, self.asset_from_content_id)
 
         index_data = [e.as_output_dict() for e in self.entries]
         with (out_dir / "index.json").open("wt") as f_out:
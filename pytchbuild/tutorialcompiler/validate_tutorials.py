@@ -0,0 +1,292 @@
+"""Check every jr-commit of many tutorials against its commit
+
+Whether a ``{{< jr-commit >}}`` shortcode matches its commit's change to the
+code (e.g., that an ``edit-script`` commit edits exactly one script) is
+otherwise only found out when that tutorial is built, and then only for the
+first mismatch.  :py:func:`validate_tutorials` checks all jr-commits of many
+tutorials and reports every failure.
+
+The work is done in two rounds, each shared among a pool of worker processes.
+First, each tutorial's history is walked, and its text searched for jr-commit
+shortcodes.  Then the rich commit of each shortcode is computed, exactly as
+when building the tutorial.  The checks of one tutorial are kept together, so
+that a worker can re-use the structured program of one commit's new code as
+that of the next commit's old code.
+"""
+
+import fnmatch
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Tuple
+
+from .fromgitrepo.build_cache import BuildCache
+from .fromgitrepo.commit_payloads import call_with_args
+from .fromgitrepo.repo_functions import repository_at_path
+from .fromgitrepo.tutorial_history import ProjectHistory
+from .fromgitrepo.tutorial_html_fragment import jr_commit_kind_and_args
+from .fromgitrepo.tutorial_markdown import ShortcodeIndex, soup_from_markdown_text
+from .gather_tutorials import (
+    TutorialCollection,
+    configure_worker_process,
+    worker_process_initargs,
+    yaml_load,
+)
+
+
+def failure_message(err):
+    return f"{err.__class__.__name__}: {err}"
+
+
+@dataclass(frozen=True)
+class TutorialSpec:
+    """Where to find a tutorial to validate
+
+    The tutorial's history is re-created in a worker process from the git
+    repository and tip revision, using the persistent cache (if any) at
+    *maybe_cache_db_path*.
+    """
+
+    name: str
+    repo_path: str
+    tip_revision: str
+    maybe_cache_db_path: Optional[str]
+
+
+def tutorial_specs_from_index(repo_path, index_source, maybe_cache_db_path):
+    """Specs of the tutorials listed in the ``index.yaml`` file"""
+    repo = repository_at_path(repo_path)
+    content = TutorialCollection.index_yaml_content(repo, index_source)
+    return [
+        TutorialSpec(d["name"], repo_path, d["tip-commit"], maybe_cache_db_path)
+        for d in yaml_load(content)
+    ]
+
+
+def tutorial_specs_from_branches(repo_path, pattern, maybe_cache_db_path):
+    """Specs of the tutorials at the tips of local branches matching *pattern*
+
+    The *pattern* is a shell-style wildcard, such as ``"bunner*"``.
+    """
+    repo = repository_at_path(repo_path)
+    return [
+        TutorialSpec(branch_name, repo_path, branch_name, maybe_cache_db_path)
+        for branch_name in sorted(repo.branches.local)
+        if fnmatch.fnmatchcase(branch_name, pattern)
+    ]
+
+
+@dataclass(frozen=True)
+class JrCommitCheck:
+    """A jr-commit shortcode, and how to compute its rich commit
+
+    The *position* is that of the shortcode among the tutorial's jr-commit
+    shortcodes.  The *function* and *args* are those of the
+    :py:class:`PayloadJob` which computes the rich commit, so can be sent to a
+    worker process.
+    """
+
+    position: int
+    description: str
+    function: Callable[..., Any]
+    args: Tuple
+
+
+@dataclass
+class TutorialChecks:
+    """What was found by walking a tutorial's history and text
+
+    Of the tutorial's *n_jr_commits* jr-commit shortcodes, those which
+    remain to be checked are in *checks*.  The *failures* are those found
+    already, e.g., a jr-commit shortcode with an unknown slug, each with the
+    position of its shortcode (or -1 for a failure of the whole tutorial).
+    """
+
+    n_jr_commits: int
+    checks: List[JrCommitCheck]
+    failures: List[Tuple[int, str]]
+    elapsed_seconds: float
+
+
+def jr_commit_description(slug, kind, args):
+    return f"{slug} ({kind} {args})"
+
+
+def checks_of_project_history(project_history):
+    """The number of jr-commits in the tutorial, their checks, and failures"""
+    checks = []
+    failures = []
+
+    soup = soup_from_markdown_text(project_history.tutorial_text)
+    shortcode_index = ShortcodeIndex(soup)
+    try:
+        # Check the text does not mix commit and jr-commit shortcodes.
+        shortcode_index.ordered_commit_slugs
+    except Exception as err:
+        failures.append((-1, failure_message(err)))
+
+    for position, div in enumerate(shortcode_index.jr_commit_divs):
+        slug = div.attrs["data-slug"]
+        try:
+            kind, args = jr_commit_kind_and_args(div)
+        except Exception as err:
+            failures.append((position, f"{slug}: {failure_message(err)}"))
+            continue
+
+        description = jr_commit_description(slug, kind, args)
+        if not project_history.slug_is_known(slug):
+            failures.append((position, f"{description}: slug not found"))
+            continue
+
+        commit = project_history.commit_from_slug[slug]
+        try:
+            job = commit.maybe_rich_commit_json_job(kind, args)
+        except Exception as err:
+            failures.append(
+                (position, f"{description}: {failure_message(err)}")
+            )
+            continue
+
+        checks.append(
+            JrCommitCheck(position, description, job.function, job.args)
+        )
+
+    return len(shortcode_index.jr_commit_divs), checks, failures
+
+
+def tutorial_checks(spec):
+    """The :py:class:`TutorialChecks` of the tutorial described by *spec*
+
+    This is a module-level function so that it can be run in a worker process.
+    Failing to create the tutorial's history (e.g., because its structure is
+    invalid) is itself reported as a failure.
+    """
+    t0 = time.perf_counter()
+    build_cache = (
+        None
+        if spec.maybe_cache_db_path is None
+        else BuildCache(spec.maybe_cache_db_path)
+    )
+    try:
+        project_history = ProjectHistory(
+            repository_at_path(spec.repo_path),
+            spec.tip_revision,
+            build_cache=build_cache,
+        )
+        n_jr_commits, checks, failures = checks_of_project_history(
+            project_history
+        )
+    except Exception as err:
+        n_jr_commits, checks, failures = 0, [], [(-1, failure_message(err))]
+    finally:
+        if build_cache is not None:
+            build_cache.close()
+
+    return TutorialChecks(
+        n_jr_commits, checks, failures, time.perf_counter() - t0
+    )
+
+
+def timed_check_result(function_and_args):
+    """The failure message (or ``None``) of a check, and the time it took"""
+    t0 = time.perf_counter()
+    try:
+        call_with_args(function_and_args)
+        maybe_failure = None
+    except Exception as err:
+        maybe_failure = failure_message(err)
+    return maybe_failure, time.perf_counter() - t0
+
+
+@dataclass
+class TutorialValidation:
+    """The outcome of checking all jr-commits of one tutorial
+
+    The *failures* are in the order of the tutorial text.  The
+    *elapsed_seconds* is the total time spent on this tutorial, across all
+    worker processes.
+    """
+
+    name: str
+    n_jr_commits: int
+    failures: List[str]
+    elapsed_seconds: float
+
+    @property
+    def is_valid(self):
+        return not self.failures
+
+    def report_lines(self):
+        status = "ok" if self.is_valid else f"{len(self.failures)} failure(s)"
+        yield (
+            f"{self.name}: {status};"
+            f" {self.n_jr_commits} jr-commit(s) checked"
+            f" in {self.elapsed_seconds:.2f}s"
+        )
+        for failure in self.failures:
+            yield f"    {failure}"
+
+
+def validations_using_map(specs, map_fun):
+    """Validate the tutorials of *specs*, doing the work via *map_fun*
+
+    The *map_fun* is called like ``map(fun, items)``, and must give results in
+    the order of the *items*.
+    """
+    all_tutorial_checks = list(map_fun(tutorial_checks, specs))
+
+    all_checks = [
+        check
+        for checks_of_tutorial in all_tutorial_checks
+        for check in checks_of_tutorial.checks
+    ]
+    check_results = iter(map_fun(
+        timed_check_result,
+        [(check.function, check.args) for check in all_checks],
+    ))
+
+    validations = []
+    for spec, checks_of_tutorial in zip(specs, all_tutorial_checks):
+        failures = list(checks_of_tutorial.failures)
+        elapsed_seconds = checks_of_tutorial.elapsed_seconds
+        for check in checks_of_tutorial.checks:
+            maybe_failure, check_seconds = next(check_results)
+            elapsed_seconds += check_seconds
+            if maybe_failure is not None:
+                failures.append(
+                    (check.position, f"{check.description}: {maybe_failure}")
+                )
+        failures.sort(key=lambda failure: failure[0])
+        validations.append(TutorialValidation(
+            spec.name,
+            checks_of_tutorial.n_jr_commits,
+            [message for _, message in failures],
+            elapsed_seconds,
+        ))
+    return validations
+
+
+def validate_tutorials(specs, n_jobs=1):
+    """List of :py:class:`TutorialValidation`, one per spec in *specs*
+
+    If *n_jobs* is more than one, the work is done in a pool of that many
+    worker processes.
+    """
+    specs = list(specs)
+
+    if n_jobs == 1:
+        return validations_using_map(specs, map)
+
+    with ProcessPoolExecutor(
+            max_workers=n_jobs,
+            initializer=configure_worker_process,
+            initargs=worker_process_initargs(),
+    ) as executor:
+        def pool_map(fun, items):
+            # Send the items in a few chunks per worker, since each check is
+            # fairly quick.  A tutorial's checks are consecutive, so most
+            # chunks hold checks of just one tutorial.
+            chunksize = max(1, len(items) // (4 * n_jobs))
+            return executor.map(fun, items, chunksize=chunksize)
+
+        return validations_using_map(specs, pool_map)
@@ -0,0 +1,130 @@
+import sys
+
+import pygit2
+import click
+
+from .tutorialcompiler.fromgitrepo.build_cache import maybe_build_cache
+from .tutorialcompiler.fromgitrepo.repo_functions import configure_object_cache
+from .tutorialcompiler.fromgitrepo.soup_parsing import (
+    available_parser_backends,
+    configure_parser_backend,
+)
+from .tutorialcompiler.gather_tutorials import TutorialCollection
+from .tutorialcompiler.validate_tutorials import (
+    tutorial_specs_from_branches,
+    tutorial_specs_from_index,
+    validate_tutorials,
+)
+
+
+@click.command()
+@click.option(
+    "-r", "--repository-path",
+    default=pygit2.discover_repository("."),
+    envvar="GIT_DIR",
+    metavar="PATH",
+    help="path to root of git repository",
+)
+@click.option(
+    "--index-source",
+    type=click.Choice([x.name for x in TutorialCollection.IndexSource],
+                      case_sensitive=False),
+    default=None,  # Set default manually, to tell whether user gave option
+    help='what source to use for the "index.yaml" file of tutorials',
+)
+@click.option(
+    "--branches",
+    "branch_pattern",
+    default=None,
+    metavar="PATTERN",
+    help=("validate the tutorials at the tips of all local branches"
+          ' matching this wildcard pattern (e.g., "bunner*"),'
+          ' instead of those in "index.yaml"'),
+)
+@click.option(
+    "--cache/--no-cache",
+    "use_cache",
+    default=True,
+    help="whether to use the persistent cache in the repo's git directory",
+)
+@click.option(
+    "--git-object-cache-mb",
+    type=click.IntRange(min=1),
+    default=None,
+    metavar="MB",
+    help="size of the git object cache shared by all tutorials",
+)
+@click.option(
+    "-j", "--jobs",
+    "n_jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="how many processes to share the checks among",
+)
+@click.option(
+    "--html-parser",
+    type=click.Choice(available_parser_backends()),
+    default=available_parser_backends()[0],
+    help="which parser to use for HTML (lxml is quicker, if installed)",
+)
+def main(
+        repository_path,
+        index_source,
+        branch_pattern,
+        use_cache,
+        git_object_cache_mb,
+        n_jobs,
+        html_parser,
+):
+    """Check every jr-commit of every tutorial against its commit
+
+    Report each tutorial's failures, and how long its checks took.  Exit with
+    non-zero status if there were any failures.
+    """
+    if repository_path is None:
+        raise click.UsageError(
+            "\nUnable to discover repository.  Please specify one\n"
+            "either with the -r/--repository-path option or via\n"
+            "the GIT_DIR environment variable.")
+
+    if branch_pattern is not None and index_source is not None:
+        raise click.BadArgumentUsage(
+            "cannot specify both index-source and branches"
+        )
+
+    # Set default, or convert from string to enumerator.
+    index_source = (
+        TutorialCollection.IndexSource.WORKING_DIRECTORY
+        if index_source is None
+        else getattr(TutorialCollection.IndexSource, index_source)
+    )
+
+    if git_object_cache_mb is not None:
+        configure_object_cache(git_object_cache_mb)
+    configure_parser_backend(html_parser)
+
+    with maybe_build_cache(repository_path, use_cache) as build_cache:
+        maybe_cache_db_path = (
+            None if build_cache is None else str(build_cache.db_path)
+        )
+        specs = (
+            tutorial_specs_from_index(
+                repository_path, index_source, maybe_cache_db_path
+            )
+            if branch_pattern is None
+            else tutorial_specs_from_branches(
+                repository_path, branch_pattern, maybe_cache_db_path
+            )
+        )
+        validations = validate_tutorials(specs, n_jobs)
+
+    for validation in validations:
+        for line in validation.report_lines():
+            click.echo(line)
+
+    n_invalid = sum(not validation.is_valid for validation in validations)
+    click.echo(
+        f"{len(validations)} tutorial(s) checked;"
+        f" {n_invalid} with failures"
+    )
+    sys.exit(1 if n_invalid else 0)
@@ -9,6 +9,11 @@ from pytchbuild.tutorialcompiler.fromgitrepo.tutorial_history import (
 from pytchbuild.tutorialcompiler.fromgitrepo.tutorial_html_fragment import (
     tutorial_div_from_project_history,
 )
+from pytchbuild.tutorialcompiler.fromgitrepo.build_cache import maybe_build_cache
+from pytchbuild.tutorialcompiler.fromgitrepo.soup_parsing import (
+    available_parser_backends,
+    configure_parser_backend,
+)
 import pygit2
 import json
 import janus
@@ -160,12 +165,15 @@ async def rebuild_tutorial(
         read_q,
         write_q,
         repository_path,
-        tip_revision
+        tip_revision,
+        build_cache,
 ):
-    # TODO: Don't keep rebuilding the entire ProjectHistory if all that's
-    # changed is the tutorial text markdown file.  Would require some rework of
-    # the ProjectHistory and some check that the HEAD (say) hasn't moved on
-    # between last time we processed the repo.
+    # Keep one ProjectHistory, and refresh() it for each rebuild.  This only
+    # examines commits made since last time (e.g., by the author committing or
+    # amending), and re-reads the working-directory tutorial text.  Flush the
+    # persistent cache (if any) after each rebuild, so that a later session
+    # can re-use, e.g., the rendered patches.
+    project_history = None
     while True:
         print("rebuild_tutorial(): waiting for IDE msg")
         msg = await read_q.get()
@@ -173,12 +181,18 @@ async def rebuild_tutorial(
         if msg.kind == "tutorial":
             print("rebuild_tutorial(): rebuilding html-fragment")
             try:
-                project_history = ProjectHistory(
-                    repository_path,
-                    tip_revision,
-                    ProjectHistory.TutorialTextSource.WORKING_DIRECTORY
-                )
+                if project_history is None:
+                    project_history = ProjectHistory(
+                        repository_path,
+                        tip_revision,
+                        ProjectHistory.TutorialTextSource.WORKING_DIRECTORY,
+                        build_cache=build_cache,
+                    )
+                else:
+                    project_history.refresh(tip_revision)
                 tutorial_html = tutorial_div_from_project_history(project_history)
+                if build_cache is not None:
+                    build_cache.flush()
                 html_msg = msg.with_new_text(str(tutorial_html))
                 print(f'rebuild_tutorial(): forwarding transformed {html_msg}')
                 await write_q.put(html_msg)
@@ -275,7 +289,7 @@ class ReloadServer:
             print(f"serve_client() [{qid}]: unregistered; leaving")
 
 
-async def async_main(dirname, repository_path, tip_revision):
+async def async_main(dirname, repository_path, tip_revision, build_cache):
     """Connect all the above together
 
     We launch a ``PytchFilesHandler``, which feeds (via some processing steps)
@@ -333,7 +347,8 @@ async def async_main(dirname, repository_path, tip_revision):
 
     rebuilt_msgs_q = asyncio.Queue()
     asyncio.create_task(rebuild_tutorial(ide_msgs_q, rebuilt_msgs_q,
-                                         repository_path, tip_revision))
+                                         repository_path, tip_revision,
+                                         build_cache))
 
     message_broker = MessageBroker(rebuilt_msgs_q)
     asyncio.create_task(message_broker.relay_messages())
@@ -358,12 +373,24 @@ async def async_main(dirname, repository_path, tip_revision):
     metavar="REVISION",
     help="revision (e.g., branch name) at tip of tutorial",
 )
+@click.option(
+    "--cache/--no-cache",
+    "use_cache",
+    default=True,
+    help="whether to use the persistent cache in the repo's git directory",
+)
+@click.option(
+    "--html-parser",
+    type=click.Choice(available_parser_backends()),
+    default=available_parser_backends()[0],
+    help="which parser to use for HTML (lxml is quicker, if installed)",
+)
 @click.argument(
     "dirname",
     type=click.Path(exists=True, file_okay=False),
     # Where does this go: help="the directory to watch for tutorial content changes"
 )
-def main(dirname, repository_path, tip_revision):
+def main(dirname, repository_path, tip_revision, use_cache, html_parser):
     if repository_path is None:
         repository_path = pygit2.discover_repository(dirname)
     if repository_path is None:
@@ -372,4 +399,8 @@ def main(dirname, repository_path, tip_revision):
             "either with the -r/--repository-path option or via\n"
             "the GIT_DIR environment variable.")
 
-    asyncio.run(async_main(dirname, repository_path, tip_revision))
+    configure_parser_backend(html_parser)
+    with maybe_build_cache(repository_path, use_cache) as build_cache:
+        asyncio.run(
+            async_main(dirname, repository_path, tip_revision, build_cache)
+        )
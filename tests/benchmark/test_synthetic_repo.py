@@ -0,0 +1,113 @@
+import io
+import zipfile
+
+import pytest
+from click.testing import CliRunner
+
+from pytchbuild.benchmark import suite
+from pytchbuild.benchmark.synthetic_repo import (
+    SyntheticRepoSpec,
+    chapter_step_indexes,
+    create_synthetic_repo,
+)
+from pytchbuild.tutorialcompiler.gather_tutorials import TutorialCollection
+
+
+small_spec = SyntheticRepoSpec(
+    n_tutorials=2,
+    n_per_method_tutorials=1,
+    n_steps=7,
+    n_untagged_commits=3,
+    n_chapters=3,
+    n_assets=4,
+    asset_size=16,
+)
+
+
+@pytest.fixture(scope="module")
+def small_collection(tmp_path_factory):
+    repo_path = tmp_path_factory.mktemp("synthetic-repo")
+    create_synthetic_repo(str(repo_path), small_spec)
+    return TutorialCollection.from_repo_path(
+        str(repo_path),
+        TutorialCollection.IndexSource.RECIPES_TIP,
+    )
+
+
+class TestSyntheticRepoSpec:
+    def test_too_many_per_method(self):
+        with pytest.raises(ValueError, match="per-method"):
+            SyntheticRepoSpec(n_tutorials=2, n_per_method_tutorials=3)
+
+    def test_unknown_asset_format(self):
+        with pytest.raises(ValueError, match="unknown asset formats"):
+            SyntheticRepoSpec(asset_formats=("png", "gif"))
+
+    def test_program_kinds(self):
+        kinds = [small_spec.program_kind(i) for i in range(2)]
+        assert kinds == ["flat", "per-method"]
+
+
+@pytest.mark.parametrize(
+    "n_steps, n_chapters, exp_lengths",
+    [
+        (7, 3, [2, 2, 3]),
+        (6, 3, [2, 2, 2]),
+        (2, 3, [0, 1, 1]),
+    ],
+)
+def test_chapter_step_indexes(n_steps, n_chapters, exp_lengths):
+    step_idxs = chapter_step_indexes(n_steps, n_chapters)
+    assert [len(idxs) for idxs in step_idxs] == exp_lengths
+    assert [i for idxs in step_idxs for i in idxs] == list(range(n_steps))
+
+
+class TestSyntheticRepo:
+    def test_tutorials(self, small_collection):
+        assert list(small_collection.tutorials) == ["Synthetic 0", "Synthetic 1"]
+
+    def test_histories(self, small_collection):
+        for info in small_collection.tutorials.values():
+            history = info.project_history
+            assert history.top_level_directory_name == info.branch_name
+            exp_slugs = [f"step-{i}" for i in range(small_spec.n_steps)]
+            assert history.ordered_commit_slugs == exp_slugs
+            n_exp_assets = small_spec.n_assets + 1  # Including screenshot
+            assert len(history.all_assets) == n_exp_assets
+
+    def test_gather(self, small_collection):
+        out_file = io.BytesIO()
+        small_collection.write_new_zipfile(None, out_file)
+        with zipfile.ZipFile(out_file) as zfile:
+            names = zfile.namelist()
+            tutorial_html = zfile.read("synthetic-1/tutorial.html").decode()
+        assert "synthetic-0/tutorial.html" in names
+        assert "synthetic-1/skeleton-structured-program.json" in names
+        assert tutorial_html.count('class="jr-commit"') == small_spec.n_steps
+
+    def test_asset_media(self, small_collection):
+        library_data = small_collection.all_asset_media()
+        # Per tutorial: one entry for the grouped first two images, and one
+        # for the other image; the WAV is not part of the media library.
+        assert len(library_data.entries) == 4
+
+    def test_reproducible(self, small_collection, tmp_path):
+        create_synthetic_repo(str(tmp_path), small_spec)
+        other_collection = TutorialCollection.from_repo_path(
+            str(tmp_path),
+            TutorialCollection.IndexSource.RECIPES_TIP,
+        )
+        assert (
+            other_collection.gathered_tip_oids
+            == small_collection.gathered_tip_oids
+        )
+
+
+def test_suite_runs():
+    runner = CliRunner()
+    result = runner.invoke(
+        suite.main,
+        ["--n-tutorials", "1", "--n-steps", "2", "--n-assets", "1", "-n", "1"],
+    )
+    assert result.exit_code == 0
+    assert '"gather":' in result.output
@@ -0,0 +1,13 @@
+import pytch
+
+
+class Bowl(pytch.Sprite):
+    Costumes = ["hello.png"]
+
+    @pytch.when_green_flag_clicked
+    def good(self):
+        pass
+
+    @pytch.when_unicorns_arrive
+    def bad(self):
+        pass
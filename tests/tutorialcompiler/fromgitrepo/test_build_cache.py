@@ -0,0 +1,124 @@
+import pytest
+import pygit2
+
+from pytchbuild.benchmark.synthetic_repo import HistoryWriter
+import pytchbuild.tutorialcompiler.fromgitrepo.build_cache as BC
+import pytchbuild.tutorialcompiler.fromgitrepo.patch_html as PH
+import pytchbuild.tutorialcompiler.fromgitrepo.tutorial_history as TH
+
+
+@pytest.fixture
+def cache_db_path(tmp_path):
+    return tmp_path / "cache.sqlite"
+
+
+class TestPersistentLruTable:
+    def test_round_trip(self, cache_db_path):
+        cache = BC.BuildCache(cache_db_path)
+        cache.commit_deltas.put("abc", [[1, "a", "00", "a", "11"]])
+        # Visible before flushing:
+        assert cache.commit_deltas.get("abc") == [[1, "a", "00", "a", "11"]]
+        cache.close()
+
+        cache = BC.BuildCache(cache_db_path)
+        assert cache.commit_deltas.get("abc") == [[1, "a", "00", "a", "11"]]
+        assert cache.commit_deltas.get("def") is None
+        assert cache.commit_deltas.n_hits == 1
+        assert cache.commit_deltas.n_misses == 1
+        cache.close()
+
+    def test_version_mismatch(self, cache_db_path):
+        cache = BC.BuildCache(cache_db_path)
+        cache.commit_deltas.put("abc", [])
+        cache.close()
+
+        cache = BC.BuildCache(cache_db_path)
+        cache.commit_deltas.version += 1
+        assert cache.commit_deltas.get("abc") is None
+        cache.close()
+
+    def test_eviction(self, cache_db_path):
+        cache = BC.BuildCache(cache_db_path, max_entries=3)
+        for key in ["k1", "k2", "k3"]:
+            cache.commit_deltas.put(key, key)
+            cache.flush()
+        cache.commit_deltas.get("k1")  # Mark as recently used
+        cache.commit_deltas.put("k4", "k4")
+        cache.close()
+
+        cache = BC.BuildCache(cache_db_path, max_entries=3)
+        got_values = [cache.commit_deltas.get(k) for k in ["k1", "k2", "k3", "k4"]]
+        assert got_values == ["k1", None, "k3", "k4"]
+        cache.close()
+
+
+class TestInMemoryLruTable:
+    def test_eviction(self):
+        table = BC.InMemoryLruTable(max_entries=3)
+        for key in ["k1", "k2", "k3"]:
+            table.put(key, key)
+        table.get("k1")  # Mark as recently used
+        table.put("k4", "k4")
+        got_values = [table.get(k) for k in ["k1", "k2", "k3", "k4"]]
+        assert got_values == ["k1", None, "k3", "k4"]
+        assert (table.n_hits, table.n_misses) == (4, 1)
+
+
+class TestMaybeBuildCache:
+    def test_disabled(self, tmp_path):
+        with BC.maybe_build_cache(tmp_path, False) as build_cache:
+            assert build_cache is None
+
+
+class TestDeltaRecord:
+    def test_json_round_trip(self):
+        record = TH.DeltaRecord(
+            3,
+            TH.DeltaFile("boing/code.py", "1234abcd"),
+            TH.DeltaFile("boing/code.py", "5678cdef"),
+        )
+        round_tripped = TH.DeltaRecord.from_json_obj(record.as_json_obj())
+        assert round_tripped == record
+
+
+@pytest.fixture
+def code_change_commit_oid(tmp_path):
+    repo = pygit2.init_repository(tmp_path / "repo.git", bare=True)
+    history_writer = HistoryWriter(repo)
+    history_writer.files["boing/code.py"] = b"import pytch\n"
+    history_writer.commit("{base} Add code\n")
+    history_writer.files["boing/code.py"] = b"import pytch\nx = 1 < 2\n"
+    history_writer.commit("{#set-x} Set x\n")
+    return repo, history_writer.maybe_tip_oid
+
+
+class TestRenderedPatchCache:
+    def test_round_trip(self, cache_db_path, code_change_commit_oid):
+        repo, oid = code_change_commit_oid
+
+        exp_patch = TH.ProjectCommit(repo, oid).rendered_code_patch
+        assert exp_patch.code_text == "import pytch\nx = 1 < 2\n"
+        assert "x = 1 &lt; 2" in exp_patch.html
+
+        cache = BC.BuildCache(cache_db_path)
+        got_patch = TH.ProjectCommit(repo, oid, cache).rendered_code_patch
+        assert got_patch == exp_patch
+        assert cache.rendered_patches.n_misses == 1
+        cache.close()
+
+        cache = BC.BuildCache(cache_db_path)
+        got_patch = TH.ProjectCommit(repo, oid, cache).rendered_code_patch
+        assert got_patch == exp_patch
+        assert cache.rendered_patches.n_hits == 1
+        cache.close()
+
+    def test_keyed_by_blobs(self, cache_db_path, code_change_commit_oid):
+        repo, oid = code_change_commit_oid
+        delta = TH.ProjectCommit(repo, oid).sole_modify_against_parent
+        cache_key = f"{delta.old_file.id}:{delta.new_file.id}"
+
+        cache = BC.BuildCache(cache_db_path)
+        cache.rendered_patches.put(cache_key, ["<div>cached</div>", "cached"])
+        got_patch = TH.ProjectCommit(repo, oid, cache).rendered_code_patch
+        assert got_patch == PH.RenderedCodePatch("<div>cached</div>", "cached")
+        cache.close()
@@ -88,3 +88,12 @@ class TestMediaLibraryItem:
         assert item.name == "rectangle.png"
         assert item.relativeUrl.endswith("3d610f3c7257a7137137ca2219ba1f0a.png")
         assert item.size == [80, 40]
+
+
+class TestMediaLibraryData:
+    def test_with_ids_offset(self):
+        data = MLib.MediaLibraryData(entries, {})
+        offset_data = data.with_ids_offset(100)
+        assert [e.id for e in offset_data.entries] == [1101, 1103, 1104, 1102]
+        assert [e.name for e in offset_data.entries] == [e.name for e in entries]
+        assert [e.id for e in data.entries] == [1001, 1003, 1004, 1002]
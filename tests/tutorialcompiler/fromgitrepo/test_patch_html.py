@@ -0,0 +1,70 @@
+import pytest
+import pygit2
+from bs4 import BeautifulSoup
+
+import pytchbuild.tutorialcompiler.fromgitrepo.patch_html as PH
+import pytchbuild.tutorialcompiler.fromgitrepo.tutorial_html_fragment as THF
+
+
+old_code = """import pytch
+
+class Ball(pytch.Sprite):
+    Costumes = ["ball.png"]
+
+    def move(self):
+        if self.x < 0 and self.y > 0:
+            self.say("Tom & Jerry")
+        pass
+"""
+
+new_code = """import pytch
+
+class Ball(pytch.Sprite):
+    Costumes = ['ball.png', "bat.png"]
+
+    def move(self):
+        if self.x <= 0 and self.y >= 0:
+            self.say("Tom & Jerry's <b>")
+        print("déjà vu")
+
+        pass
+    \t
+"""
+
+
+@pytest.mark.parametrize(
+    "old_text,new_text",
+    [
+        (old_code, new_code),
+        (new_code, old_code),
+        ("", new_code),
+        (old_code, ""),
+        ("a\n" * 20 + "b\n" + "a\n" * 20, "a\n" * 20 + "c\n" + "a\n" * 20 + "d\n"),
+        ('x = "<"\n', "x = '>'\n"),
+        ('x = "<"\n', "x = \"'&'\"\n"),
+    ])
+def test_same_as_soup(old_text, new_text):
+    patch = pygit2.Patch.create_from(old_text, new_text)
+    soup = BeautifulSoup("", "html.parser")
+    exp_html = str(THF.tables_div_from_patch(soup, patch))
+    assert PH.patch_html(patch) == exp_html
+
+
+@pytest.mark.parametrize(
+    "value,exp_quoted",
+    [
+        ("abc", '"abc"'),
+        ("a'b", "\"a'b\""),
+        ('a"b', "'a\"b'"),
+        ("a'\"b", '"a\'&quot;b"'),
+        ("<&>", '"&lt;&amp;&gt;"'),
+    ])
+def test_quoted_attribute_value(value, exp_quoted):
+    assert PH.quoted_attribute_value(value) == exp_quoted
+
+
+def test_raw_html_in_soup():
+    soup = BeautifulSoup('<div class="patch-container"></div>', "html.parser")
+    div = soup.find("div")
+    div.append(PH.RawHtml("<p>A &amp; B</p>"))
+    assert str(soup) == '<div class="patch-container"><p>A &amp; B</p></div>'
@@ -0,0 +1,89 @@
+import gzip
+import io
+import zipfile
+
+import pytest
+
+import pytchbuild.tutorialcompiler.fromgitrepo.precompression as PC
+from pytchbuild.tutorialcompiler.fromgitrepo.precompression import (
+    MAX_PENDING_FILES,
+    Precompression,
+    write_text_files,
+)
+
+
+TEXT_FILES = [
+    ("foo/tutorial.html", b"<div>hello world</div>" * 100),
+    ("foo/summary.html", b"<div>summary</div>"),
+]
+
+
+def zipfile_with_text_files(precompressions, text_files=TEXT_FILES):
+    out_file = io.BytesIO()
+    with zipfile.ZipFile(out_file, "w", compression=zipfile.ZIP_DEFLATED) as zfile:
+        write_text_files(zfile, text_files, precompressions)
+    return zipfile.ZipFile(out_file, "r")
+
+
+def test_no_precompression(monkeypatch):
+    def no_thread_pool():
+        raise AssertionError("thread pool not needed")
+
+    monkeypatch.setattr(PC, "ThreadPoolExecutor", no_thread_pool)
+    zfile = zipfile_with_text_files([])
+    assert zfile.namelist() == ["foo/tutorial.html", "foo/summary.html"]
+
+
+def test_gzip():
+    zfile = zipfile_with_text_files([Precompression.GZIP])
+    assert zfile.namelist() == [
+        "foo/tutorial.html",
+        "foo/tutorial.html.gz",
+        "foo/summary.html",
+        "foo/summary.html.gz",
+    ]
+    for path, data in TEXT_FILES:
+        assert zfile.read(path) == data
+        variant_path = path + ".gz"
+        assert gzip.decompress(zfile.read(variant_path)) == data
+        assert zfile.getinfo(variant_path).compress_type == zipfile.ZIP_STORED
+
+
+def test_gzip_many_files():
+    text_files = [
+        (f"foo/file-{idx}.html", f"<p>{idx}</p>".encode() * 10)
+        for idx in range(3 * MAX_PENDING_FILES)
+    ]
+    zfile = zipfile_with_text_files([Precompression.GZIP], text_files)
+    assert zfile.namelist() == [
+        name
+        for path, _ in text_files
+        for name in [path, path + ".gz"]
+    ]
+    for path, data in text_files:
+        assert gzip.decompress(zfile.read(path + ".gz")) == data
+
+
+def test_gzip_reproducible():
+    def gzip_data():
+        zfile = zipfile_with_text_files([Precompression.GZIP])
+        return zfile.read("foo/tutorial.html.gz")
+
+    assert gzip_data() == gzip_data()
+
+
+@pytest.mark.skipif(
+    not Precompression.BROTLI.is_available,
+    reason="brotli not installed",
+)
+def test_brotli():
+    import brotli
+
+    zfile = zipfile_with_text_files([Precompression.GZIP, Precompression.BROTLI])
+    assert zfile.namelist()[:3] == [
+        "foo/tutorial.html",
+        "foo/tutorial.html.gz",
+        "foo/tutorial.html.br",
+    ]
+    data = TEXT_FILES[0][1]
+    assert brotli.decompress(zfile.read("foo/tutorial.html.br")) == data
@@ -1,7 +1,15 @@
+import multiprocessing
+import pygit2
 import pytest
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import pytchbuild.tutorialcompiler.fromgitrepo.repo_functions as TCRF
+import pytchbuild.tutorialcompiler.fromgitrepo.soup_parsing as SP
+from pytchbuild.tutorialcompiler.gather_tutorials import (
+    configure_worker_process,
+    worker_process_initargs,
+)
 
 
 class TestEnsureStatusClean:
@@ -30,6 +38,33 @@ class TestEnsureStatusClean:
             TCRF.ensure_status_clean(clean_cloned_repo)
 
 
+def worker_configuration():
+    return SP.current_parser_backend, pygit2.settings.cached_memory[1]
+
+
+class TestConfigureObjectCache:
+    def test_spawned_worker_matches(self):
+        original_max_size = pygit2.settings.cached_memory[1]
+        original_mb = TCRF.configured_object_cache_mb
+        TCRF.configure_object_cache(3)
+        try:
+            assert worker_process_initargs()[1] == 3
+            with ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=configure_worker_process,
+                    initargs=worker_process_initargs(),
+            ) as executor:
+                got_configuration = executor.submit(worker_configuration).result()
+            assert got_configuration == (
+                SP.current_parser_backend,
+                3 * 1024 * 1024,
+            )
+        finally:
+            pygit2.settings.cache_max_size(original_max_size)
+            TCRF.configured_object_cache_mb = original_mb
+
+
 class TestCreateSignature:
     def test_returns_value(self, clean_cloned_repo):
         # Pretty weak test.
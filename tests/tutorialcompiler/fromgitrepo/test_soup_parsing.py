@@ -0,0 +1,122 @@
+import io
+import zipfile
+
+import pytest
+
+from pytchbuild.benchmark.synthetic_repo import SyntheticRepoSpec, create_synthetic_repo
+from pytchbuild.tutorialcompiler.gather_tutorials import TutorialCollection
+import pytchbuild.tutorialcompiler.fromgitrepo.soup_parsing as SP
+import pytchbuild.tutorialcompiler.fromgitrepo.tutorial_markdown as TM
+
+
+markdown_text = """# Title & "quotes"
+
+Intro with `code <b>` and <span class="x">raw HTML</span>&nbsp;here.
+
+{{< asset-credits >}}
+
+---
+
+## Chapter 1
+
+{{< learner-task >}}
+
+Do *this*.
+
+{{< learner-task-help >}}
+
+Like `that`.
+
+{{< /learner-task >}}
+
+```python
+if a < b and c > d:
+    print("it's \\"done\\"")
+```
+
+<div class="raw"><p>Some <em>raw</em> HTML</p></div>
+
+{{< jr-commit add-ball add-medialib-appearance ["Ball & bat"] >}}
+
+* One
+* Two<br />three
+
+{{< commit step-1 >}}
+"""
+
+
+@pytest.fixture
+def parser_backend(request):
+    backend = request.param
+    if not SP.parser_backend_is_available(backend):
+        pytest.skip(f'parser backend "{backend}" not available')
+    original_backend = SP.current_parser_backend
+    SP.configure_parser_backend(backend)
+    yield backend
+    SP.configure_parser_backend(original_backend)
+
+
+def html_with_backend(backend, fun, *args):
+    original_backend = SP.current_parser_backend
+    SP.configure_parser_backend(backend)
+    try:
+        return fun(*args)
+    finally:
+        SP.configure_parser_backend(original_backend)
+
+
+all_backends = pytest.mark.parametrize(
+    "parser_backend", SP.PARSER_BACKENDS, indirect=True
+)
+
+
+@all_backends
+def test_fragment_children(parser_backend):
+    fragment = SP.parsed_fragment("<p>Hello</p>\n<div>world</div>")
+    assert [c.name for c in fragment.children] == ["p", None, "div"]
+
+
+@all_backends
+def test_empty_fragment(parser_backend):
+    assert list(SP.parsed_fragment("").children) == []
+
+
+@all_backends
+def test_markdown_same_as_html_parser(parser_backend):
+    exp_html = html_with_backend(
+        "html.parser", lambda: str(TM.soup_from_markdown_text(markdown_text))
+    )
+    got_html = str(TM.soup_from_markdown_text(markdown_text))
+    assert got_html == exp_html
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="not available"):
+        SP.configure_parser_backend("no-such-parser")
+
+
+@pytest.fixture(scope="module")
+def synthetic_collection(tmp_path_factory):
+    repo_path = tmp_path_factory.mktemp("synthetic-repo")
+    spec = SyntheticRepoSpec(n_tutorials=2, n_steps=6, n_assets=2, asset_size=8)
+    create_synthetic_repo(str(repo_path), spec)
+    return TutorialCollection.from_repo_path(
+        str(repo_path),
+        TutorialCollection.IndexSource.RECIPES_TIP,
+    )
+
+
+def collection_zipfile_contents(collection):
+    out_file = io.BytesIO()
+    collection.write_new_zipfile(None, out_file)
+    with zipfile.ZipFile(out_file) as zfile:
+        return {name: zfile.read(name) for name in zfile.namelist()}
+
+
+@all_backends
+def test_collection_same_as_html_parser(parser_backend, synthetic_collection):
+    exp_contents = html_with_backend(
+        "html.parser", collection_zipfile_contents, synthetic_collection
+    )
+    got_contents = collection_zipfile_contents(synthetic_collection)
+    assert got_contents == exp_contents
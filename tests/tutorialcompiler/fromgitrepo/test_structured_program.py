@@ -1,4 +1,5 @@
 import pytest
+import pygit2
 import pytchbuild.tutorialcompiler.fromgitrepo.tutorial_history as TH
 import pytchbuild.tutorialcompiler.fromgitrepo.structured_program as SP
 import pytchbuild.tutorialcompiler.fromgitrepo.structured_diff as SD
@@ -230,6 +231,7 @@ class TestStructuredProgram:
             ("invalid_class_statement.py", "unexpected ClassDef"),
             ("invalid_multiple_decorators.py", "Bowl.bad .* found 2"),
             ("invalid_no_decorators.py", "Bowl.bad .* found 0"),
+            ("invalid_unknown_decorator.py", "unknown attribute decorator"),
         ]
         for path, exp_exception_match in paths_with_exp_exception_match:
             with raises_TutorialStructureError(exp_exception_match):
@@ -257,12 +259,12 @@ class TestStructuredProgram:
         got_appearances = valid_program.all_appearances
         App = SP.ActorAppearance
         Id = SP.ActorIdentifier_make
-        exp_appearances = [
+        exp_appearances = (
             App(Id("sprite", "Bowl"), "bowl.png"),
             App(Id("sprite", "Bowl"), "basket.png"),
             App(Id("sprite", "Apple"), "apple.png"),
             App(Id("stage", "--ignored--"), "Dani.png"),
-        ]
+        )
         assert got_appearances == exp_appearances
 
     def test_valid_scripts(self, valid_program):
@@ -302,6 +304,29 @@ class TestStructuredProgram:
             path = Path(Id("sprite", "Banana"), "nothing")
             valid_program.handler_from_path(path)
 
+    def test_handler_body_lines(self, valid_program):
+        Id = SP.ActorIdentifier_make
+        path = SP.ScriptPath(Id("sprite", "Apple"), "move_down_stage")
+        handler = valid_program.handler_from_path(path)
+        assert handler.body_lines == [
+            "        print(1)", "        print(2)", "        print(3)"
+        ]
+
+    def test_handler_from_path_ambiguous(self):
+        sp = SP.StructuredPytchProgram(
+            "import pytch\n"
+            "class Bowl(pytch.Sprite):\n"
+            "    @pytch.when_green_flag_clicked\n"
+            "    def go(self):\n"
+            "        pass\n"
+            "    @pytch.when_this_sprite_clicked\n"
+            "    def go(self):\n"
+            "        pass\n"
+        )
+        path = SP.ScriptPath(SP.ActorIdentifier_make("sprite", "Bowl"), "go")
+        with raises_TutorialStructureError("expecting exactly one.*found 2"):
+            sp.handler_from_path(path)
+
     def test_canonical_actors_too_many(self):
         sp = structured_program_from_path("canon_actors_too_many.py")
         with raises_TutorialStructureError("expecting at most.*found 2"):
@@ -329,6 +354,93 @@ class TestStructuredProgram:
         self.assert_first_stage_second_sprite(sp)
 
 
+class TestIncrementalProgram:
+    @staticmethod
+    def edited_text(text, lineno, n_delete, new_lines):
+        lines = text.split("\n")
+        lines[lineno - 1:lineno - 1 + n_delete] = new_lines
+        return "\n".join(lines)
+
+    @staticmethod
+    def programs(old_text, new_text):
+        old_program = SP.StructuredPytchProgram(old_text)
+        patch = pygit2.Patch.create_from(
+            old_text.encode(), new_text.encode(), context_lines=0
+        )
+        incremental_program = SP.StructuredPytchProgram.from_previous(
+            old_program, new_text, patch.hunks
+        )
+        return old_program, incremental_program
+
+    def assert_same_as_full_parse(self, program):
+        full_program = SP.StructuredPytchProgram(program.code_text)
+        assert (
+            list(program.top_level_classes.items())
+            == list(full_program.top_level_classes.items())
+        )
+        assert program.class_blocks == full_program.class_blocks
+
+    @pytest.mark.parametrize(
+        "lineno, n_delete, new_lines, exp_n_reused",
+        [
+            # Change body of Apple's method:
+            (20, 1, ["        print(20)", "        print(21)"], 2),
+            # Add method at end of last class:
+            (
+                39, 0,
+                [
+                    "",
+                    "    @pytch.when_this_sprite_clicked",
+                    "    def grow(self):",
+                    "        pass",
+                ],
+                2,
+            ),
+            # Add class between Bowl and Apple:
+            (13, 0, ["class Pear(pytch.Sprite):", "    Costumes = []", ""], 3),
+            # Delete the ScoreKeeper class:
+            (24, 15, [], 2),
+            # Change a top-level line:
+            (1, 1, ["import pytch  # the library"], 3),
+        ]
+    )
+    def test_same_as_full_parse(
+            self, valid_program_text, lineno, n_delete, new_lines, exp_n_reused
+    ):
+        new_text = self.edited_text(
+            valid_program_text, lineno, n_delete, new_lines
+        )
+        old_program, program = self.programs(valid_program_text, new_text)
+        self.assert_same_as_full_parse(program)
+
+        # A class which was not re-parsed shares its appearances list
+        # with that of the old program.
+        n_reused = sum(
+            any(
+                actor.appearances is old_actor.appearances
+                for old_actor in old_program.actors
+            )
+            for actor in program.actors
+        )
+        assert n_reused == exp_n_reused
+
+    def test_unclosed_string(self, valid_program_text):
+        new_text = self.edited_text(valid_program_text, 13, 0, ['"""'])
+        with pytest.raises(SyntaxError):
+            self.programs(valid_program_text, new_text)
+
+    def test_method_outdented(self, valid_program_text):
+        # The method becomes a top-level function; the class is empty.
+        new_text = self.edited_text(
+            valid_program_text, 17, 5,
+            ["@pytch.when_I_receive('drop-apple')", "def move_down_stage():",
+             "    print(1)"]
+        )
+        _, program = self.programs(valid_program_text, new_text)
+        self.assert_same_as_full_parse(program)
+        assert program.top_level_classes["Apple"].handlers == []
+
+
 ########################################################################
 
 
@@ -388,6 +500,15 @@ class TestRichCommits:
             # Ignore return value; test that it runs without error:
             diff.rich_commit(kind, *args)
 
+    def test_from_programs(self, apple_history):
+        for slug, kind, *args in self.slugs_with_kinds_and_args:
+            codes = apple_history.old_and_new_code(slug)
+            exp_commit = SD.StructuredPytchDiff(*codes).rich_commit(kind, *args)
+            programs = [SP.StructuredPytchProgram(code) for code in codes]
+            diff = SD.StructuredPytchDiff.from_programs(*programs)
+            assert diff.old_program is programs[0]
+            assert diff.rich_commit(kind, *args) == exp_commit
+
     def test_examples_wrong_kind(self, apple_history):
         for slug, kind, *args in self.slugs_with_kinds_and_args:
             codes = apple_history.old_and_new_code(slug)
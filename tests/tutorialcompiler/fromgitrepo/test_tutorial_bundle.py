@@ -1,6 +1,7 @@
 import pytchbuild.tutorialcompiler.fromgitrepo.tutorial_bundle as TB
 import zipfile
 import io
+import json
 
 
 def test_bundle(project_history):
@@ -25,3 +26,17 @@ def test_bundle_zipfile(project_history):
         "boing/tutorial-assets/not-a-real-png.png",
         "boing/tutorial.html",
     ]
+
+
+def test_bundle_code_snapshot_table(project_history):
+    bundle = TB.TutorialBundle.from_project_history(
+        project_history, code_snapshot_style=TB.CodeSnapshotStyle.TABLE
+    )
+    round_trip_file = io.BytesIO()
+    bundle.write_new_zipfile(round_trip_file)
+    zfile = zipfile.ZipFile(round_trip_file, "r")
+
+    code_snapshots = json.loads(zfile.read("boing/code-snapshots.json"))
+    assert code_snapshots[project_history.final_code_blob_id] == (
+        project_history.final_code_text
+    )
@@ -4,11 +4,17 @@ import logging
 import io
 import json
 import itertools
+import pickle
 
 import pygit2
+from pathlib import Path
 from PIL import Image
 import pytchbuild.tutorialcompiler.fromgitrepo.tutorial_history as TH
 import pytchbuild.tutorialcompiler.fromgitrepo.errors as TCE
+from pytchbuild.tutorialcompiler.fromgitrepo.repo_functions import (
+    commit_files,
+    create_signature,
+)
 
 
 def _assert_data_content(exp_content):
@@ -60,6 +66,30 @@ class TestAsset:
     def test_path_suffix(self):
         assert self.sample_asset.path_suffix == ".png"
 
+    def test_from_blob(self, tmp_path):
+        repo = pygit2.init_repository(tmp_path, bare=True)
+        blob_id = repo.create_blob(b"Not really a PNG either")
+        asset = TH.Asset.from_blob("boing/project-assets/alien.png", repo, blob_id)
+        assert asset.size == 23
+        assert asset.data == b"Not really a PNG either"
+        assert str(asset) == '<Asset "boing/project-assets/alien.png": 23 bytes>'
+
+    def test_pickle(self, tmp_path):
+        repo = pygit2.init_repository(tmp_path, bare=True)
+        blob_id = repo.create_blob(b"Not really a PNG either")
+        asset = TH.Asset.from_blob("boing/project-assets/alien.png", repo, blob_id)
+        unpickled_asset = pickle.loads(pickle.dumps(asset))
+        assert unpickled_asset.path == asset.path
+        assert unpickled_asset.data == b"Not really a PNG either"
+        assert unpickled_asset.repo.path == repo.path
+
+        unpickled_asset = pickle.loads(pickle.dumps(self.sample_asset))
+        assert unpickled_asset.data == b"not-a-real-PNG-file"
+
+    def test_ctor_rejects(self):
+        with pytest.raises(TCE.InternalError, match="exactly one"):
+            TH.Asset("alien.png")
+
     def test_project_asset_local_path(self):
         asset_0 = TH.Asset("invaders/project-assets/images/L1/boom.jpg", b"")
         assert asset_0.project_asset_local_path == "images/L1/boom.jpg"
@@ -68,6 +98,196 @@ class TestAsset:
         assert asset_1.project_asset_local_path == "boom.jpg"
 
 
+def _delta_record(status, path):
+    return TH.DeltaRecord(
+        status,
+        TH.DeltaFile(path, "00" * 20),
+        TH.DeltaFile(path, "11" * 20),
+    )
+
+
+def _tree_from_files(repo, file_from_path):
+    # Values of file_from_path are (data, filemode) pairs.
+    root = {}
+    for path, file in file_from_path.items():
+        *dir_names, basename = path.split("/")
+        node = root
+        for dir_name in dir_names:
+            node = node.setdefault(dir_name, {})
+        node[basename] = file
+
+    def write_tree(node):
+        tree_builder = repo.TreeBuilder()
+        for name, child in node.items():
+            if isinstance(child, dict):
+                tree_builder.insert(name, write_tree(child), pygit2.GIT_FILEMODE_TREE)
+            else:
+                data, filemode = child
+                tree_builder.insert(name, repo.create_blob(data), filemode)
+        return tree_builder.write()
+
+    return repo[write_tree(root)]
+
+
+class TestDeltasBetweenTrees:
+    BLOB = pygit2.GIT_FILEMODE_BLOB
+    EXEC = pygit2.GIT_FILEMODE_BLOB_EXECUTABLE
+    LINK = pygit2.GIT_FILEMODE_LINK
+
+    old_files = {
+        "boing/code.py": (b"import pytch\n", BLOB),
+        "boing/tutorial.md": (b"# Boing\n", BLOB),
+        "boing/run.sh": (b"python code.py\n", BLOB),
+        "boing/link": (b"code.py", BLOB),
+        "boing/notes": (b"Some notes\n", BLOB),
+        "boing/asset-src/big/a.txt": (b"a\n", BLOB),
+        "boing/asset-src/big/b.txt": (b"b\n", BLOB),
+        "boing/old-dir/x.txt": (b"x\n", BLOB),
+        "boing/old-dir/sub/y.txt": (b"y\n", BLOB),
+    }
+
+    new_files = {
+        "boing/code.py": (b"import pytch\nimport random\n", BLOB),
+        "boing/tutorial.md": (b"# Boing\n", BLOB),
+        "boing/run.sh": (b"python code.py\n", EXEC),
+        "boing/link": (b"code.py", LINK),
+        "boing/notes/one.txt": (b"Note one\n", BLOB),
+        "boing/notes-2.txt": (b"More notes\n", BLOB),
+        "boing/asset-src/big/a.txt": (b"a\n", BLOB),
+        "boing/asset-src/big/b.txt": (b"b\n", BLOB),
+        "boing/project-assets/z.png": (b"z\n", BLOB),
+    }
+
+    @pytest.fixture
+    def repo(self, tmp_path):
+        return pygit2.init_repository(tmp_path, bare=True)
+
+    @staticmethod
+    def _assert_same_as_libgit2(old_tree, new_tree):
+        diff_args = () if old_tree is None else (old_tree,)
+        diff = new_tree.diff_to_tree(*diff_args, swap=True)
+        exp_deltas = [TH.DeltaRecord.from_delta(delta) for delta in diff.deltas]
+        got_deltas = TH.deltas_between_trees(old_tree, new_tree)
+        assert got_deltas == exp_deltas
+
+    def test_against_empty(self, repo):
+        new_tree = _tree_from_files(repo, self.old_files)
+        self._assert_same_as_libgit2(None, new_tree)
+
+    def test_assorted_changes(self, repo):
+        old_tree = _tree_from_files(repo, self.old_files)
+        new_tree = _tree_from_files(repo, self.new_files)
+        self._assert_same_as_libgit2(old_tree, new_tree)
+        self._assert_same_as_libgit2(new_tree, old_tree)
+
+    def test_no_changes(self, repo):
+        tree = _tree_from_files(repo, self.old_files)
+        assert TH.deltas_between_trees(tree, tree) == []
+
+
+class TestDeltasClassification:
+    ADDED = pygit2.GIT_DELTA_ADDED
+    MODIFIED = pygit2.GIT_DELTA_MODIFIED
+    DELETED = pygit2.GIT_DELTA_DELETED
+    Kind = TH.DeltasKind
+
+    def classify(self, *status_path_pairs):
+        deltas = [_delta_record(*pair) for pair in status_path_pairs]
+        return TH.DeltasClassification.from_deltas(deltas)
+
+    def test_no_deltas(self):
+        classification = self.classify()
+        assert classification.kind == self.Kind.NO_DELTAS
+        assert classification.n_deltas == 0
+        assert classification.sole_modified_delta is None
+
+    def test_adds_assets(self):
+        classification = self.classify(
+            (self.ADDED, "boing/project-assets/graphics/alien.png"),
+            (self.ADDED, "boing/project-assets/bell.mp3"),
+        )
+        assert classification.kind == self.Kind.ADDS_ASSETS
+        assert classification.asset_dirname == "project-assets"
+        assert len(classification.asset_deltas) == 2
+        assert classification.added_asset_dirnames == {"project-assets"}
+        assert classification.modified_asset_dirnames == set()
+
+    def test_modifies_assets(self):
+        classification = self.classify(
+            (self.MODIFIED, "boing/project-assets/graphics/alien.png"),
+        )
+        assert classification.kind == self.Kind.MODIFIES_ASSETS
+        assert classification.asset_dirname == "project-assets"
+        assert classification.sole_modified_basename == "alien.png"
+
+    @pytest.mark.parametrize(
+        "status_path_pairs, exp_added, exp_modified",
+        [
+            pytest.param(
+                [(ADDED, "boing/project-assets/alien.png"),
+                 (MODIFIED, "boing/code.py")],
+                {"project-assets"}, set(),
+                id="asset-and-code",
+            ),
+            pytest.param(
+                [(ADDED, "boing/project-assets/alien.png"),
+                 (ADDED, "boing/tutorial-assets/screenshot.png")],
+                {"project-assets", "tutorial-assets"}, set(),
+                id="two-asset-dirs",
+            ),
+            pytest.param(
+                [(ADDED, "boing/project-assets/alien.png"),
+                 (MODIFIED, "boing/project-assets/ship.png")],
+                {"project-assets"}, {"project-assets"},
+                id="add-and-modify",
+            ),
+            pytest.param(
+                [(DELETED, "boing/project-assets/alien.png")],
+                set(), set(),
+                id="delete-asset",
+            ),
+        ])
+    def test_mixed(self, status_path_pairs, exp_added, exp_modified):
+        classification = self.classify(*status_path_pairs)
+        assert classification.kind == self.Kind.OTHER
+        assert classification.asset_dirname is None
+        assert classification.asset_deltas == ()
+        assert classification.added_asset_dirnames == exp_added
+        assert classification.modified_asset_dirnames == exp_modified
+
+    def test_sole_modify(self):
+        classification = self.classify((self.MODIFIED, "boing/code.py"))
+        assert classification.kind == self.Kind.OTHER
+        assert classification.sole_modified_delta.old_file.path == "boing/code.py"
+        assert classification.sole_modified_basename == "code.py"
+
+    def test_sole_add_not_modify(self):
+        classification = self.classify((self.ADDED, "boing/code.py"))
+        assert classification.n_deltas == 1
+        assert classification.sole_modified_delta is None
+        assert classification.sole_modified_basename is None
+
+
+class TestBlobTextCache:
+    def test_hits_and_misses(self, tmp_path):
+        repo = pygit2.init_repository(tmp_path, bare=True)
+        blob_ids = [repo.create_blob(f"line {i}\nend\n".encode()) for i in range(3)]
+        cache = TH.BlobTextCache(repo, max_entries=2)
+
+        assert cache.text(blob_ids[0]) == "line 0\nend\n"
+        assert cache.lines(blob_ids[0]) == ("line 0", "end", "")
+        assert cache.text(str(blob_ids[1])) == "line 1\nend\n"
+        assert (cache.n_hits, cache.n_misses) == (1, 2)
+
+        cache.text(blob_ids[0])  # Mark as recently used
+        cache.text(blob_ids[2])  # Evicts blob_ids[1]
+        assert (cache.n_hits, cache.n_misses) == (2, 3)
+
+        cache.text(blob_ids[0])
+        cache.text(blob_ids[1])
+        assert (cache.n_hits, cache.n_misses) == (3, 4)
+
+
 class TestProjectCommit:
     def test_short_oid(self, this_raw_repo):
         # Construct commit from shorter-than-short oid:
@@ -288,6 +508,33 @@ class TestProjectHistory:
                            match=r"did not find \{base\}"):
             TH.ProjectHistory(cloned_repo.workdir, "d5f7ae0")
 
+    def test_refresh(self, clean_cloned_repo):
+        repo = clean_cloned_repo
+        project_history = TH.ProjectHistory(repo.workdir, "HEAD")
+        old_project_commits = list(project_history.project_commits)
+        assert project_history.ordered_commit_slugs == [
+            "import-pytch",
+            "add-Alien-skeleton",
+        ]
+
+        code_path = Path(repo.workdir) / "boing/code.py"
+        code_path.write_text(code_path.read_text() + "\n# More code\n")
+        commit_files(
+            repo,
+            ["boing/code.py"],
+            create_signature(repo),
+            "{#add-comment} Add comment\n",
+        )
+
+        project_history.refresh("HEAD")
+        assert project_history.project_commits[1:] == old_project_commits
+        assert project_history.ordered_commit_slugs == [
+            "import-pytch",
+            "add-Alien-skeleton",
+            "add-comment",
+        ]
+        assert project_history.final_code_text.endswith("# More code\n")
+
     def test_tip_oid_string(self, this_raw_repo, project_history):
         exp_oid = this_raw_repo.revparse_single("unit-tests-commits").id
         assert project_history.tip_oid_string == str(exp_oid)
@@ -475,3 +722,42 @@ class TestProjectHistory:
                 match=r"small-blue.png.*part of 2"
         ):
             fresh_project_history.medialib_contribution("fruit", ids)
+
+
+class TestProjectHistoryWalk:
+    @pytest.fixture
+    def repo_with_merge(self, tmp_path):
+        repo = pygit2.init_repository(tmp_path, bare=True)
+        signature = pygit2.Signature("Random Coder", "random.coder@example.com")
+        BLOB = pygit2.GIT_FILEMODE_BLOB
+
+        def commit(message, code, parents):
+            tree = _tree_from_files(repo, {"boing/code.py": (code, BLOB)})
+            return repo.create_commit(
+                None, signature, signature, message, tree.id, parents
+            )
+
+        root = commit("Unrelated root\n", b"", [])
+        base = commit("{base} Empty code\n", b"", [root])
+        step_1 = commit("{#step-1} One\n", b"1\n", [base])
+        side = commit("{#side} Side\n", b"1\ns\n", [step_1])
+        step_2 = commit("{#step-2} Two\n", b"1\n2\n", [step_1])
+        merge = commit("{#merge} Merge\n", b"1\n2\ns\n", [step_2, side])
+        repo.create_reference("refs/heads/with-merge", merge)
+        repo.create_reference("refs/heads/root-only", root)
+        return repo
+
+    def test_follows_first_parent(self, repo_with_merge):
+        project_history = TH.ProjectHistory(repo_with_merge, "with-merge")
+        assert project_history.ordered_commit_slugs == [
+            "step-1",
+            "step-2",
+            "merge",
+        ]
+        assert len(project_history.project_commits) == 4
+        assert project_history.project_commits[-1].is_base
+
+    def test_no_base(self, repo_with_merge):
+        with pytest.raises(TCE.TutorialStructureError,
+                           match=r"did not find \{base\}"):
+            TH.ProjectHistory(repo_with_merge, "root-only")
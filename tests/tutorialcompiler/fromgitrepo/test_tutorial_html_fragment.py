@@ -1,10 +1,16 @@
+import re
 import pytest
+import pygit2
 from dataclasses import dataclass
 from typing import List
 from bs4 import BeautifulSoup
 
+from pytchbuild.benchmark.synthetic_repo import SyntheticRepoSpec, create_synthetic_repo
 import pytchbuild.tutorialcompiler.fromgitrepo.tutorial_history as TH
 import pytchbuild.tutorialcompiler.fromgitrepo.tutorial_html_fragment as THF
+from pytchbuild.tutorialcompiler.fromgitrepo import soup_parsing
+from pytchbuild.tutorialcompiler.fromgitrepo.chapter_memo import chapter_source_key
+from pytchbuild.tutorialcompiler.fromgitrepo.code_snapshots import CodeSnapshotStyle
 
 
 @dataclass
@@ -168,7 +174,11 @@ class TestHtmlFragment:
         # assumptions about the order in which attributes are represented
         # in the string form of an HTML fragment.
 
-        got_div = THF.div_from_front_matter(soup, front_matter, wip_idx, code_0, code)
+        code_attrs = {
+            "data-initial-code-text": code_0,
+            "data-complete-code-text": code,
+        }
+        got_div = THF.div_from_front_matter(soup, front_matter, wip_idx, code_attrs)
         assert str(got_div) == (
             '<div class="front-matter"'
             ' data-complete-code-text="foo()"'
@@ -213,6 +223,198 @@ class TestHtmlFragment:
         assert len(body_credits) == 1
 
 
+@pytest.fixture(scope="module")
+def synthetic_repo_path(tmp_path_factory):
+    repo_path = tmp_path_factory.mktemp("synthetic-repo")
+    spec = SyntheticRepoSpec(
+        n_tutorials=2,
+        n_per_method_tutorials=1,
+        n_steps=8,
+        n_assets=2,
+        asset_size=8,
+    )
+    create_synthetic_repo(str(repo_path), spec)
+    return str(repo_path)
+
+
+def synthetic_project_history(repo_path, tip_revision):
+    return TH.ProjectHistory(pygit2.Repository(repo_path), tip_revision)
+
+
+class TestConcurrentAugmentation:
+    @pytest.mark.parametrize("tip_revision", ["synthetic-0", "synthetic-1"])
+    def test_same_as_sequential(self, synthetic_repo_path, tip_revision):
+        def tutorial_html(n_jobs):
+            project_history = synthetic_project_history(
+                synthetic_repo_path, tip_revision
+            )
+            tutorial_div = THF.tutorial_div_from_project_history(
+                project_history, n_jobs
+            )
+            return str(tutorial_div)
+
+        exp_html = tutorial_html(1)
+        got_html = tutorial_html(2)
+        assert got_html == exp_html
+        exp_attr = (
+            "data-jr-commit" if tip_revision == "synthetic-1"
+            else "data-code-as-of-commit"
+        )
+        assert f"{exp_attr}=" in got_html
+
+    def test_unknown_slug(self, synthetic_repo_path):
+        project_history = synthetic_project_history(
+            synthetic_repo_path, "synthetic-0"
+        )
+        soup = BeautifulSoup(
+            '<div class="patch-container" data-slug="step-1"></div>'
+            '<div class="patch-container" data-slug="no-such-slug"></div>'
+            '<div class="patch-container" data-slug="step-2"></div>',
+            "html.parser",
+        )
+        patch_elts = soup.find_all("div")
+
+        jobs = THF.commit_payload_jobs(project_history, patch_elts)
+        assert len(jobs) == 2
+
+        THF.precompute_commit_payloads(project_history, patch_elts, n_jobs=2)
+        assert THF.commit_payload_jobs(project_history, patch_elts) == []
+
+        THF.augment_patch_elts(soup, patch_elts, project_history)
+        # The rendered patches are RawHtml nodes, so look at the output text.
+        assert ['<div class="patch">' in str(elt) for elt in patch_elts] == [
+            True, False, True
+        ]
+        warning_p = patch_elts[1].find("p")
+        assert "unknown-slug" in warning_p.attrs["class"]
+
+
+class TestStructuredProgramCache:
+    def test_each_program_built_once(self, synthetic_repo_path):
+        project_history = synthetic_project_history(
+            synthetic_repo_path, "synthetic-1"
+        )
+        THF.tutorial_div_from_project_history(project_history)
+
+        code_blob_ids = set(
+            blob_id
+            for pc in project_history.commit_from_slug.values()
+            for blob_id in pc.code_blob_ids
+        )
+        program_table = project_history.program_cache.table
+        assert program_table.n_misses == len(code_blob_ids)
+        n_lookups = 2 * len(project_history.commit_from_slug)
+        assert program_table.n_hits + program_table.n_misses == n_lookups
+
+
+class TestChapterMemo:
+    def test_rebuild_same(self, synthetic_repo_path):
+        project_history = synthetic_project_history(
+            synthetic_repo_path, "synthetic-0"
+        )
+        chapter_table = project_history.rendered_chapter_table
+        exp_html = str(THF.tutorial_div_from_project_history(project_history))
+        n_chapters = exp_html.count('class="chapter-content"')
+        assert chapter_table.n_misses == n_chapters
+
+        got_html = str(THF.tutorial_div_from_project_history(project_history))
+        assert got_html == exp_html
+        assert chapter_table.n_hits == n_chapters
+
+    def test_edited_chapter(self, synthetic_repo_path, caplog):
+        def tutorial_html(project_history, tutorial_text):
+            project_history.tutorial_text = tutorial_text
+            return str(THF.tutorial_div_from_project_history(project_history))
+
+        project_history = synthetic_project_history(
+            synthetic_repo_path, "synthetic-0"
+        )
+        chapter_table = project_history.rendered_chapter_table
+        original_text = project_history.tutorial_text
+        tutorial_html(project_history, original_text)
+        n_misses_0 = chapter_table.n_misses
+
+        # Edit the second chapter, marking it as work in progress, and using
+        # an unknown slug:
+        [front_matter, chapter_0, chapter_1, *other_chapters] = (
+            original_text.split("\n## ")
+        )
+        edited_chapter_1 = (
+            chapter_1
+            + "\n{{< work-in-progress >}}\n"
+            + "\n{{< commit no-such-slug >}}\n"
+        )
+        edited_text = "\n## ".join(
+            [front_matter, chapter_0, edited_chapter_1, *other_chapters]
+        )
+
+        got_html = tutorial_html(project_history, edited_text)
+        assert chapter_table.n_misses == n_misses_0 + 1
+
+        # Re-use of the rendering of the edited chapter repeats its warnings:
+        caplog.clear()
+        assert tutorial_html(project_history, edited_text) == got_html
+        assert chapter_table.n_misses == n_misses_0 + 1
+        assert 'slug "no-such-slug" not found' in caplog.text
+
+        fresh_project_history = synthetic_project_history(
+            synthetic_repo_path, "synthetic-0"
+        )
+        exp_html = tutorial_html(fresh_project_history, edited_text)
+        assert got_html == exp_html
+        assert 'data-seek-to-chapter="2"' in got_html
+        assert "unknown-slug" in got_html
+
+    def test_key_depends_on_parser_backend(self, synthetic_repo_path, monkeypatch):
+        project_history = synthetic_project_history(
+            synthetic_repo_path, "synthetic-0"
+        )
+        source = "## Chapter\n\nText\n"
+
+        def key():
+            return chapter_source_key(
+                project_history, source, CodeSnapshotStyle.INLINE
+            )
+
+        monkeypatch.setattr(soup_parsing, "current_parser_backend", "html.parser")
+        html_parser_key = key()
+        monkeypatch.setattr(soup_parsing, "current_parser_backend", "lxml")
+        assert key() != html_parser_key
+
+
+class TestCodeSnapshotTable:
+    def test_ids_in_table(self, synthetic_repo_path):
+        project_history = synthetic_project_history(
+            synthetic_repo_path, "synthetic-0"
+        )
+        tutorial_div = THF.tutorial_div_from_project_history(
+            project_history, code_snapshot_style=CodeSnapshotStyle.TABLE
+        )
+        got_html = str(tutorial_div)
+        assert "data-code-as-of-commit=" not in got_html
+        assert "data-initial-code-text=" not in got_html
+
+        code_snapshots = project_history.code_snapshots
+        snapshot_ids = re.findall(r'-code(?:-as-of-commit)?-id="(\w+)"', got_html)
+        assert len(snapshot_ids) > 2
+        assert all(snapshot_id in code_snapshots for snapshot_id in snapshot_ids)
+
+        front_matter_div = tutorial_div.find("div", class_="front-matter")
+        final_code_id = front_matter_div.attrs["data-complete-code-id"]
+        assert code_snapshots[final_code_id] == project_history.final_code_text
+
+    def test_inline_and_table_not_confused(self, synthetic_repo_path):
+        project_history = synthetic_project_history(
+            synthetic_repo_path, "synthetic-0"
+        )
+        for style in [CodeSnapshotStyle.INLINE, CodeSnapshotStyle.TABLE]:
+            THF.tutorial_div_from_project_history(
+                project_history, code_snapshot_style=style
+            )
+        got_html = str(THF.tutorial_div_from_project_history(project_history))
+        assert "data-code-as-of-commit-id=" not in got_html
+
+
 class TestPredicates:
     @pytest.mark.parametrize(
         'html,exp_is_relevant',
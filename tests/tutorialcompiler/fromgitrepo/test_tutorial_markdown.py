@@ -1,4 +1,7 @@
+import pytest
+
 import pytchbuild.tutorialcompiler.fromgitrepo.tutorial_markdown as TM
+from pytchbuild.tutorialcompiler.fromgitrepo.errors import TutorialStructureError
 
 
 class TestShortcodeParsing:
@@ -24,3 +27,126 @@ class TestShortcodeParsing:
         all_code_elts = soup.find_all("code", "language-scratch")
         all_code_texts = [elt.get_text() for elt in all_code_elts]
         assert all_code_texts == ["go to x: [0] y: [120]\n"]
+
+
+class TestShortcodeIndex:
+    markdown_text = (
+        "## Chapter 1\n\n"
+        "{{< commit first >}}\n\n"
+        "{{< learner-task >}}\n\n"
+        "Do this.\n\n"
+        "{{< commit second >}}\n\n"
+        "{{< learner-task-help >}}\n\n"
+        "{{< commit third >}}\n\n"
+        "{{< /learner-task >}}\n\n"
+        "{{< commit fourth >}}\n"
+    )
+
+    def test_ordered_commit_slugs(self):
+        soup = TM.soup_from_markdown_text(self.markdown_text)
+        index = TM.ShortcodeIndex(soup)
+        exp_slugs = ["first", "second", "third", "fourth"]
+        assert index.ordered_commit_slugs == exp_slugs
+        assert TM.ordered_commit_slugs_in_soup(soup) == exp_slugs
+
+    def test_commit_divs_within(self):
+        soup = TM.soup_from_markdown_text(self.markdown_text)
+        index = TM.ShortcodeIndex(soup)
+        top_level_elts = [elt for elt in soup.children if elt.name is not None]
+        got_slugs = [
+            [div["data-slug"] for div in index.commit_divs_within(elt)]
+            for elt in top_level_elts
+        ]
+        assert got_slugs == [[], ["first"], ["second", "third"], ["fourth"]]
+
+    def test_mixture(self):
+        soup = TM.soup_from_markdown_text(
+            "{{< commit first >}}\n\n{{< jr-commit second add-sprite >}}\n"
+        )
+        with pytest.raises(TutorialStructureError, match="mixture"):
+            TM.ShortcodeIndex(soup).ordered_commit_slugs
+
+
+class TestMarkdownChapterSources:
+    def test_split(self):
+        markdown_text = (
+            "# Title\n\nIntro\n\n---\n\n"
+            "## One\n\nText\n\n"
+            "```python\n## not a heading\n```\n\n"
+            "## Two\n\nMore text\n"
+        )
+        got_sources = TM.markdown_chapter_sources(markdown_text)
+        assert [source.split("\n")[0] for source in got_sources] == [
+            "# Title", "## One", "## Two"
+        ]
+        assert "".join(got_sources) == markdown_text
+
+    @pytest.mark.parametrize(
+        "markdown_text",
+        [
+            pytest.param(
+                "## One\n\nSee [this][ref].\n\n## Two\n\n[ref]: https://example.com/\n",
+                id="reference-definition",
+            ),
+            pytest.param(
+                "## One\n\n{{< learner-task >}}\n\nDo it.\n\n"
+                "## Two\n\n{{< /learner-task >}}\n",
+                id="learner-task-spanning-chapters",
+            ),
+            pytest.param(
+                "## One\n\n<div>\n\n## Two\n\n</div>\n",
+                id="html-block",
+            ),
+        ])
+    def test_not_split(self, markdown_text):
+        assert TM.markdown_chapter_sources(markdown_text) == [markdown_text]
+
+    def test_commented_out_chapter(self):
+        markdown_text = (
+            "# T\n\n---\n\nintro\n\n"
+            "<!--\n## hidden\n\nmore\n-->\n\n"
+            "## Real\n\ntext\n"
+        )
+        got_sources = TM.markdown_chapter_sources(markdown_text)
+        assert [source.split("\n")[0] for source in got_sources] == ["# T", "## Real"]
+
+        split_html = "".join(
+            TM.html_from_markdown_text(source) for source in got_sources
+        )
+        whole_html = TM.html_from_markdown_text(markdown_text)
+        assert split_html.replace("\n", "") == whole_html.replace("\n", "")
+        assert "<h2>hidden</h2>" not in split_html
+
+
+class TestMemoisedSoup:
+    def test_fresh_soups(self):
+        markdown_text = "Image by [Someone](https://example.com/), *thanks*."
+        exp_html = str(TM.soup_from_markdown_text(markdown_text))
+
+        n_hits_0 = TM.memoised_html_from_markdown_text.cache_info().hits
+        soup_0 = TM.memoised_soup_from_markdown_text(markdown_text)
+        assert str(soup_0) == exp_html
+
+        soup_0.find("a").decompose()
+        soup_1 = TM.memoised_soup_from_markdown_text(markdown_text)
+        assert str(soup_1) == exp_html
+        assert TM.memoised_html_from_markdown_text.cache_info().hits == n_hits_0 + 1
+
+
+class TestHtmlFromMarkdownText:
+    def test_same_as_fresh_converter(self):
+        markdown_texts = [
+            "Hello [world](https://example.com/).",
+            "```python\nprint('hi')\n```\n",
+            "{{< commit add-hero >}}\n",
+            "Hello [world](https://example.com/).",
+        ]
+        for markdown_text in markdown_texts:
+            exp_html = TM.new_markdown_converter().convert(markdown_text)
+            assert TM.html_from_markdown_text(markdown_text) == exp_html
+
+    def test_after_error(self):
+        with pytest.raises(TutorialStructureError, match="unknown shortcode"):
+            TM.html_from_markdown_text("* item\n\n    {{< no-such-kind >}}\n")
+        got_html = TM.html_from_markdown_text("Hello *world*.")
+        assert got_html == "<p>Hello <em>world</em>.</p>"
@@ -0,0 +1,136 @@
+import pygit2
+import pytest
+from click.testing import CliRunner
+
+from pytchbuild.benchmark.synthetic_repo import (
+    HistoryWriter,
+    SyntheticRepoSpec,
+    create_synthetic_repo,
+)
+from pytchbuild.tutorialcompiler.validate_tutorials import (
+    TutorialSpec,
+    tutorial_specs_from_branches,
+    validate_tutorials,
+)
+from pytchbuild.validate import main
+
+
+small_spec = SyntheticRepoSpec(
+    n_tutorials=2,
+    n_per_method_tutorials=1,
+    n_steps=7,
+    n_untagged_commits=0,
+    n_chapters=2,
+    n_assets=2,
+    asset_size=16,
+)
+
+
+def files_of_tree(repo, tree, prefix=""):
+    files = {}
+    for entry in tree:
+        path = prefix + entry.name
+        if entry.type_str == "tree":
+            files.update(files_of_tree(repo, repo[entry.id], path + "/"))
+        else:
+            files[path] = repo[entry.id].data
+    return files
+
+
+def commit_edited_tutorial_text(repo_path, branch_name, edit):
+    repo = pygit2.Repository(repo_path)
+    tip_commit = repo.branches.local[branch_name].peel(pygit2.Commit)
+    writer = HistoryWriter(repo, tip_commit.commit_time + 1)
+    writer.maybe_tip_oid = tip_commit.id
+    writer.files = files_of_tree(repo, tip_commit.tree)
+    text_path = f"{branch_name}/tutorial.md"
+    writer.files[text_path] = edit(writer.files[text_path].decode()).encode()
+    writer.commit("Edit tutorial text\n")
+    writer.set_branch(branch_name)
+
+
+@pytest.fixture(scope="module")
+def valid_repo_path(tmp_path_factory):
+    repo_path = str(tmp_path_factory.mktemp("valid-repo"))
+    create_synthetic_repo(repo_path, small_spec)
+    return repo_path
+
+
+@pytest.fixture(scope="module")
+def invalid_repo_path(tmp_path_factory):
+    repo_path = str(tmp_path_factory.mktemp("invalid-repo"))
+    create_synthetic_repo(repo_path, small_spec)
+    commit_edited_tutorial_text(
+        repo_path,
+        "synthetic-1",
+        lambda text: (
+            text
+            .replace("step-2 edit-script", "step-2 add-script")
+            .replace("step-3 ", "step-99 ")
+        ),
+    )
+    return repo_path
+
+
+def validations(repo_path, n_jobs=1):
+    specs = tutorial_specs_from_branches(repo_path, "synthetic-*", None)
+    return validate_tutorials(specs, n_jobs)
+
+
+class TestValidateTutorials:
+    def test_valid(self, valid_repo_path):
+        got_validations = validations(valid_repo_path)
+        assert [v.name for v in got_validations] == ["synthetic-0", "synthetic-1"]
+        assert [v.n_jr_commits for v in got_validations] == [0, 7]
+        assert all(v.is_valid for v in got_validations)
+
+    @pytest.mark.parametrize("n_jobs", [1, 2])
+    def test_invalid(self, invalid_repo_path, n_jobs):
+        got_validations = validations(invalid_repo_path, n_jobs)
+        assert got_validations[0].is_valid
+        failures = got_validations[1].failures
+        assert len(failures) == 2
+        assert failures[0].startswith("step-2 (add-script [])")
+        assert "TutorialStructureError" in failures[0]
+        assert failures[1].startswith("step-99 (change-hat-block [])")
+        assert "slug not found" in failures[1]
+
+    def test_history_failure(self, invalid_repo_path):
+        spec = TutorialSpec("no-such", invalid_repo_path, "no-such-branch", None)
+        [validation] = validate_tutorials([spec])
+        assert validation.n_jr_commits == 0
+        assert len(validation.failures) == 1
+
+
+class TestCli:
+    def test_valid(self, valid_repo_path):
+        runner = CliRunner()
+        result = runner.invoke(
+            main,
+            ["-r", valid_repo_path, "--index-source", "RECIPES_TIP", "--no-cache"],
+        )
+        assert result.exit_code == 0
+        assert "Synthetic 1: ok; 7 jr-commit(s) checked" in result.output
+
+    def test_invalid(self, invalid_repo_path):
+        runner = CliRunner()
+        result = runner.invoke(
+            main,
+            ["-r", invalid_repo_path, "--branches", "synthetic-*", "--no-cache"],
+        )
+        assert result.exit_code == 1
+        assert "synthetic-1: 2 failure(s)" in result.output
+        assert "2 tutorial(s) checked; 1 with failures" in result.output
+
+    def test_index_source_and_branches(self, valid_repo_path):
+        runner = CliRunner()
+        result = runner.invoke(
+            main,
+            [
+                "-r", valid_repo_path,
+                "--index-source", "RECIPES_TIP",
+                "--branches", "synthetic-*",
+            ],
+        )
+        assert result.exit_code != 0
+        assert "cannot specify both" in result.output